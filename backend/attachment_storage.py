@@ -0,0 +1,177 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+from datetime import timedelta
+from pathlib import Path
+from typing import AsyncIterator, Optional
+from sqlalchemy import select, delete, func
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+import models, database
+
+# Content-addressed storage backend for task attachments.
+# Uploads are written straight from the request body stream in bounded chunks,
+# so memory per upload stays at one chunk however large the file is, and are
+# hashed with SHA-256 on the way through. Each distinct content is stored once,
+# at sha256/<2 hex>/<digest>; task_attachments.storage_path points there, and
+# attachment_blobs.ref_count (kept by triggers on task_attachments, see
+# update_schema_v15.py) counts the attachments sharing it. A background
+# collector removes blobs nothing refers to any more.
+#
+# The blob row is what serialises uploads and the collector: an upload inserts
+# its attachment (which upserts and locks the blob row) before it puts the file
+# in place, and the collector only deletes rows it can lock with SKIP LOCKED,
+# so it can never unlink a file an upload is about to reference.
+
+STORAGE_DIR = Path(os.getenv("ATTACHMENT_STORAGE_DIR", Path(__file__).parent / "attachment_files"))
+CONTENT_DIR = "sha256"
+TEMP_DIR = STORAGE_DIR / "tmp"
+# Request body bytes collected before each disk write
+WRITE_CHUNK_BYTES = 1024 * 1024
+MAX_ATTACHMENT_BYTES = int(os.getenv("MAX_ATTACHMENT_BYTES", str(2 * 1024 * 1024 * 1024)))
+
+# Blobs stay this long after their last reference goes, and abandoned temp files this long
+GC_GRACE = timedelta(minutes=int(os.getenv("ATTACHMENT_GC_GRACE_MINUTES", "10")))
+GC_TEMP_MAX_AGE = timedelta(days=1)
+GC_INTERVAL_SECONDS = int(os.getenv("ATTACHMENT_GC_INTERVAL_SECONDS", "3600"))
+GC_BATCH_SIZE = 1000
+
+class AttachmentTooLarge(Exception):
+    pass
+
+class StagedUpload:
+    """An upload written to a temp file and hashed, not yet in the content store."""
+
+    def __init__(self, temp_path: Path, sha256: str, size: int):
+        self.temp_path = temp_path
+        self.sha256 = sha256
+        self.size = size
+
+    @property
+    def storage_path(self) -> str:
+        return content_path(self.sha256)
+
+def content_path(sha256: str) -> str:
+    """Storage path (relative to STORAGE_DIR) of the blob with this digest."""
+    return f"{CONTENT_DIR}/{sha256[:2]}/{sha256}"
+
+def resolve(storage_path: str) -> Path:
+    """Absolute path of a stored file. Raises ValueError for paths outside STORAGE_DIR."""
+    root = STORAGE_DIR.resolve()
+    path = (root / storage_path).resolve()
+    if root not in path.parents:
+        raise ValueError("Invalid storage path")
+    return path
+
+def _write(out, digest, data: bytes):
+    digest.update(data)
+    out.write(data)
+
+async def stage_stream(chunks: AsyncIterator[bytes], max_bytes: Optional[int] = None) -> StagedUpload:
+    """Writes an async byte stream to a temp file, hashing it as it goes.
+    Raises AttachmentTooLarge once more than max_bytes (default MAX_ATTACHMENT_BYTES) have been received."""
+    max_bytes = max_bytes or MAX_ATTACHMENT_BYTES
+    await run_in_threadpool(TEMP_DIR.mkdir, parents=True, exist_ok=True)
+    temp_path = TEMP_DIR / f"{uuid.uuid4().hex}.part"
+
+    out = await run_in_threadpool(open, temp_path, "wb")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        buffer = bytearray()
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > max_bytes:
+                raise AttachmentTooLarge(f"Attachments are limited to {max_bytes} bytes")
+            buffer += chunk
+            if len(buffer) >= WRITE_CHUNK_BYTES:
+                await run_in_threadpool(_write, out, digest, bytes(buffer))
+                buffer.clear()
+        if buffer:
+            await run_in_threadpool(_write, out, digest, bytes(buffer))
+        await run_in_threadpool(out.close)
+    except BaseException:
+        out.close()
+        temp_path.unlink(missing_ok=True)
+        raise
+    return StagedUpload(temp_path, digest.hexdigest(), size)
+
+def place(staged: StagedUpload) -> bool:
+    """Moves a staged upload into the content store. Call after the attachment row
+    referencing it has been flushed, before commit. Returns False when identical
+    content was already stored, in which case the staged copy is simply dropped."""
+    path = resolve(staged.storage_path)
+    if path.exists():
+        staged.temp_path.unlink(missing_ok=True)
+        return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(staged.temp_path, path)
+    return True
+
+def discard(staged: StagedUpload):
+    staged.temp_path.unlink(missing_ok=True)
+
+def delete_file(storage_path: str):
+    """Removes a file directly. Only for attachments stored before content addressing;
+    content-addressed blobs are removed by the collector once unreferenced."""
+    try:
+        resolve(storage_path).unlink(missing_ok=True)
+    except ValueError:
+        pass
+
+def collect_garbage(db: Session) -> dict:
+    """Deletes blobs that have been unreferenced for longer than GC_GRACE, and stale temp files.
+
+    Blob rows are claimed in batches with FOR UPDATE SKIP LOCKED: a row locked by
+    an upload that is re-referencing it is skipped, and rows claimed here stay
+    locked until their files are gone, so an upload of the same content waits and
+    then stores a fresh copy.
+    """
+    blob = models.AttachmentBlob
+    blobs_removed = 0
+    while True:
+        claimed = select(blob.sha256).where(
+            blob.ref_count <= 0,
+            blob.unreferenced_since < func.now() - GC_GRACE
+        ).limit(GC_BATCH_SIZE).with_for_update(skip_locked=True).scalar_subquery()
+        digests = db.execute(
+            delete(blob).where(blob.sha256.in_(claimed)).returning(blob.sha256)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        for sha256 in digests:
+            resolve(content_path(sha256)).unlink(missing_ok=True)
+        db.commit()
+        blobs_removed += len(digests)
+        if len(digests) < GC_BATCH_SIZE:
+            break
+
+    temp_removed = 0
+    if TEMP_DIR.exists():
+        cutoff = time.time() - GC_TEMP_MAX_AGE.total_seconds()
+        for path in TEMP_DIR.iterdir():
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    temp_removed += 1
+            except FileNotFoundError:
+                pass
+
+    return {"blobs_removed": blobs_removed, "temp_files_removed": temp_removed}
+
+def _gc_loop():
+    while True:
+        db = database.SessionLocal()
+        try:
+            collect_garbage(db)
+        except Exception as e:
+            db.rollback()
+            print(f"Attachment garbage collection failed: {e}")
+        finally:
+            db.close()
+        time.sleep(GC_INTERVAL_SECONDS)
+
+def start_gc():
+    """Starts the periodic sweep that removes unreferenced attachment blobs."""
+    threading.Thread(target=_gc_loop, name="attachment-gc", daemon=True).start()
@@ -0,0 +1,423 @@
+import functools
+import hashlib
+import mailbox
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta, timezone
+from email import policy
+from email.errors import HeaderParseError
+from email.header import decode_header, make_header
+from email.parser import BytesParser
+from email.utils import getaddresses, parsedate_to_datetime
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy import insert, update, values, column, Integer
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+import models, database, metrics
+
+# Email intake.
+# Messages are read from a local drop directory: a Maildir (only new/ is read;
+# each message moves to cur/ once processed) and/or *.mbox files (renamed to
+# .done once drained). Every message is matched against the active
+# EmailTriggers, first match by trigger_id wins, and recorded in
+# processed_emails; triggers with auto_create_task also create a task.
+#
+# Work is done a batch at a time, in one transaction per batch. processed_emails
+# is inserted first with ON CONFLICT (message_id) DO NOTHING RETURNING, and
+# tasks are only created for the rows that insert actually returned, so a
+# message seen twice (re-delivered, or read by two workers at once) never
+# creates a second task. If Postgres rejects the batch, it is retried one
+# message at a time and the messages that still fail are recorded as 'failed',
+# so a single bad message cannot hold up the rest of the queue.
+
+INTAKE_DIR = os.getenv("EMAIL_INTAKE_DIR")
+INTAKE_BATCH_SIZE = 500
+POLL_INTERVAL_SECONDS = int(os.getenv("EMAIL_INTAKE_POLL_SECONDS", "30"))
+# Triggers are reloaded from the database at most this often
+TRIGGER_CACHE_SECONDS = 60
+EMAIL_BODY_MAX_CHARS = 20000
+MESSAGE_ID_MAX_CHARS = 998
+ERROR_MESSAGE_MAX_CHARS = 2000
+
+EMAIL_DOCUMENT_TYPE = "Email"
+DEFAULT_TASK_TYPE = models.TaskType.Tier_I
+DEFAULT_SLA_HOURS = 72
+RECIPIENT_HEADERS = ("To", "Cc", "Delivered-To", "X-Original-To")
+
+# compat32 returns headers as plain strings; the structured header registry of
+# policy.default costs several times more than the rest of parsing put together
+_parser = BytesParser(policy=policy.compat32)
+
+@functools.lru_cache(maxsize=1024)
+def _compile(pattern: str):
+    """Compiled subject pattern, or None if it isn't a valid regex. Cached across reloads."""
+    try:
+        return re.compile(pattern, re.IGNORECASE)
+    except re.error as e:
+        print(f"Ignoring invalid email trigger pattern {pattern!r}: {e}")
+        return None
+
+class ParsedEmail:
+    def __init__(self, message_id: str, subject: Optional[str], sender: Optional[str], recipients: set,
+                 sent_at: Optional[datetime], body: str):
+        self.message_id = message_id
+        self.subject = subject
+        self.sender = sender
+        self.recipients = recipients
+        self.sent_at = sent_at
+        self.body = body
+
+def _fallback_message_id(raw: bytes) -> str:
+    # Messages without a Message-ID are identified by their content, so re-reading one still dedupes
+    return f"<{hashlib.sha256(raw).hexdigest()}@intake.local>"
+
+def _clean(text: str) -> str:
+    # Postgres text cannot hold NUL characters
+    return text.replace("\x00", "")
+
+def _header(message, name: str) -> Optional[str]:
+    value = message.get(name)
+    if value is None:
+        return None
+    value = str(value)
+    # Only RFC 2047 encoded words need decoding
+    if "=?" in value:
+        try:
+            value = str(make_header(decode_header(value)))
+        except (HeaderParseError, LookupError, UnicodeDecodeError):
+            pass
+    return " ".join(_clean(value).split())
+
+def _body_text(message) -> str:
+    """The first inline text/plain part, else the first text/html one."""
+    parts = [part for part in message.walk() if part.get_content_disposition() != "attachment"]
+    part = next((p for p in parts if p.get_content_type() == "text/plain"), None) \
+        or next((p for p in parts if p.get_content_type() == "text/html"), None)
+    if part is None:
+        return ""
+    payload = part.get_payload(decode=True) or b""
+    try:
+        text = payload.decode(part.get_content_charset() or "utf-8", errors="replace")
+    except LookupError:
+        text = payload.decode("utf-8", errors="replace")
+    return _clean(text)[:EMAIL_BODY_MAX_CHARS]
+
+def parse_message(raw: bytes) -> ParsedEmail:
+    message = _parser.parsebytes(raw)
+    message_id = _header(message, "Message-ID") or _fallback_message_id(raw)
+    if len(message_id) > MESSAGE_ID_MAX_CHARS:
+        message_id = _fallback_message_id(message_id.encode("utf-8"))
+
+    senders = getaddresses([_header(message, "From") or ""])
+    sender = senders[0][1].lower() if senders and senders[0][1] else None
+    recipients = {
+        address.lower()
+        for _, address in getaddresses([str(value) for name in RECIPIENT_HEADERS for value in message.get_all(name, [])])
+        if address
+    }
+
+    sent_at = None
+    if message.get("Date"):
+        try:
+            sent_at = parsedate_to_datetime(str(message["Date"]))
+            if sent_at.tzinfo is None:
+                sent_at = sent_at.replace(tzinfo=timezone.utc)
+        except (TypeError, ValueError):
+            pass
+
+    return ParsedEmail(message_id, _header(message, "Subject"), sender, recipients, sent_at, _body_text(message))
+
+class Rule:
+    """An active EmailTrigger, prepared for matching."""
+
+    def __init__(self, trigger: models.EmailTrigger, workflow_type, workflow_sla_hours: Optional[int]):
+        self.trigger_id = trigger.trigger_id
+        self.recipient = trigger.email_address.strip().lower()
+        self.pattern = _compile(trigger.subject_pattern) if trigger.subject_pattern else None
+        self.invalid = bool(trigger.subject_pattern) and self.pattern is None
+        # Whitelist entries are full addresses, or "@domain" for a whole domain
+        entries = [entry.strip().lower() for entry in (trigger.sender_whitelist or []) if entry and entry.strip()]
+        self.senders = {entry for entry in entries if not entry.startswith("@")}
+        self.domains = {entry for entry in entries if entry.startswith("@")}
+
+        self.auto_create_task = trigger.auto_create_task
+        self.task_type = trigger.default_task_type or DEFAULT_TASK_TYPE
+        self.priority = trigger.default_priority.value if trigger.default_priority else "Medium"
+        self.workflow_config_id = trigger.workflow_config_id
+        self.workflow_type = workflow_type
+        self.sla_hours = workflow_sla_hours or DEFAULT_SLA_HOURS
+        self.assignee = trigger.assign_to_user_id if trigger.auto_assign else None
+
+    def matches(self, email: ParsedEmail) -> bool:
+        if self.invalid:
+            return False
+        if self.recipient != "*" and self.recipient not in email.recipients:
+            return False
+        if self.senders or self.domains:
+            if not email.sender:
+                return False
+            if email.sender not in self.senders and email.sender[email.sender.rfind("@"):] not in self.domains:
+                return False
+        if self.pattern is not None and not self.pattern.search(email.subject or ""):
+            return False
+        return True
+
+# (loaded_at, rules)
+_rules: Optional[Tuple[float, List[Rule]]] = None
+_rules_lock = threading.Lock()
+
+def load_rules(db: Session, max_age: float = TRIGGER_CACHE_SECONDS) -> List[Rule]:
+    """Active triggers in match order, cached for max_age seconds."""
+    global _rules
+    with _rules_lock:
+        if _rules is not None and time.monotonic() - _rules[0] < max_age:
+            return _rules[1]
+        rows = db.query(models.EmailTrigger, models.WorkflowConfig.workflow_type, models.WorkflowConfig.sla_hours).outerjoin(
+            models.WorkflowConfig, models.WorkflowConfig.config_id == models.EmailTrigger.workflow_config_id
+        ).filter(models.EmailTrigger.is_active.is_(True)).order_by(models.EmailTrigger.trigger_id).all()
+        rules = [Rule(trigger, workflow_type, sla_hours) for trigger, workflow_type, sla_hours in rows]
+        _rules = (time.monotonic(), rules)
+        return rules
+
+def _task_values(email: ParsedEmail, rule: Rule, received_at: datetime) -> dict:
+    return {
+        "company_name": (email.subject or "(no subject)")[:500],
+        "document_type": EMAIL_DOCUMENT_TYPE,
+        "task_type": rule.task_type,
+        "priority": rule.priority,
+        "status": "Pending",
+        "description": email.body,
+        "source": "email",
+        "email_reference": email.message_id[:255],
+        "workflow_config_id": rule.workflow_config_id,
+        "assigned_user_id": rule.assignee,
+        "assigned_at": received_at if rule.assignee else None,
+        "sla_hours": rule.sla_hours,
+        "due_date": received_at + timedelta(hours=rule.sla_hours),
+    }
+
+def _prepare(raw_messages: List[bytes], rules: List[Rule], outcomes: Counter) -> dict:
+    """Parses and matches a batch. Returns message_id -> (processed_emails row, email, rule);
+    later copies within the batch are counted as duplicates."""
+    entries = {}
+    for raw in raw_messages:
+        try:
+            email = parse_message(raw)
+        except Exception as e:
+            message_id = _fallback_message_id(raw)
+            entries.setdefault(message_id, ({
+                "message_id": message_id, "processing_status": "failed", "error_message": str(e)
+            }, None, None))
+            continue
+        if email.message_id in entries:
+            outcomes["duplicate"] += 1
+            continue
+        rule = next((rule for rule in rules if rule.matches(email)), None)
+        if rule is None:
+            status = "ignored"
+        else:
+            status = "success" if rule.auto_create_task else "matched"
+        entries[email.message_id] = ({
+            "message_id": email.message_id,
+            "trigger_id": rule.trigger_id if rule else None,
+            "email_subject": email.subject[:500] if email.subject else None,
+            "email_from": email.sender[:255] if email.sender else None,
+            "email_date": email.sent_at,
+            "email_body": email.body,
+            "processing_status": status,
+        }, email, rule)
+    return entries
+
+def _record(db: Session, entries: dict, now: datetime) -> Counter:
+    """Inserts processed_emails rows and creates their tasks, without committing. Returns counts by outcome."""
+    outcomes = Counter()
+    processed = models.ProcessedEmail
+    rows = [row for row, _, _ in entries.values()]
+    inserted = dict(db.execute(
+        pg_insert(processed).values([{**dict.fromkeys(
+            ("trigger_id", "email_subject", "email_from", "email_date", "email_body", "error_message")
+        ), **row} for row in rows])
+        .on_conflict_do_nothing(index_elements=[processed.message_id])
+        .returning(processed.message_id, processed.email_id)
+    ).all())
+    outcomes["duplicate"] += len(entries) - len(inserted)
+
+    to_create = []
+    for message_id, (row, email, rule) in entries.items():
+        if message_id not in inserted:
+            continue
+        outcomes[row["processing_status"]] += 1
+        if rule is not None and rule.auto_create_task:
+            to_create.append((inserted[message_id], email, rule))
+
+    if to_create:
+        task_ids = db.execute(
+            insert(models.Task).returning(models.Task.task_id, sort_by_parameter_order=True),
+            [_task_values(email, rule, now) for _, email, rule in to_create]
+        ).scalars().all()
+
+        links = values(column("email_id", Integer), column("task_id", Integer), name="links").data(
+            [(email_id, task_id) for (email_id, _, _), task_id in zip(to_create, task_ids)]
+        )
+        table = processed.__table__
+        db.execute(update(table).where(table.c.email_id == links.c.email_id).values(task_created_id=links.c.task_id))
+
+        # Intake volume, as for tasks created through the API
+        volume_deltas = defaultdict(int)
+        for _, _, rule in to_create:
+            if rule.workflow_type is not None:
+                volume_deltas[(rule.workflow_type, date.today(), rule.assignee)] += 1
+        metrics.apply_volume_deltas(db, volume_deltas)
+    return outcomes
+
+def _error_text(error: Exception) -> str:
+    # The driver's message, without SQLAlchemy's statement and parameters
+    return str(getattr(error, "orig", None) or error).strip()[:ERROR_MESSAGE_MAX_CHARS]
+
+def _record_each(db: Session, entries: dict, now: datetime) -> Counter:
+    """Records a batch one message at a time, each in its own savepoint. Messages
+    that are still rejected are recorded as 'failed' with the database's error."""
+    outcomes = Counter()
+    processed = models.ProcessedEmail
+    for message_id, entry in entries.items():
+        try:
+            with db.begin_nested():
+                outcomes.update(_record(db, {message_id: entry}, now))
+            continue
+        except SQLAlchemyError as e:
+            error = _error_text(e)
+        try:
+            with db.begin_nested():
+                db.execute(
+                    pg_insert(processed).values(message_id=message_id, processing_status="failed", error_message=error)
+                    .on_conflict_do_nothing(index_elements=[processed.message_id])
+                )
+        except SQLAlchemyError as e:
+            # Not even the bare row could be stored; log it and move on rather than block the queue
+            print(f"Could not record failed email {message_id!r}: {_error_text(e)}")
+        outcomes["failed"] += 1
+    return outcomes
+
+def process_batch(db: Session, raw_messages: List[bytes], rules: List[Rule]) -> Counter:
+    """Records and acts on one batch of messages in a single transaction. Returns counts by outcome."""
+    now = datetime.now(timezone.utc)
+    outcomes = Counter()
+    entries = _prepare(raw_messages, rules, outcomes)
+    if not entries:
+        return outcomes
+
+    try:
+        recorded = _record(db, entries, now)
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"Email batch rejected, retrying message by message: {_error_text(e)}")
+        recorded = _record_each(db, entries, now)
+    db.commit()
+    outcomes.update(recorded)
+    return outcomes
+
+class MaildirSource:
+    def __init__(self, root: Path):
+        self.root = root
+
+    def messages(self) -> Iterator[Tuple[bytes, Path]]:
+        for path in sorted((self.root / "new").iterdir()):
+            if path.name.startswith("."):
+                continue
+            try:
+                yield path.read_bytes(), path
+            except FileNotFoundError:
+                # Already taken by another worker
+                continue
+
+    def done(self, path: Path):
+        """Moves a processed message to cur/ and marks it seen, as a mail client would."""
+        try:
+            os.replace(path, self.root / "cur" / f"{path.name}:2,S")
+        except FileNotFoundError:
+            pass
+
+    def finish(self):
+        pass
+
+class MboxSource:
+    def __init__(self, path: Path):
+        self.path = path
+
+    def messages(self) -> Iterator[Tuple[bytes, str]]:
+        box = mailbox.mbox(self.path, create=False)
+        try:
+            for key in box.iterkeys():
+                yield box.get_bytes(key), key
+        finally:
+            box.close()
+
+    def done(self, key):
+        pass
+
+    def finish(self):
+        # Re-reading it would only find duplicates
+        os.replace(self.path, self.path.with_name(self.path.name + ".done"))
+
+def _sources(intake_dir: Path) -> Iterator:
+    for directory in [intake_dir, *sorted(p for p in intake_dir.iterdir() if p.is_dir())]:
+        if (directory / "new").is_dir() and (directory / "cur").is_dir():
+            yield MaildirSource(directory)
+    for path in sorted(intake_dir.glob("*.mbox")):
+        yield MboxSource(path)
+
+def _batches(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def drain(db: Session, intake_dir=None, batch_size: int = INTAKE_BATCH_SIZE) -> dict:
+    """Processes everything waiting in the drop directory. Returns counts by outcome."""
+    if not (intake_dir or INTAKE_DIR):
+        raise ValueError("No intake directory given and EMAIL_INTAKE_DIR is not set")
+    intake_dir = Path(intake_dir or INTAKE_DIR)
+    rules = load_rules(db)
+    report = Counter()
+    for source in _sources(intake_dir):
+        for batch in _batches(source.messages(), batch_size):
+            report.update(process_batch(db, [raw for raw, _ in batch], rules))
+            # Only after the batch is committed, so a crash re-reads rather than loses mail
+            for _, handle in batch:
+                source.done(handle)
+        source.finish()
+    return dict(report)
+
+def _intake_loop():
+    while True:
+        db = database.SessionLocal()
+        try:
+            drain(db)
+        except Exception as e:
+            db.rollback()
+            print(f"Email intake failed: {e}")
+        finally:
+            db.close()
+        time.sleep(POLL_INTERVAL_SECONDS)
+
+def start_worker():
+    """Starts polling EMAIL_INTAKE_DIR, if one is configured."""
+    if INTAKE_DIR:
+        threading.Thread(target=_intake_loop, name="email-intake", daemon=True).start()
+
+if __name__ == "__main__":
+    # One-off drain: python email_intake.py [drop directory]
+    db = database.SessionLocal()
+    try:
+        print(drain(db, sys.argv[1] if len(sys.argv) > 1 else None))
+    finally:
+        db.close()
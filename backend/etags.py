@@ -0,0 +1,65 @@
+import hashlib
+from datetime import datetime
+from typing import Optional
+from fastapi import Response
+
+# ETags for conditional requests.
+# Handlers compute the tag from a cheap lookup (task version, or updated_at and
+# counts for lists) and answer a matching If-None-Match with 304 before loading
+# or serializing anything. Task tags carry the version, so If-Match on writes
+# can be turned into a version check inside the UPDATE.
+
+# Browsers must revalidate on every use, which makes them send If-None-Match for us
+CACHE_CONTROL = "private, no-cache"
+
+def _part(value) -> str:
+    if isinstance(value, datetime):
+        return str(int(value.timestamp() * 1_000_000))
+    return str(value)
+
+def weak_etag(*parts) -> str:
+    digest = hashlib.sha1("|".join(_part(part) for part in parts).encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def task_etag(task_id: int, version: int) -> str:
+    """Strong tag for a single task: its version changes on every write (see update_schema_v13.py)."""
+    return f'"task-{task_id}-v{version}"'
+
+def version_from_if_match(if_match: Optional[str], task_id: int) -> Optional[int]:
+    """The task version an If-Match header expects, or None for no precondition ('*' or absent).
+    Raises ValueError if the header holds no tag for this task."""
+    if not if_match or if_match.strip() == "*":
+        return None
+    prefix = f'"task-{task_id}-v'
+    for candidate in if_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate.startswith(prefix) and candidate.endswith('"'):
+            try:
+                return int(candidate[len(prefix):-1])
+            except ValueError:
+                pass
+    raise ValueError("If-Match does not contain a tag for this task")
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison against an If-None-Match header, which may list several tags or be '*'."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == bare:
+            return True
+    return False
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+def set_etag(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
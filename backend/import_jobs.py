@@ -0,0 +1,198 @@
+import csv
+import gzip
+import io
+import os
+import shutil
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+from sqlalchemy import or_, and_, func, insert
+from sqlalchemy.orm import Session
+import models, database
+from task_import import TaskImporter, IMPORT_BATCH_SIZE
+
+# Background task import jobs.
+# POST /tasks/upload spools the file to disk and queues a job; a small thread
+# pool parses and imports it in batches. Each batch is committed together with
+# the job's progress, so a job interrupted by a restart resumes after the last
+# committed row instead of starting over.
+
+SPOOL_DIR = Path(os.getenv("IMPORT_SPOOL_DIR", Path(__file__).parent / "import_spool"))
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "2"))
+SPOOL_CHUNK_BYTES = 1024 * 1024
+# Read size when parsing the spooled file; memory per job stays bounded by this plus one batch of rows
+IMPORT_READ_CHUNK_BYTES = 64 * 1024
+
+# Files at least this large are inserted with COPY instead of batched INSERTs.
+# Gzip uploads are compared by their approximate uncompressed size.
+COPY_THRESHOLD_BYTES = 5 * 1024 * 1024
+GZIP_SIZE_FACTOR = 10
+GZIP_MAGIC = b"\x1f\x8b"
+
+# A running job whose heartbeat is older than this is assumed to belong to a dead worker
+STALE_AFTER = timedelta(minutes=2)
+RECOVERY_INTERVAL_SECONDS = 60
+
+_executor = ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix="task-import")
+# Jobs queued or running in this process, so recovery sweeps don't queue them twice
+_submitted = set()
+_submitted_lock = threading.Lock()
+
+def spool_upload(fileobj, file_name: str):
+    """Copies an upload to the spool directory in fixed-size chunks. Returns (path, size)."""
+    SPOOL_DIR.mkdir(parents=True, exist_ok=True)
+    path = SPOOL_DIR / f"{uuid.uuid4().hex}_{Path(file_name).name}"
+    with open(path, "wb") as out:
+        shutil.copyfileobj(fileobj, out, SPOOL_CHUNK_BYTES)
+    return path, path.stat().st_size
+
+def create_job(db: Session, file_name: str, spool_path: Path, file_size: int, uploader_id) -> models.ImportJob:
+    job = models.ImportJob(
+        file_name=file_name,
+        spool_path=str(spool_path),
+        file_size_bytes=file_size,
+        uploaded_by=uploader_id,
+        status="queued"
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+def submit_job(job_id):
+    with _submitted_lock:
+        if job_id in _submitted:
+            return
+        _submitted.add(job_id)
+    _executor.submit(run_job, job_id)
+
+def _open_csv_text(raw):
+    """Wraps the spooled file in a text stream, decompressing gzip uploads on the fly.
+    utf-8-sig so a BOM written by Excel doesn't end up in the first header name."""
+    stream = gzip.GzipFile(fileobj=raw, mode="rb") if raw.peek(2)[:2] == GZIP_MAGIC else raw
+    return io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+
+def _claim_job(db: Session, job_id) -> bool:
+    """Atomically moves a queued (or abandoned running) job to running. Only one worker can win."""
+    claimed = db.query(models.ImportJob).filter(
+        models.ImportJob.job_id == job_id,
+        or_(
+            models.ImportJob.status == "queued",
+            and_(models.ImportJob.status == "running", models.ImportJob.heartbeat_at < func.now() - STALE_AFTER)
+        )
+    ).update({
+        "status": "running",
+        "started_at": func.coalesce(models.ImportJob.started_at, func.now()),
+        "heartbeat_at": func.now(),
+        "error_message": None
+    }, synchronize_session=False)
+    db.commit()
+    return claimed == 1
+
+def _checkpoint(db: Session, job_id, importer: TaskImporter, rows_committed: int, bytes_processed: int):
+    """Writes the pending batch, its row errors and the job's progress in one transaction."""
+    importer.checkpoint()
+    if importer.row_errors:
+        db.execute(insert(models.ImportJobError), [
+            {"job_id": job_id, "row_index": row_index, "message": message}
+            for row_index, message in importer.row_errors
+        ])
+
+    db.query(models.ImportJob).filter(models.ImportJob.job_id == job_id).update({
+        "rows_committed": rows_committed,
+        "bytes_processed": bytes_processed,
+        "success_count": models.ImportJob.success_count + importer.success_count,
+        "failed_count": models.ImportJob.failed_count + len(importer.row_errors),
+        "heartbeat_at": func.now()
+    }, synchronize_session=False)
+    db.commit()
+
+    # Counts are now persisted on the job; start the next batch from zero
+    importer.success_count = 0
+    importer.row_errors = []
+
+def _finish_job(db: Session, job_id, status: str, error_message: str = None):
+    db.query(models.ImportJob).filter(models.ImportJob.job_id == job_id).update({
+        "status": status,
+        "error_message": error_message,
+        "finished_at": func.now()
+    }, synchronize_session=False)
+    db.commit()
+
+def run_job(job_id):
+    db = database.SessionLocal()
+    try:
+        if not _claim_job(db, job_id):
+            return
+        job = db.get(models.ImportJob, job_id)
+        job_id, spool_path, resume_after = job.job_id, job.spool_path, job.rows_committed
+        try:
+            with open(spool_path, "rb", buffering=IMPORT_READ_CHUNK_BYTES) as raw:
+                is_gzip = raw.peek(2)[:2] == GZIP_MAGIC
+                estimated_size = (job.file_size_bytes or 0) * (GZIP_SIZE_FACTOR if is_gzip else 1)
+                importer = TaskImporter(db, job.uploaded_by, use_copy=estimated_size >= COPY_THRESHOLD_BYTES)
+
+                # Parsed incrementally: only the current read chunk and batch of rows are held in memory
+                csv_reader = csv.DictReader(_open_csv_text(raw))
+                row_index = resume_after
+                for row_index, row in enumerate(csv_reader, start=1):
+                    # Rows up to resume_after were committed by an earlier run
+                    if row_index <= resume_after:
+                        continue
+                    importer.add_row(row_index, row)
+                    if row_index % IMPORT_BATCH_SIZE == 0:
+                        _checkpoint(db, job_id, importer, row_index, raw.tell())
+                _checkpoint(db, job_id, importer, row_index, raw.tell())
+        except UnicodeDecodeError:
+            db.rollback()
+            _finish_job(db, job_id, "failed", "Invalid file encoding. Please ensure the file is UTF-8 encoded CSV.")
+            return
+        except (gzip.BadGzipFile, EOFError):
+            db.rollback()
+            _finish_job(db, job_id, "failed", "Invalid or truncated gzip file.")
+            return
+
+        _finish_job(db, job_id, "completed")
+        os.remove(spool_path)
+    except Exception as e:
+        traceback.print_exc()
+        db.rollback()
+        try:
+            _finish_job(db, job_id, "failed", str(e))
+        except Exception:
+            traceback.print_exc()
+    finally:
+        db.close()
+        with _submitted_lock:
+            _submitted.discard(job_id)
+
+def resume_pending_jobs():
+    """Queues every job that is waiting or was abandoned by a dead worker."""
+    db = database.SessionLocal()
+    try:
+        job_ids = db.query(models.ImportJob.job_id).filter(
+            or_(
+                models.ImportJob.status == "queued",
+                and_(models.ImportJob.status == "running", models.ImportJob.heartbeat_at < func.now() - STALE_AFTER)
+            )
+        ).order_by(models.ImportJob.created_at).all()
+    finally:
+        db.close()
+    for (job_id,) in job_ids:
+        submit_job(job_id)
+
+def _recovery_loop():
+    while True:
+        try:
+            resume_pending_jobs()
+        except Exception as e:
+            print(f"Import job recovery failed: {e}")
+        time.sleep(RECOVERY_INTERVAL_SECONDS)
+
+def start_recovery():
+    """Starts the periodic sweep that picks up queued and abandoned jobs."""
+    threading.Thread(target=_recovery_loop, name="task-import-recovery", daemon=True).start()
@@ -13,6 +13,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "X-Total-Is-Estimate", "ETag"],
 )
 
 # Dependency
@@ -44,3 +45,30 @@ app.include_router(workflows.router)
 from routers import dashboard, notifications
 app.include_router(dashboard.router)
 app.include_router(notifications.router)
+
+import import_jobs, attachment_storage, email_intake, sla_monitor, notification_stream
+
+@app.on_event("startup")
+def resume_import_jobs():
+    # Pick up uploads that were queued or interrupted when the previous worker stopped
+    import_jobs.start_recovery()
+
+@app.on_event("startup")
+def start_attachment_gc():
+    # Removes attachment blobs no longer referenced by any task
+    attachment_storage.start_gc()
+
+@app.on_event("startup")
+def start_email_intake():
+    # Polls EMAIL_INTAKE_DIR for new mail when it is set
+    email_intake.start_worker()
+
+@app.on_event("startup")
+def start_sla_monitor():
+    # Notifies assignees of tasks nearing or past their due date
+    sla_monitor.start_monitor()
+
+@app.on_event("startup")
+def start_notification_listener():
+    # LISTENs for notification changes so this worker can push them to open streams
+    notification_stream.start_listener()
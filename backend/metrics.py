@@ -0,0 +1,194 @@
+from sqlalchemy import func, update, values, column, select, literal, cast, Date, Integer
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from typing import Dict, Tuple, Optional
+from datetime import date
+import models
+
+# Key for workflow volume deltas: (workflow_type, date, analyst_id)
+VolumeKey = Tuple[models.WorkflowType, date, Optional[str]]
+
+def apply_volume_deltas(db: Session, deltas: Dict[VolumeKey, int]):
+    """Adds many quantities to WorkflowDailyVolume in a single INSERT ... ON CONFLICT DO UPDATE.
+    Negative deltas are subtracted from existing rows only (see _subtract_volumes).
+    Relies on uq_workflow_daily_volume (see update_schema_v7.py)."""
+    rows = [
+        {"workflow_type": workflow_type, "date": volume_date, "analyst_id": analyst_id, "quantity": quantity}
+        for (workflow_type, volume_date, analyst_id), quantity in deltas.items()
+        if quantity
+    ]
+    _subtract_volumes(db, [row for row in rows if row["quantity"] < 0])
+    rows = [row for row in rows if row["quantity"] > 0]
+    if not rows:
+        return
+
+    stmt = insert(models.WorkflowDailyVolume).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_workflow_daily_volume",
+        set_={
+            "quantity": models.WorkflowDailyVolume.quantity + stmt.excluded.quantity,
+            "recorded_at": func.now(),
+        }
+    )
+    db.execute(stmt)
+
+def _subtract_volumes(db: Session, rows):
+    """Lowers existing volume rows in one UPDATE ... FROM (VALUES ...). Quantities never go below zero."""
+    if not rows:
+        return
+    volume = models.WorkflowDailyVolume.__table__
+    delta_rows = values(
+        column("workflow_type", volume.c.workflow_type.type),
+        column("date", Date),
+        column("analyst_id", volume.c.analyst_id.type),
+        column("quantity", Integer),
+        name="deltas"
+    ).data([(row["workflow_type"], row["date"], row["analyst_id"], -row["quantity"]) for row in rows])
+    db.execute(
+        update(volume)
+        .where(
+            # VALUES columns arrive as text; cast back to the enum for the comparison
+            volume.c.workflow_type == cast(delta_rows.c.workflow_type, volume.c.workflow_type.type),
+            volume.c.date == delta_rows.c.date,
+            volume.c.analyst_id.is_not_distinct_from(delta_rows.c.analyst_id)
+        )
+        .values(quantity=func.greatest(volume.c.quantity - delta_rows.c.quantity, 0), recorded_at=func.now())
+    )
+
+def volume_upsert(source):
+    """INSERT ... SELECT ... ON CONFLICT DO UPDATE adding the quantities of `source`, a
+    select of (workflow_type, date, analyst_id, quantity), to WorkflowDailyVolume.
+    Returned unexecuted so it can also run as part of a larger statement."""
+    volume = models.WorkflowDailyVolume.__table__
+    stmt = insert(volume).from_select(["workflow_type", "date", "analyst_id", "quantity"], source)
+    return stmt.on_conflict_do_update(
+        constraint="uq_workflow_daily_volume",
+        set_={
+            "quantity": volume.c.quantity + stmt.excluded.quantity,
+            "recorded_at": func.now(),
+        }
+    )
+
+def add_workflow_volume(db: Session, workflow_config_id: int, analyst_id, volume_date: date, quantity: int = 1):
+    """Adds quantity to the daily volume of a workflow config's type in one statement.
+    The config's workflow_type is resolved inside the INSERT ... SELECT, so a missing
+    config simply inserts nothing."""
+    if not workflow_config_id or not quantity:
+        return
+
+    volume = models.WorkflowDailyVolume.__table__
+    db.execute(volume_upsert(select(
+        models.WorkflowConfig.workflow_type,
+        literal(volume_date, volume.c.date.type),
+        literal(analyst_id, volume.c.analyst_id.type),
+        literal(quantity, volume.c.quantity.type)
+    ).where(models.WorkflowConfig.config_id == workflow_config_id)))
+
+def set_workflow_volume(db: Session, workflow_type: models.WorkflowType, volume_date: date, analyst_id, quantity: int) -> models.WorkflowDailyVolume:
+    """Records the absolute volume for (type, date, analyst), replacing any earlier value."""
+    stmt = insert(models.WorkflowDailyVolume).values(
+        workflow_type=workflow_type,
+        date=volume_date,
+        analyst_id=analyst_id,
+        quantity=quantity
+    )
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_workflow_daily_volume",
+        set_={"quantity": stmt.excluded.quantity, "recorded_at": func.now()}
+    )
+    return db.execute(
+        stmt.returning(models.WorkflowDailyVolume).execution_options(populate_existing=True)
+    ).scalars().first()
+
+# Counters on UserPerformance that transitions adjust
+PERFORMANCE_COUNTERS = ("tasks_assigned", "tasks_in_progress", "tasks_completed")
+
+# Key for performance deltas: (user_id, metric_date)
+PerformanceKey = Tuple[object, date]
+
+def _check_counters(counters):
+    unknown = set(counters) - set(PERFORMANCE_COUNTERS)
+    if unknown:
+        raise ValueError(f"Unknown performance counters: {', '.join(sorted(unknown))}")
+
+def _bumped(counter: str, delta):
+    # Counters never go below zero
+    column = models.UserPerformance.__table__.c[counter]
+    return func.greatest(func.coalesce(column, 0) + delta, 0)
+
+def performance_upsert(user_id, metric_date: date, deltas: Dict[str, int], source=None):
+    """INSERT ... ON CONFLICT DO UPDATE applying counter deltas to a user's UserPerformance
+    row for metric_date, or None if there is nothing to apply. With `source` (a CTE or
+    other FROM clause) the row is only written if `source` yields one, which lets the
+    upsert run inside a statement that first has to succeed, e.g. a conditional UPDATE.
+    Relies on unique_user_metric_date (see update_schema_v10.py)."""
+    _check_counters(deltas)
+    deltas = {counter: delta for counter, delta in deltas.items() if delta}
+    if not deltas:
+        return None
+
+    table = models.UserPerformance.__table__
+    row = {
+        "user_id": user_id,
+        "metric_date": metric_date,
+        **{counter: max(delta, 0) for counter, delta in deltas.items()}
+    }
+    if source is None:
+        stmt = insert(models.UserPerformance).values(**row)
+    else:
+        stmt = insert(models.UserPerformance).from_select(list(row), select(
+            *[literal(value, table.c[name].type) for name, value in row.items()]
+        ).select_from(source))
+    return stmt.on_conflict_do_update(
+        constraint="unique_user_metric_date",
+        set_={counter: _bumped(counter, delta) for counter, delta in deltas.items()}
+    )
+
+def adjust_performance(db: Session, user_id, metric_date: date, **deltas: int):
+    """Applies counter deltas (e.g. tasks_in_progress=-1, tasks_completed=1) to a user's
+    UserPerformance row for metric_date in one INSERT ... ON CONFLICT DO UPDATE."""
+    stmt = performance_upsert(user_id, metric_date, deltas)
+    if stmt is not None:
+        db.execute(stmt)
+
+def apply_performance_deltas(db: Session, deltas: Dict[PerformanceKey, Dict[str, int]]):
+    """Bulk variant of adjust_performance: applies counter deltas for many (user, date) keys
+    in two statements, whatever the number of keys.
+
+    Rows that gain a counter are created first (ON CONFLICT DO NOTHING); then a single
+    UPDATE ... FROM (VALUES ...) adds every delta in place. Decrements never create rows.
+    """
+    for counters in deltas.values():
+        _check_counters(counters)
+    rows = [
+        {"user_id": user_id, "metric_date": metric_date, **{c: counters.get(c, 0) for c in PERFORMANCE_COUNTERS}}
+        for (user_id, metric_date), counters in deltas.items()
+        if any(counters.values())
+    ]
+    if not rows:
+        return
+
+    new_keys = [
+        {"user_id": row["user_id"], "metric_date": row["metric_date"]}
+        for row in rows if any(row[c] > 0 for c in PERFORMANCE_COUNTERS)
+    ]
+    if new_keys:
+        db.execute(
+            insert(models.UserPerformance).values(new_keys).on_conflict_do_nothing(constraint="unique_user_metric_date")
+        )
+
+    table = models.UserPerformance.__table__
+    delta_rows = values(
+        column("user_id", table.c.user_id.type),
+        column("metric_date", Date),
+        *[column(c, Integer) for c in PERFORMANCE_COUNTERS],
+        name="deltas"
+    ).data([
+        (row["user_id"], row["metric_date"], *[row[c] for c in PERFORMANCE_COUNTERS])
+        for row in rows
+    ])
+    db.execute(
+        update(table)
+        .where(table.c.user_id == delta_rows.c.user_id, table.c.metric_date == delta_rows.c.metric_date)
+        .values({c: _bumped(c, delta_rows.c[c]) for c in PERFORMANCE_COUNTERS})
+    )
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Enum, Text, BigInteger, JSON, Date, Numeric
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Enum, Text, BigInteger, JSON, Date, Numeric, Computed, UniqueConstraint, FetchedValue
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR, ARRAY
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 import enum
 from database import Base
@@ -55,6 +55,14 @@ class WorkflowType(str, enum.Enum):
     Bond_Watch = "Bond Watch"
     Track_Ratings = "Track Ratings"
 
+# Weighted search document for tasks: company name ranks above free-text fields
+TASK_SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('english', coalesce(company_name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(notes, '')), 'C') || "
+    "setweight(to_tsvector('english', coalesce(remarks, '')), 'C')"
+)
+
 # Models
 
 class User(Base):
@@ -92,6 +100,11 @@ class Task(Base):
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Incremented by the bump_task_version trigger on every UPDATE (see update_schema_v13.py)
+    version = Column(Integer, nullable=False, server_default="1", server_onupdate=FetchedValue())
+    # Id of the transaction that last wrote the row, stamped by the stamp_task_change trigger
+    # (see update_schema_v14.py). Orders the /tasks/changes feed; deferred like search_vector.
+    change_xid = deferred(Column(BigInteger, nullable=False, server_default="0", server_onupdate=FetchedValue()))
     tier1_started_at = Column(DateTime(timezone=True))
     tier1_completed_at = Column(DateTime(timezone=True))
     tier2_started_at = Column(DateTime(timezone=True))
@@ -117,6 +130,10 @@ class Task(Base):
     workflow_config_id = Column(Integer, ForeignKey("arms_workflow.workflow_configs.config_id"), nullable=True)
     custom_workflow_name = Column(String(255), nullable=True)
 
+    # Full-text search document, maintained by Postgres (see update_schema_v6.py).
+    # Deferred so regular task queries don't load it.
+    search_vector = deferred(Column(TSVECTOR, Computed(TASK_SEARCH_VECTOR_SQL, persisted=True)))
+
     assigned_user = relationship("User", back_populates="tasks")
     attachments = relationship("TaskAttachment", back_populates="task", cascade="all, delete-orphan")
     history = relationship("TaskHistory", back_populates="task", cascade="all, delete-orphan")
@@ -132,13 +149,27 @@ class TaskAttachment(Base):
     file_type = Column(String(50))
     file_size_bytes = Column(BigInteger)
     storage_path = Column(Text, nullable=False)
-    uploaded_by = Column(String, ForeignKey("arms_workflow.users.id"))
+    uploaded_by = Column(UUID(as_uuid=True), ForeignKey("arms_workflow.users.id"))
     uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
     is_output = Column(Boolean, default=False)
     file_category = Column(String(50))
+    # Content address of the stored file; NULL for files stored before deduplication (see update_schema_v15.py)
+    content_sha256 = Column(String(64))
 
     task = relationship("Task", back_populates="attachments")
 
+class AttachmentBlob(Base):
+    """One stored file, shared by every attachment with the same content.
+    ref_count is maintained by triggers on task_attachments."""
+    __tablename__ = "attachment_blobs"
+    __table_args__ = {"schema": "arms_workflow"}
+
+    sha256 = Column(String(64), primary_key=True)
+    size_bytes = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    unreferenced_since = Column(DateTime(timezone=True))
+
 class TaskHistory(Base):
     __tablename__ = "task_history"
     __table_args__ = {"schema": "arms_workflow"}
@@ -169,6 +200,16 @@ class TaskComment(Base):
     is_internal = Column(Boolean, default=False)
 
     task = relationship("Task", back_populates="comments")
+    user = relationship("User")
+
+class TaskTombstone(Base):
+    """One row per deleted task, written by the record_task_tombstones trigger."""
+    __tablename__ = "task_tombstones"
+    __table_args__ = {"schema": "arms_workflow"}
+
+    task_id = Column(Integer, primary_key=True)
+    change_xid = Column(BigInteger, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now())
 
 class WorkflowConfig(Base):
     __tablename__ = "workflow_configs"
@@ -202,7 +243,11 @@ class WorkflowConfig(Base):
 
 class WorkflowDailyVolume(Base):
     __tablename__ = "workflow_daily_volumes"
-    __table_args__ = {"schema": "arms_workflow"}
+    __table_args__ = (
+        # One row per (type, date, analyst) so volume changes can be applied as upserts
+        UniqueConstraint("workflow_type", "date", "analyst_id", name="uq_workflow_daily_volume", postgresql_nulls_not_distinct=True),
+        {"schema": "arms_workflow"},
+    )
 
     volume_id = Column(Integer, primary_key=True, index=True)
     workflow_type = Column(Enum(WorkflowType, schema="arms_workflow", name="workflow_type", values_callable=lambda x: [e.value for e in x]), nullable=False)
@@ -220,10 +265,10 @@ class EmailTrigger(Base):
     trigger_id = Column(Integer, primary_key=True, index=True)
     email_address = Column(String(255), nullable=False)
     subject_pattern = Column(String(500))
-    sender_whitelist = Column(Text) # Storing array as text or use ARRAY type if using postgres specific types
+    sender_whitelist = Column(ARRAY(Text)) # Addresses, or "@domain" for a whole domain
     auto_create_task = Column(Boolean, default=True)
-    default_task_type = Column(Enum(TaskType, schema="arms_workflow"))
-    default_priority = Column(Enum(TaskPriority, schema="arms_workflow"))
+    default_task_type = Column(Enum(TaskType, name="task_type", schema="arms_workflow", values_callable=lambda x: [e.value for e in x]))
+    default_priority = Column(Enum(TaskPriority, name="task_priority", schema="arms_workflow"))
     workflow_config_id = Column(Integer, ForeignKey("arms_workflow.workflow_configs.config_id"))
     auto_assign = Column(Boolean, default=False)
     assign_to_user_id = Column(UUID(as_uuid=True), ForeignKey("arms_workflow.users.id"))
@@ -235,13 +280,15 @@ class ProcessedEmail(Base):
     __table_args__ = {"schema": "arms_workflow"}
 
     email_id = Column(Integer, primary_key=True, index=True)
+    # Unique, so each message is processed once however often it is read (see email_intake.py)
+    message_id = Column(String(998), unique=True)
     trigger_id = Column(Integer, ForeignKey("arms_workflow.email_triggers.trigger_id"))
     email_subject = Column(String(500))
     email_from = Column(String(255))
     email_date = Column(DateTime(timezone=True))
     email_body = Column(Text)
     processed_at = Column(DateTime(timezone=True), server_default=func.now())
-    task_created_id = Column(Integer, ForeignKey("arms_workflow.tasks.task_id"))
+    task_created_id = Column(Integer, ForeignKey("arms_workflow.tasks.task_id", ondelete="SET NULL"))
     processing_status = Column(String(50))
     error_message = Column(Text)
 
@@ -264,7 +311,11 @@ class DailyMetric(Base):
 
 class UserPerformance(Base):
     __tablename__ = "user_performance"
-    __table_args__ = {"schema": "arms_workflow"}
+    __table_args__ = (
+        # One row per (user, date) so counter changes can be applied as upserts
+        UniqueConstraint("user_id", "metric_date", name="unique_user_metric_date"),
+        {"schema": "arms_workflow"},
+    )
 
     performance_id = Column(Integer, primary_key=True, index=True)
     user_id = Column(UUID(as_uuid=True), ForeignKey("arms_workflow.users.id"), nullable=False)
@@ -278,6 +329,38 @@ class UserPerformance(Base):
     quality_score = Column(Numeric(5, 2))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+class ImportJob(Base):
+    __tablename__ = "import_jobs"
+    __table_args__ = {"schema": "arms_workflow"}
+
+    job_id = Column(UUID(as_uuid=True), primary_key=True, server_default=func.gen_random_uuid())
+    file_name = Column(String(500), nullable=False)
+    spool_path = Column(Text, nullable=False)
+    file_size_bytes = Column(BigInteger)
+    uploaded_by = Column(UUID(as_uuid=True), ForeignKey("arms_workflow.users.id"))
+    status = Column(String(20), nullable=False, default="queued") # 'queued', 'running', 'completed', 'failed'
+
+    # Progress. rows_committed is the last CSV row whose effects are committed; a resumed job continues after it.
+    rows_committed = Column(Integer, nullable=False, default=0)
+    bytes_processed = Column(BigInteger, nullable=False, default=0)
+    success_count = Column(Integer, nullable=False, default=0)
+    failed_count = Column(Integer, nullable=False, default=0)
+    error_message = Column(Text)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    heartbeat_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+
+class ImportJobError(Base):
+    __tablename__ = "import_job_errors"
+    __table_args__ = {"schema": "arms_workflow"}
+
+    error_id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(UUID(as_uuid=True), ForeignKey("arms_workflow.import_jobs.job_id", ondelete="CASCADE"), nullable=False)
+    row_index = Column(Integer, nullable=False)
+    message = Column(Text, nullable=False)
+
 class NotificationType(str, enum.Enum):
     info = "info"
     success = "success"
@@ -299,5 +382,23 @@ class Notification(Base):
 
     user = relationship("User", back_populates="notifications")
 
+class SlaAlert(Base):
+    """An SLA alert already raised for a task, so each (task, level, due date) notifies once."""
+    __tablename__ = "sla_alerts"
+    __table_args__ = {"schema": "arms_workflow"}
+
+    task_id = Column(Integer, ForeignKey("arms_workflow.tasks.task_id", ondelete="CASCADE"), primary_key=True)
+    level = Column(String(20), primary_key=True) # 'at_risk' | 'breached'
+    due_date = Column(DateTime(timezone=True), primary_key=True)
+    alerted_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class SlaSweepState(Base):
+    """Single row: how far the SLA sweep has got (see sla_monitor.py)."""
+    __tablename__ = "sla_sweep_state"
+    __table_args__ = {"schema": "arms_workflow"}
+
+    sweep_id = Column(Integer, primary_key=True) # always 1
+    swept_until = Column(DateTime(timezone=True), nullable=False)
+
 # Add relationship to User model
 User.notifications = relationship("Notification", back_populates="user")
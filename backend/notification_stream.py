@@ -0,0 +1,109 @@
+import asyncio
+import json
+import select
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Set
+import database
+
+# Push side of GET /notifications/stream.
+# Triggers on the notifications table NOTIFY the "arms_notifications" channel
+# with the id of every user whose notifications were inserted or updated (see
+# update_schema_v18.py). Each worker process keeps one LISTEN connection and
+# wakes the streams open for those users; a stream then reads what changed
+# itself. NOTIFY is sent on commit, so streams never see uncommitted rows, and
+# every worker gets every notification however the writes were spread.
+
+CHANNEL = "arms_notifications"
+# How often the listener wakes with nothing to do, to notice a dead connection
+LISTEN_TIMEOUT_SECONDS = 30
+RECONNECT_MAX_SECONDS = 30
+
+class Subscription:
+    """One open stream. wake() may be called from any thread; several wakes
+    before the stream gets to run coalesce into one."""
+
+    def __init__(self, user_id: str, loop: asyncio.AbstractEventLoop):
+        self.user_id = user_id
+        self.loop = loop
+        self.changed = asyncio.Event()
+
+    def wake(self):
+        self.loop.call_soon_threadsafe(self.changed.set)
+
+_subscriptions: Dict[str, Set[Subscription]] = defaultdict(set)
+_subscriptions_lock = threading.Lock()
+
+def subscribe(user_id) -> Subscription:
+    """Registers a stream for a user. Call from the event loop serving it."""
+    subscription = Subscription(str(user_id), asyncio.get_running_loop())
+    with _subscriptions_lock:
+        _subscriptions[subscription.user_id].add(subscription)
+    return subscription
+
+def unsubscribe(subscription: Subscription):
+    with _subscriptions_lock:
+        subscribers = _subscriptions.get(subscription.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del _subscriptions[subscription.user_id]
+
+def _wake_user(user_id: str):
+    with _subscriptions_lock:
+        subscribers = list(_subscriptions.get(user_id, ()))
+    for subscription in subscribers:
+        subscription.wake()
+
+def _wake_all():
+    with _subscriptions_lock:
+        subscribers = [s for group in _subscriptions.values() for s in group]
+    for subscription in subscribers:
+        subscription.wake()
+
+def _dispatch(payload: str):
+    try:
+        user_id = json.loads(payload)["user_id"]
+    except (ValueError, KeyError, TypeError):
+        return
+    _wake_user(str(user_id))
+
+def _listen_loop():
+    backoff = 1
+    while True:
+        connection = None
+        try:
+            # A dedicated connection, detached from the pool: it is held for the life of the process
+            raw = database.engine.raw_connection()
+            raw.detach()
+            connection = raw.driver_connection
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL};")
+            # Anything sent while we weren't listening was missed; have every stream re-read
+            _wake_all()
+            backoff = 1
+
+            while True:
+                readable, _, _ = select.select([connection], [], [], LISTEN_TIMEOUT_SECONDS)
+                connection.poll()
+                while connection.notifies:
+                    _dispatch(connection.notifies.pop(0).payload)
+                if not readable:
+                    # Idle: make sure the connection is still alive
+                    with connection.cursor() as cursor:
+                        cursor.execute("SELECT 1;")
+        except Exception as e:
+            print(f"Notification listener disconnected: {e}")
+            if connection is not None:
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+            time.sleep(backoff)
+            backoff = min(backoff * 2, RECONNECT_MAX_SECONDS)
+
+def start_listener():
+    """Starts this process's LISTEN connection for notification streams."""
+    threading.Thread(target=_listen_loop, name="notification-listener", daemon=True).start()
@@ -0,0 +1,55 @@
+import base64
+import enum
+import json
+import uuid
+from datetime import datetime
+from typing import Tuple
+from sqlalchemy import func, literal_column
+from sqlalchemy.orm import Session, Query
+
+# Opaque keyset cursors.
+# A cursor is the (timestamp, id) pair of the last row a client has seen,
+# serialized as url-safe base64 JSON so clients treat it as a token.
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    payload = json.dumps({"t": timestamp.isoformat(), "id": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Returns (timestamp, id). Raises ValueError for malformed cursors."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(payload["t"]), int(payload["id"])
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+# Above this many matching rows an exact COUNT(*) costs more than it is worth;
+# fall back to the planner's row estimate instead.
+COUNT_EXACT_THRESHOLD = 10000
+
+def _driver_value(value):
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+def count_with_estimate(db: Session, query: Query, threshold: int = COUNT_EXACT_THRESHOLD) -> Tuple[int, bool]:
+    """Returns (total, is_estimate) for an ORM query without its limit/offset applied."""
+    query = query.order_by(None)
+
+    # Exact count, but stop scanning once we know we are past the threshold
+    capped = query.with_entities(literal_column("1")).limit(threshold + 1).subquery()
+    total = db.query(func.count()).select_from(capped).scalar()
+    if total <= threshold:
+        return total, False
+
+    compiled = query.statement.compile(dialect=db.get_bind().dialect, compile_kwargs={"render_postcompile": True})
+    # Raw driver execution skips SQLAlchemy's bind processors, so unwrap UUIDs and enums ourselves
+    params = {key: _driver_value(value) for key, value in compiled.params.items()}
+    plan = db.connection().exec_driver_sql("EXPLAIN (FORMAT JSON) " + str(compiled), params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    estimate = int(plan[0]["Plan"]["Plan Rows"])
+    return max(estimate, threshold + 1), True
@@ -26,7 +26,8 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
-async def get_current_user(token: str = Depends(security.oauth2_scheme), db: Session = Depends(database.get_db)):
+def user_from_token(token: str, db: Session) -> models.User:
+    """Resolves an access token to its user. Raises 401 if the token is invalid."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -44,3 +45,6 @@ async def get_current_user(token: str = Depends(security.oauth2_scheme), db: Ses
     if user is None:
         raise credentials_exception
     return user
+
+async def get_current_user(token: str = Depends(security.oauth2_scheme), db: Session = Depends(database.get_db)):
+    return user_from_token(token, db)
@@ -1,7 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import json
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from typing import List
-import models, schemas, database
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
+import models, schemas, database, notification_stream
 from . import auth
 
 router = APIRouter(
@@ -17,6 +22,103 @@ def get_notifications(db: Session = Depends(database.get_db), current_user: sche
     ).order_by(models.Notification.created_at.desc()).limit(50).all()
     return notifications
 
+STREAM_HEARTBEAT_SECONDS = 15
+STREAM_RETRY_MS = 5000
+# Most notifications sent in one go when a stream (re)connects behind
+STREAM_BACKLOG_LIMIT = 50
+
+def _stream_user_id(token: str):
+    with database.SessionLocal() as db:
+        return auth.user_from_token(token, db).id
+
+def _latest_notification_id(user_id) -> int:
+    with database.SessionLocal() as db:
+        return db.query(func.max(models.Notification.notification_id)).filter(
+            models.Notification.user_id == user_id
+        ).scalar() or 0
+
+def _notifications_after(user_id, last_id: int):
+    """Notifications newer than last_id, oldest first, and the unread count."""
+    with database.SessionLocal() as db:
+        notifications = db.query(models.Notification).filter(
+            models.Notification.user_id == user_id,
+            models.Notification.notification_id > last_id
+        ).order_by(models.Notification.notification_id).limit(STREAM_BACKLOG_LIMIT).all()
+        unread = db.query(func.count(models.Notification.notification_id)).filter(
+            models.Notification.user_id == user_id,
+            models.Notification.is_read == False
+        ).scalar()
+        return [schemas.Notification.from_orm(n) for n in notifications], unread
+
+def _event(event: str, data: str, event_id: Optional[int] = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {data}")
+    return "\n".join(lines) + "\n\n"
+
+@router.get("/stream")
+async def stream_notifications(
+    request: Request,
+    token: str = Query(...),
+    since: Optional[int] = None,
+    last_event_id: Optional[str] = Header(None)
+):
+    """Server-sent events: a `notification` event for each new notification (its id
+    is the notification_id) and an `unread` event whenever the unread count changes.
+
+    EventSource cannot send an Authorization header, so the access token is passed
+    as ?token=. Streams resume after Last-Event-ID when the browser reconnects, or
+    after ?since= (the newest notification the client already has); otherwise they
+    start with notifications created from now on. No database session is held
+    between events: each wake-up reads with a short-lived one.
+    """
+    user_id = await run_in_threadpool(_stream_user_id, token)
+
+    last_id = None
+    for resume_from in (last_event_id, since):
+        try:
+            last_id = int(resume_from)
+            break
+        except (TypeError, ValueError):
+            continue
+    if last_id is None:
+        last_id = await run_in_threadpool(_latest_notification_id, user_id)
+
+    subscription = notification_stream.subscribe(user_id)
+
+    async def events():
+        nonlocal last_id
+        unread_sent = None
+        try:
+            yield f"retry: {STREAM_RETRY_MS}\n\n"
+            while True:
+                # Cleared before reading, so a change committed meanwhile wakes us again
+                subscription.changed.clear()
+                notifications, unread = await run_in_threadpool(_notifications_after, user_id, last_id)
+                for notification in notifications:
+                    last_id = notification.notification_id
+                    yield _event("notification", notification.json(), last_id)
+                if unread != unread_sent:
+                    unread_sent = unread
+                    yield _event("unread", json.dumps({"count": unread}))
+                if len(notifications) == STREAM_BACKLOG_LIMIT:
+                    continue
+
+                while not subscription.changed.is_set():
+                    try:
+                        await asyncio.wait_for(subscription.changed.wait(), STREAM_HEARTBEAT_SECONDS)
+                    except asyncio.TimeoutError:
+                        # Keeps proxies from closing an idle connection, and surfaces a gone client
+                        yield ": ping\n\n"
+        finally:
+            notification_stream.unsubscribe(subscription)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
 @router.post("/{notification_id}/read")
 def mark_as_read(notification_id: int, db: Session = Depends(database.get_db), current_user: schemas.User = Depends(auth.get_current_user)):
     notification = db.query(models.Notification).filter(
@@ -1,11 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Request, Response, Query, Header
+from fastapi.responses import StreamingResponse, FileResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import tuple_, or_, func
 from typing import List, Optional
 import models, schemas, database
+from pagination import encode_cursor, decode_cursor, count_with_estimate
+import import_jobs, metrics, task_transitions, task_bulk, task_changes, etags, attachment_storage
 from . import auth
 import csv
 import io
-from datetime import datetime, date
+import json
+import os
+import uuid
+import zlib
+from datetime import datetime, date, timedelta
 
 router = APIRouter(
     prefix="/tasks",
@@ -20,34 +30,6 @@ def get_db():
     finally:
         db.close()
 
-def increment_workflow_volume(db: Session, workflow_config_id: int, analyst_id: Optional[str], date_obj: date, quantity: int = 1):
-    """Helper to increment workflow daily volume."""
-    if not workflow_config_id:
-        return
-
-    workflow_config = db.query(models.WorkflowConfig).filter(models.WorkflowConfig.config_id == workflow_config_id).first()
-    if not workflow_config:
-        return
-
-    # Find or create daily volume record
-    # Use .value for Enum to ensure string match in DB
-    daily_volume = db.query(models.WorkflowDailyVolume).filter(
-        models.WorkflowDailyVolume.workflow_type == workflow_config.workflow_type.value,
-        models.WorkflowDailyVolume.date == date_obj,
-        models.WorkflowDailyVolume.analyst_id == analyst_id
-    ).first()
-    
-    if daily_volume:
-        daily_volume.quantity += quantity
-    else:
-        new_volume = models.WorkflowDailyVolume(
-            workflow_type=workflow_config.workflow_type.value,
-            date=date_obj,
-            quantity=quantity,
-            analyst_id=analyst_id
-        )
-        db.add(new_volume)
-
 @router.post("/", response_model=schemas.Task)
 def create_task(task: schemas.TaskCreate, db: Session = Depends(get_db), current_user: schemas.User = Depends(auth.get_current_user)):
     db_task = models.Task(**task.dict())
@@ -60,251 +42,568 @@ def create_task(task: schemas.TaskCreate, db: Session = Depends(get_db), current
     if db_task.workflow_config_id:
         target_analyst = db_task.assigned_user_id if db_task.assigned_user_id else None
         qty = db_task.target_qty if db_task.target_qty else 1
-        increment_workflow_volume(db, db_task.workflow_config_id, target_analyst, date.today(), qty)
+        metrics.add_workflow_volume(db, db_task.workflow_config_id, target_analyst, date.today(), qty)
         db.commit()
 
     return db_task
 
-@router.post("/upload")
-async def upload_tasks(file: UploadFile = File(...), db: Session = Depends(get_db), current_user: schemas.User = Depends(auth.get_current_user)):
+@router.post("/upload", status_code=status.HTTP_202_ACCEPTED)
+def upload_tasks(file: UploadFile = File(...), db: Session = Depends(get_db), current_user: schemas.User = Depends(auth.get_current_user)):
+    """Spools the CSV (or gzip-compressed .csv.gz) to disk and queues a background import job.
+    Poll /tasks/import-jobs/{job_id} for progress."""
+    if current_user.role not in [models.UserRole.admin, models.UserRole.manager]:
+        raise HTTPException(status_code=403, detail="Only managers and admins can upload tasks")
+
+    if not file.filename.endswith(('.csv', '.csv.gz')):
+        raise HTTPException(status_code=400, detail="Invalid file format. Please upload a CSV or .csv.gz file.")
+
     try:
-        if current_user.role not in [models.UserRole.admin, models.UserRole.manager]:
-            raise HTTPException(status_code=403, detail="Only managers and admins can upload tasks")
+        spool_path, file_size = import_jobs.spool_upload(file.file, file.filename)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Failed to read file: {str(e)}")
 
-        if not file.filename.endswith('.csv'):
-            raise HTTPException(status_code=400, detail="Invalid file format. Please upload a CSV file.")
-        
-        try:
-            content = await file.read()
-            decoded_content = content.decode('utf-8')
-            csv_reader = csv.DictReader(io.StringIO(decoded_content))
-        except UnicodeDecodeError:
-            raise HTTPException(status_code=400, detail="Invalid file encoding. Please ensure the file is UTF-8 encoded CSV.")
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Failed to read file: {str(e)}")
-        
-        success_count = 0
-        errors = []
-        
-        for row_index, row in enumerate(csv_reader, start=1):
-            try:
-                # Basic validation
-                required_fields = ['company_name', 'document_type', 'task_type']
-                for field in required_fields:
-                    if field not in row or not row[field]:
-                        raise ValueError(f"Missing required field: {field}")
-                
-                # Validate task_type
-                valid_task_types = [t.value for t in models.TaskType]
-                if row['task_type'] not in valid_task_types:
-                    raise ValueError(f"Invalid task_type '{row['task_type']}'. Must be one of: {', '.join(valid_task_types)}")
-
-                # Lookup Workflow if provided
-                workflow_id = None
-                workflow_name = row.get('Workflow')
-                if workflow_name:
-                    # Try to find matching workflow config
-                    wf = db.query(models.WorkflowConfig).filter(models.WorkflowConfig.workflow_name == workflow_name).first()
-                    if wf:
-                        workflow_id = wf.config_id
-
-                # Parse Status
-                status_val = row.get('Status', 'Pending')
-                # Validate status if needed, or default to Pending if invalid
-                valid_statuses = ["Pending", "In Progress", "Completed", "Under Review", "Paused"]
-                if status_val not in valid_statuses:
-                    status_val = "Pending"
-
-                # Parse Qty
-                try:
-                    target_qty = int(row.get('Target Qty', 1))
-                except:
-                    target_qty = 1
-                
-                try:
-                    achieved_qty = int(row.get('Achieved Qty', 0))
-                except:
-                    achieved_qty = 0
-
-                # Create task
-                task_data = schemas.TaskCreate(
-                    company_name=row['company_name'],
-                    document_type=row['document_type'],
-                    task_type=row['task_type'],
-                    priority=row.get('priority', 'Medium'),
-                    description=row.get('description', ''),
-                    notes=row.get('notes', ''),
-                    assigned_user_id=current_user.id, # Auto-assign uploader
-                    workflow_config_id=workflow_id,
-                    custom_workflow_name=row.get('custom_workflow_name'),
-                    target_qty=target_qty
-                )
-                
-                db_task = models.Task(**task_data.dict())
-                db_task.status = status_val
-                db_task.achieved_qty = achieved_qty
-                
-                # If importing as Completed, set timestamps
-                if status_val == "Completed":
-                    db_task.completed_at = datetime.now()
-
-                db.add(db_task)
-                
-                # Sync Volume for ALL imported tasks with workflow
-                if workflow_id:
-                    # Use achieved_qty if > 0, else target_qty
-                    qty = achieved_qty if achieved_qty > 0 else target_qty
-                    increment_workflow_volume(db, workflow_id, current_user.id, date.today(), qty)
-
-                success_count += 1
-                
-            except Exception as e:
-                print(f"Error processing row {row_index}: {e}")
-                errors.append(f"Row {row_index}: {str(e)}")
-                
+    job = import_jobs.create_job(db, file.filename, spool_path, file_size, current_user.id)
+    import_jobs.submit_job(job.job_id)
+    return {"job_id": job.job_id, "status": job.status}
+
+# Row errors included inline in the job status response; the rest are paged via /errors
+JOB_STATUS_ERROR_LIMIT = 100
+
+def _get_import_job(db: Session, job_id: uuid.UUID, current_user) -> models.ImportJob:
+    if current_user.role not in [models.UserRole.admin, models.UserRole.manager]:
+        raise HTTPException(status_code=403, detail="Only managers and admins can view import jobs")
+    job = db.query(models.ImportJob).filter(models.ImportJob.job_id == job_id).first()
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
+
+@router.get("/import-jobs/{job_id}", response_model=schemas.ImportJob)
+def read_import_job(job_id: uuid.UUID, db: Session = Depends(get_db), current_user: schemas.User = Depends(auth.get_current_user)):
+    job = _get_import_job(db, job_id, current_user)
+    errors = db.query(models.ImportJobError.row_index, models.ImportJobError.message).filter(
+        models.ImportJobError.job_id == job_id
+    ).order_by(models.ImportJobError.row_index).limit(JOB_STATUS_ERROR_LIMIT).all()
+
+    return schemas.ImportJob(
+        job_id=job.job_id,
+        file_name=job.file_name,
+        status=job.status,
+        file_size_bytes=job.file_size_bytes,
+        bytes_processed=job.bytes_processed,
+        rows_processed=job.rows_committed,
+        total_processed=job.success_count + job.failed_count,
+        success_count=job.success_count,
+        failed_count=job.failed_count,
+        errors=[f"Row {row_index}: {message}" for row_index, message in errors],
+        error_message=job.error_message,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at
+    )
+
+@router.get("/import-jobs/{job_id}/errors", response_model=List[schemas.ImportJobError])
+def read_import_job_errors(job_id: uuid.UUID, skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: schemas.User = Depends(auth.get_current_user)):
+    _get_import_job(db, job_id, current_user)
+    return db.query(models.ImportJobError).filter(
+        models.ImportJobError.job_id == job_id
+    ).order_by(models.ImportJobError.row_index).offset(skip).limit(limit).all()
+
+@router.post("/import-jobs/{job_id}/resume", status_code=status.HTTP_202_ACCEPTED)
+def resume_import_job(job_id: uuid.UUID, db: Session = Depends(get_db), current_user: schemas.User = Depends(auth.get_current_user)):
+    """Re-queues a failed job. It continues after the last committed row."""
+    job = _get_import_job(db, job_id, current_user)
+    if job.status == "completed":
+        raise HTTPException(status_code=400, detail="Import job already completed")
+    if job.status == "failed":
+        job.status = "queued"
+        job.finished_at = None
         db.commit()
-        
-        return {
-            "total_processed": success_count + len(errors),
-            "success_count": success_count,
-            "failed_count": len(errors),
-            "errors": errors
-        }
-    except HTTPException:
-        raise
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+    import_jobs.submit_job(job.job_id)
+    return {"job_id": job.job_id, "status": "queued"}
+
+# Whitelisted sort keys for the task list. Anything else is rejected rather than
+# interpolated into ORDER BY.
+TASK_SORT_KEYS = {
+    "created_at": models.Task.created_at,
+    "updated_at": models.Task.updated_at,
+    "due_date": models.Task.due_date,
+    "priority": models.Task.priority,
+    "status": models.Task.status,
+    "company_name": models.Task.company_name,
+    "task_id": models.Task.task_id,
+}
+
+def _validate_choices(values: Optional[List[str]], allowed: List[str], field: str):
+    for value in values or []:
+        if value not in allowed:
+            raise HTTPException(status_code=400, detail=f"Invalid {field} '{value}'. Must be one of: {', '.join(allowed)}")
+
+def task_filter_params(
+    status_filter: Optional[List[str]] = Query(None, alias="status"),
+    priority: Optional[List[str]] = Query(None),
+    task_type: Optional[List[str]] = Query(None),
+    assigned_user_id: Optional[List[str]] = Query(None),
+    workflow_config_id: Optional[int] = None,
+    created_from: Optional[date] = None,
+    created_to: Optional[date] = None,
+    due_from: Optional[date] = None,
+    due_to: Optional[date] = None,
+):
+    """Shared task list filters. Multi-valued params are repeated, e.g. ?status=Pending&status=Paused.
+    assigned_user_id accepts 'unassigned' for tasks with no assignee. Date ranges are inclusive days."""
+    _validate_choices(status_filter, [s.value for s in models.TaskStatus], "status")
+    _validate_choices(priority, [p.value for p in models.TaskPriority], "priority")
+    _validate_choices(task_type, [t.value for t in models.TaskType], "task_type")
+
+    assignees = []
+    include_unassigned = False
+    for value in assigned_user_id or []:
+        if value == "unassigned":
+            include_unassigned = True
+            continue
+        try:
+            assignees.append(uuid.UUID(value))
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid assigned_user_id '{value}'")
+
+    return {
+        "status": status_filter,
+        "priority": priority,
+        "task_type": task_type,
+        "assignees": assignees,
+        "include_unassigned": include_unassigned,
+        "workflow_config_id": workflow_config_id,
+        "created_from": created_from,
+        "created_to": created_to,
+        "due_from": due_from,
+        "due_to": due_to,
+    }
+
+def apply_task_filters(query, filters: dict):
+    """Pushes the filters from task_filter_params into the WHERE clause."""
+    if filters["status"]:
+        query = query.filter(models.Task.status.in_(filters["status"]))
+    if filters["priority"]:
+        query = query.filter(models.Task.priority.in_(filters["priority"]))
+    if filters["task_type"]:
+        query = query.filter(models.Task.task_type.in_([models.TaskType(t) for t in filters["task_type"]]))
+
+    assignee_clauses = []
+    if filters["assignees"]:
+        assignee_clauses.append(models.Task.assigned_user_id.in_(filters["assignees"]))
+    if filters["include_unassigned"]:
+        assignee_clauses.append(models.Task.assigned_user_id.is_(None))
+    if assignee_clauses:
+        query = query.filter(or_(*assignee_clauses))
+
+    if filters["workflow_config_id"]:
+        query = query.filter(models.Task.workflow_config_id == filters["workflow_config_id"])
+
+    # Half-open ranges on the raw columns so the created_at/due_date indexes stay usable
+    if filters["created_from"]:
+        query = query.filter(models.Task.created_at >= filters["created_from"])
+    if filters["created_to"]:
+        query = query.filter(models.Task.created_at < filters["created_to"] + timedelta(days=1))
+    if filters["due_from"]:
+        query = query.filter(models.Task.due_date >= filters["due_from"])
+    if filters["due_to"]:
+        query = query.filter(models.Task.due_date < filters["due_to"] + timedelta(days=1))
+    return query
 
 @router.get("/", response_model=List[schemas.Task])
-def read_tasks(skip: int = 0, limit: int = 100, workflow_config_id: Optional[int] = None, db: Session = Depends(get_db)):
-    query = db.query(models.Task)
-    
-    if workflow_config_id:
-        query = query.filter(models.Task.workflow_config_id == workflow_config_id)
-        
-    tasks = query.order_by(models.Task.created_at.desc()).offset(skip).limit(limit).all()
+def read_tasks(request: Request, response: Response, if_none_match: Optional[str] = Header(None), skip: int = 0, limit: int = 100, cursor: Optional[str] = None, sort: str = "-created_at", filters: dict = Depends(task_filter_params), db: Session = Depends(get_db)):
+    sort_key = sort.lstrip("-")
+    descending = sort.startswith("-")
+    if sort_key not in TASK_SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"Invalid sort key '{sort_key}'. Must be one of: {', '.join(TASK_SORT_KEYS)}")
+    if cursor and sort_key != "created_at":
+        raise HTTPException(status_code=400, detail="Cursor pagination is only supported when sorting by created_at")
+
+    query = apply_task_filters(db.query(models.Task), filters)
+
+    # The list ETag is the newest task write or delete anywhere plus the page requested: exact,
+    # two index probes, and checked before counting or reading the page, so an unchanged poll
+    # costs nothing else. Any task change invalidates every list, which errs on the safe side.
+    etag = etags.weak_etag("tasks", task_changes.change_marker(db), str(request.query_params))
+    if etags.etag_matches(if_none_match, etag):
+        return etags.not_modified(etag)
+    etags.set_etag(response, etag)
+
+    total, is_estimate = count_with_estimate(db, query)
+    response.headers["X-Total-Count"] = str(total)
+    response.headers["X-Total-Is-Estimate"] = "true" if is_estimate else "false"
+
+    # Keyset pagination: continue after the (created_at, task_id) of the last row seen.
+    # Uses idx_tasks_created_at_id / idx_tasks_workflow_created_at_id instead of scanning past `skip` rows.
+    if cursor:
+        try:
+            cursor_created_at, cursor_task_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        row, after = tuple_(models.Task.created_at, models.Task.task_id), tuple_(cursor_created_at, cursor_task_id)
+        query = query.filter(row < after if descending else row > after)
+    else:
+        query = query.offset(skip)
+
+    sort_column = TASK_SORT_KEYS[sort_key]
+    if descending:
+        sort_column = sort_column.desc()
+        tiebreaker = models.Task.task_id.desc()
+    else:
+        sort_column = sort_column.asc()
+        tiebreaker = models.Task.task_id.asc()
+    # Tasks without a due date go last either way; other keys keep the default so they match their indexes
+    if sort_key == "due_date":
+        sort_column = sort_column.nulls_last()
+    query = query.order_by(sort_column, tiebreaker)
+
+    tasks = query.limit(limit).all()
+
+    # A full page means there may be more rows; hand back a cursor for the next one
+    if sort_key == "created_at" and tasks and len(tasks) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(tasks[-1].created_at, tasks[-1].task_id)
     return tasks
 
-@router.get("/export", response_class=status.HTTP_200_OK)
-def export_tasks(db: Session = Depends(get_db), current_user: schemas.User = Depends(auth.get_current_user)):
+# Exportable columns: key -> (CSV header, SQL expression).
+# The assignee name is joined in SQL rather than lazy-loaded per task.
+EXPORT_COLUMNS = {
+    "task_id": ("Task ID", models.Task.task_id),
+    "company_name": ("Company", models.Task.company_name),
+    "task_type": ("Type", models.Task.task_type),
+    "document_type": ("Document", models.Task.document_type),
+    "status": ("Status", models.Task.status),
+    "priority": ("Priority", models.Task.priority),
+    "target_qty": ("Target Qty", models.Task.target_qty),
+    "achieved_qty": ("Achieved Qty", models.Task.achieved_qty),
+    "created_at": ("Created At", models.Task.created_at),
+    "assigned_to": ("Assigned To", func.coalesce(models.User.full_name, "Unassigned")),
+    "assigned_at": ("Assigned At", models.Task.assigned_at),
+    "due_date": ("Due Date", models.Task.due_date),
+    "completed_at": ("Completed At", models.Task.completed_at),
+    "workflow_config_id": ("Workflow ID", models.Task.workflow_config_id),
+    "custom_workflow_name": ("Custom Workflow", models.Task.custom_workflow_name),
+    "description": ("Description", models.Task.description),
+    "notes": ("Notes", models.Task.notes),
+    "remarks": ("Remarks", models.Task.remarks),
+}
+
+# Columns exported when no ?columns= selection is given
+DEFAULT_EXPORT_COLUMNS = [
+    "task_id", "company_name", "task_type", "document_type", "status",
+    "priority", "target_qty", "achieved_qty", "created_at", "assigned_to"
+]
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+# Rows fetched per server-side cursor round trip, and rows per yielded chunk
+EXPORT_CHUNK_ROWS = 1000
+
+def _export_value(value, export_format: str):
+    if hasattr(value, 'value'):
+        return value.value
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S") if export_format == "csv" else value.isoformat()
+    return value
+
+def _gzip_chunks(chunks):
+    """Compresses a stream of text chunks into a gzip stream on the fly."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk.encode("utf-8"))
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def stream_task_export(filters: dict, columns: List[str], export_format: str):
+    """Yields the export as text chunks, reading tasks through a server-side cursor.
+    Uses its own session because the response body is produced after the request's session is closed."""
+    db = database.SessionLocal()
+    try:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if export_format == "csv":
+            writer.writerow([EXPORT_COLUMNS[key][0] for key in columns])
+
+        query = db.query(*[EXPORT_COLUMNS[key][1] for key in columns]).select_from(models.Task)
+        if "assigned_to" in columns:
+            query = query.outerjoin(models.User, models.Task.assigned_user_id == models.User.id)
+        rows = apply_task_filters(query, filters) \
+            .order_by(models.Task.created_at.desc(), models.Task.task_id.desc()) \
+            .yield_per(EXPORT_CHUNK_ROWS)
+
+        for row_count, row in enumerate(rows, start=1):
+            values = [_export_value(value, export_format) for value in row]
+            if export_format == "csv":
+                writer.writerow(values)
+            else:
+                buffer.write(json.dumps(dict(zip(columns, values)), default=str))
+                buffer.write("\n")
+            if row_count % EXPORT_CHUNK_ROWS == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+        yield buffer.getvalue()
+    finally:
+        db.close()
+
+@router.get("/export")
+def export_tasks(
+    columns: Optional[str] = None,
+    export_format: str = Query("csv", alias="format"),
+    gzip: bool = False,
+    filters: dict = Depends(task_filter_params),
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(auth.get_current_user)
+):
+    """Streams the filtered task list. columns is a comma-separated selection of EXPORT_COLUMNS keys;
+    format is csv or ndjson; gzip=true compresses the stream on the fly."""
     # Only allow export for admin/manager
     if current_user.role not in [models.UserRole.admin, models.UserRole.manager]:
         raise HTTPException(status_code=403, detail="Only managers and admins can export tasks")
 
-    tasks = db.query(models.Task).order_by(models.Task.created_at.desc()).all()
-    
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Header
-    headers = [
-        "Task ID", "Company", "Type", "Document", "Status", 
-        "Priority", "Target Qty", "Achieved Qty", "Created At", 
-        "Assigned To"
-    ]
-    writer.writerow(headers)
-    
-    # Data
-    for task in tasks:
-        assigned_name = task.assigned_user.full_name if task.assigned_user else "Unassigned"
-        writer.writerow([
-            task.task_id,
-            task.company_name,
-            task.task_type.value if hasattr(task.task_type, 'value') else task.task_type,
-            task.document_type,
-            task.status.value if hasattr(task.status, 'value') else task.status,
-            task.priority.value if hasattr(task.priority, 'value') else task.priority,
-            task.target_qty,
-            task.achieved_qty,
-            task.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-            assigned_name
-        ])
-    
-    output.seek(0)
-    
-    from fastapi.responses import StreamingResponse
-    response = StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=tasks_export.csv"}
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid format '{export_format}'. Must be one of: {', '.join(EXPORT_FORMATS)}")
+
+    selected_columns = [c.strip() for c in columns.split(",") if c.strip()] if columns else DEFAULT_EXPORT_COLUMNS
+    invalid_columns = [c for c in selected_columns if c not in EXPORT_COLUMNS]
+    if invalid_columns or not selected_columns:
+        raise HTTPException(status_code=400, detail=f"Invalid columns: {', '.join(invalid_columns)}. Must be from: {', '.join(EXPORT_COLUMNS)}")
+
+    media_type, extension = EXPORT_FORMATS[export_format]
+    body = stream_task_export(filters, selected_columns, export_format)
+    if gzip:
+        body = _gzip_chunks(body)
+        media_type = "application/gzip"
+        extension += ".gz"
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=tasks_export.{extension}"}
     )
-    return response
+
+@router.get("/search", response_model=List[schemas.TaskSearchResult])
+def search_tasks(q: str = Query(..., min_length=2, max_length=200), skip: int = 0, limit: int = Query(20, le=100), db: Session = Depends(get_db)):
+    """Ranked full-text search over company name, description, notes and remarks,
+    plus trigram similarity on company name for typos and partial names."""
+    ts_query = func.websearch_to_tsquery("english", q)
+    score = (func.ts_rank_cd(models.Task.search_vector, ts_query) + func.similarity(models.Task.company_name, q)).label("score")
+
+    # Rank and page on the index-backed columns first (idx_tasks_search_vector / idx_tasks_company_trgm)...
+    page = db.query(models.Task.task_id, score).filter(
+        or_(
+            models.Task.search_vector.bool_op("@@")(ts_query),
+            models.Task.company_name.bool_op("%")(q)
+        )
+    ).order_by(score.desc(), models.Task.task_id.desc()).offset(skip).limit(limit).subquery()
+
+    # ...then build highlighted snippets for just the rows on this page, since ts_headline is expensive
+    snippet = func.ts_headline(
+        "english",
+        func.concat_ws(" ... ", models.Task.description, models.Task.notes, models.Task.remarks),
+        ts_query,
+        "StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=20, MinWords=5"
+    )
+    rows = db.query(models.Task, page.c.score, snippet).join(page, page.c.task_id == models.Task.task_id).order_by(page.c.score.desc(), models.Task.task_id.desc()).all()
+
+    return [{"task": task, "rank": score, "snippet": snippet or None} for task, score, snippet in rows]
+
+@router.get("/changes", response_model=schemas.TaskChanges)
+def read_task_changes(
+    since: Optional[str] = None,
+    limit: int = Query(task_changes.CHANGES_DEFAULT_LIMIT, ge=1, le=task_changes.CHANGES_MAX_LIMIT),
+    db: Session = Depends(get_db)
+):
+    """Tasks created or updated, and ids of tasks deleted, since the `since` cursor.
+
+    Clients keep a local copy of the list and apply these deltas instead of
+    refetching it. Without `since` the feed starts from the beginning. Follow
+    `cursor` while `has_more` is true; the last cursor is where the next poll starts.
+    The feed is unfiltered, so clients apply their own list filters to it.
+    """
+    try:
+        return task_changes.changes_since(db, since, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/changes/cursor")
+def read_task_changes_cursor(db: Session = Depends(get_db)):
+    """Cursor for "now". Take it before loading the task list, so nothing written
+    in between is missed: such changes are simply delivered again by the feed."""
+    return {"cursor": task_changes.current_cursor(db)}
+
+@router.post("/claim-next")
+def claim_next_task(
+    workflow_config_id: Optional[int] = None,
+    task_type: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(auth.get_current_user)
+):
+    """Atomically assigns the highest-priority, earliest-due Pending task to the caller.
+
+    The candidate row is locked with FOR UPDATE SKIP LOCKED, so concurrent
+    callers each get a different task instead of waiting on (or double-picking)
+    the same one. Uses idx_tasks_pending_queue / idx_tasks_pending_queue_workflow.
+    """
+    if task_type is not None:
+        _validate_choices([task_type], [t.value for t in models.TaskType], "task_type")
+
+    candidate = db.query(models.Task.task_id).filter(
+        models.Task.status == "Pending",
+        # Pending tasks pre-assigned to someone else are theirs to pick
+        or_(models.Task.assigned_user_id.is_(None), models.Task.assigned_user_id == current_user.id)
+    )
+    if workflow_config_id is not None:
+        candidate = candidate.filter(models.Task.workflow_config_id == workflow_config_id)
+    if task_type is not None:
+        candidate = candidate.filter(models.Task.task_type == models.TaskType(task_type))
+    candidate = candidate.order_by(
+        models.Task.priority.desc(),
+        models.Task.due_date.asc().nulls_last(),
+        models.Task.created_at.asc(),
+        models.Task.task_id.asc()
+    ).limit(1).with_for_update(skip_locked=True).scalar_subquery()
+
+    # The claim and its performance counters are one statement (see task_transitions)
+    db_task = task_transitions.claim(db, candidate, current_user)
+    if db_task is None:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="No pending tasks available")
+    return {"message": "Task claimed successfully", "task": task_transitions.commit(db, db_task)}
 
 @router.get("/{task_id}", response_model=schemas.Task)
-def read_task(task_id: int, db: Session = Depends(get_db)):
+def read_task(task_id: int, response: Response, if_none_match: Optional[str] = Header(None), db: Session = Depends(get_db)):
+    # Primary key lookup of the version only; an unchanged task is answered without loading it
+    version = db.query(models.Task.version).filter(models.Task.task_id == task_id).scalar()
+    if version is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    etag = etags.task_etag(task_id, version)
+    if etags.etag_matches(if_none_match, etag):
+        return etags.not_modified(etag)
+
     task = db.query(models.Task).filter(models.Task.task_id == task_id).first()
     if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
+    # Send the ETag for the version actually returned (it may have moved on since the lookup)
+    etags.set_etag(response, etags.task_etag(task_id, task.version))
     return task
 
 @router.put("/{task_id}", response_model=schemas.Task)
-def update_task(task_id: int, task_update: schemas.TaskUpdate, db: Session = Depends(get_db), current_user: schemas.User = Depends(auth.get_current_user)):
-    db_task = db.query(models.Task).filter(models.Task.task_id == task_id).first()
-    if db_task is None:
-        raise HTTPException(status_code=404, detail="Task not found")
-    
-    # Restriction: Completed tasks can only be edited by admin/manager
-    if db_task.status == models.TaskStatus.Completed:
-        if current_user.role not in [models.UserRole.admin, models.UserRole.manager]:
-            raise HTTPException(status_code=403, detail="Completed tasks cannot be edited by analysts")
-
-    # Capture old status to detect completion
-    old_status = db_task.status
-    
+def update_task(task_id: int, task_update: schemas.TaskUpdate, response: Response, if_match: Optional[str] = Header(None), db: Session = Depends(get_db), current_user: schemas.User = Depends(auth.get_current_user)):
     update_data = task_update.dict(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_task, key, value)
-    
-    try:
-        # If status changed to Completed, update metrics
-        if old_status != models.TaskStatus.Completed and db_task.status == models.TaskStatus.Completed:
-            db_task.completed_at = models.func.now()
-            
-            # Update UserPerformance
-            today = models.func.current_date()
-            perf = db.query(models.UserPerformance).filter(
-                models.UserPerformance.user_id == current_user.id,
-                models.UserPerformance.metric_date == today
-            ).first()
-            
-            if not perf:
-                perf = models.UserPerformance(
-                    user_id=current_user.id,
-                    metric_date=today,
-                    tasks_assigned=0,
-                    tasks_in_progress=0,
-                    tasks_completed=0
-                )
-                db.add(perf)
-                db.flush()
-
-            if perf.tasks_in_progress > 0:
-                perf.tasks_in_progress -= 1
-            perf.tasks_completed += 1
-
-            # --- Workflow Volume Sync Logic ---
-            if db_task.workflow_config_id:
-                qty_to_add = db_task.achieved_qty if db_task.achieved_qty else 1
-                increment_workflow_volume(db, db_task.workflow_config_id, current_user.id, date.today(), qty_to_add)
 
-        db.commit()
-        db.refresh(db_task)
+    # Optimistic concurrency: the version the client read, from the body or an If-Match ETag
+    expected_version = update_data.pop("version", None)
+    if expected_version is None:
+        try:
+            expected_version = etags.version_from_if_match(if_match, task_id)
+        except ValueError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+
+    try:
+        # Completing through an edit records workflow volume within the same statement
+        db_task, _ = task_transitions.update_fields(db, task_id, current_user, update_data, expected_version)
+        db_task = task_transitions.commit(db, db_task)
+        etags.set_etag(response, etags.task_etag(task_id, db_task.version))
         return db_task
+    except task_transitions.TransitionError as e:
+        db.rollback()
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     except Exception as e:
         db.rollback()
         print(f"Error updating task {task_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to update task: {str(e)}")
 
+# Page sizes for the task detail view
+TASK_DETAIL_COMMENTS = 20
+TASK_DETAIL_HISTORY = 50
+
+def _keyset_page(query, timestamp_column, id_column, cursor: Optional[str], limit: int):
+    """Newest-first page continuing after `cursor`. Returns (rows, next_cursor or None).
+    Fetches one extra row to know whether another page exists."""
+    if cursor:
+        try:
+            cursor_timestamp, cursor_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(tuple_(timestamp_column, id_column) < tuple_(cursor_timestamp, cursor_id))
+    rows = query.order_by(timestamp_column.desc(), id_column.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, timestamp_column.key), getattr(last, id_column.key))
+
+def _set_total_headers(response: Response, db: Session, query):
+    total, is_estimate = count_with_estimate(db, query)
+    response.headers["X-Total-Count"] = str(total)
+    response.headers["X-Total-Is-Estimate"] = "true" if is_estimate else "false"
+
+@router.get("/{task_id}/full", response_model=schemas.TaskFull)
+def read_task_full(
+    task_id: int,
+    comments_limit: int = Query(TASK_DETAIL_COMMENTS, ge=1, le=100),
+    history_limit: int = Query(TASK_DETAIL_HISTORY, ge=1, le=200),
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(auth.get_current_user)
+):
+    """Everything the task detail page needs in one request: the task, its assignee,
+    the newest comments and history entries with their authors, and attachment metadata.
+    Always four queries, however many comments or history rows the task has.
+    Older comments/history are fetched with the returned *_next_cursor."""
+    task = db.query(models.Task).options(
+        joinedload(models.Task.assigned_user),
+        selectinload(models.Task.attachments)
+    ).filter(models.Task.task_id == task_id).first()
+    if task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    comments, comments_next_cursor = _keyset_page(
+        db.query(models.TaskComment).options(joinedload(models.TaskComment.user)).filter(models.TaskComment.task_id == task_id),
+        models.TaskComment.created_at, models.TaskComment.comment_id, None, comments_limit
+    )
+    history, history_next_cursor = _keyset_page(
+        db.query(models.TaskHistory).options(joinedload(models.TaskHistory.user)).filter(models.TaskHistory.task_id == task_id),
+        models.TaskHistory.changed_at, models.TaskHistory.history_id, None, history_limit
+    )
+
+    return {
+        "task": task,
+        "assignee": task.assigned_user,
+        "comments": comments,
+        "comments_next_cursor": comments_next_cursor,
+        "history": history,
+        "history_next_cursor": history_next_cursor,
+        "attachments": task.attachments
+    }
+
 @router.get("/{task_id}/history", response_model=List[schemas.TaskHistory])
-def read_task_history(task_id: int, db: Session = Depends(get_db)):
-    history = db.query(models.TaskHistory).filter(models.TaskHistory.task_id == task_id).order_by(models.TaskHistory.changed_at.desc()).all()
+def read_task_history(task_id: int, response: Response, cursor: Optional[str] = None, limit: int = Query(TASK_DETAIL_HISTORY, ge=1, le=200), db: Session = Depends(get_db)):
+    """Newest first. Pass X-Next-Cursor back as ?cursor= for older entries."""
+    query = db.query(models.TaskHistory).filter(models.TaskHistory.task_id == task_id)
+    _set_total_headers(response, db, query)
+    history, next_cursor = _keyset_page(
+        query.options(joinedload(models.TaskHistory.user)),
+        models.TaskHistory.changed_at, models.TaskHistory.history_id, cursor, limit
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return history
 
-@router.get("/{task_id}/comments", response_model=List[schemas.TaskComment])
-def read_task_comments(task_id: int, db: Session = Depends(get_db)):
-    comments = db.query(models.TaskComment).filter(models.TaskComment.task_id == task_id).order_by(models.TaskComment.created_at.desc()).all()
+@router.get("/{task_id}/comments", response_model=List[schemas.TaskCommentDetail])
+def read_task_comments(task_id: int, response: Response, cursor: Optional[str] = None, limit: int = Query(TASK_DETAIL_COMMENTS, ge=1, le=100), db: Session = Depends(get_db)):
+    """Newest first. Pass X-Next-Cursor back as ?cursor= for older comments."""
+    query = db.query(models.TaskComment).filter(models.TaskComment.task_id == task_id)
+    _set_total_headers(response, db, query)
+    comments, next_cursor = _keyset_page(
+        query.options(joinedload(models.TaskComment.user)),
+        models.TaskComment.created_at, models.TaskComment.comment_id, cursor, limit
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return comments
 
 @router.post("/{task_id}/comments", response_model=schemas.TaskComment)
@@ -324,192 +623,160 @@ def create_task_comment(task_id: int, comment: schemas.TaskCommentCreate, db: Se
     db.refresh(db_comment)
     return db_comment
 
-@router.post("/{task_id}/pick")
-def pick_task(task_id: int, db: Session = Depends(get_db), current_user: schemas.User = Depends(auth.get_current_user)):
-    db_task = db.query(models.Task).filter(models.Task.task_id == task_id).first()
-    if not db_task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    
-    if db_task.status != "Pending":
-        raise HTTPException(status_code=400, detail="Only Pending tasks can be picked up")
-    
-    # Assign to current user
-    db_task.assigned_user_id = current_user.id
-    db_task.status = "In Progress"
-    db_task.assigned_at = datetime.now()
-    db_task.picked_at = datetime.now()
-    
-    # Update UserPerformance
-    today = date.today()
-    perf = db.query(models.UserPerformance).filter(
-        models.UserPerformance.user_id == current_user.id,
-        models.UserPerformance.metric_date == today
+def _get_attachment(db: Session, task_id: int, attachment_id: int) -> models.TaskAttachment:
+    attachment = db.query(models.TaskAttachment).filter(
+        models.TaskAttachment.attachment_id == attachment_id,
+        models.TaskAttachment.task_id == task_id
     ).first()
-    
-    if not perf:
-        perf = models.UserPerformance(
-            user_id=current_user.id,
-            metric_date=today,
-            tasks_assigned=0,
-            tasks_in_progress=0,
-            tasks_completed=0
-        )
-        db.add(perf)
-    
-    perf.tasks_in_progress += 1
-    
+    if attachment is None:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    return attachment
+
+def _task_exists(db: Session, task_id: int) -> bool:
+    return db.query(models.Task.task_id).filter(models.Task.task_id == task_id).first() is not None
+
+def _save_attachment(db: Session, attachment: models.TaskAttachment, staged: attachment_storage.StagedUpload):
+    db.add(attachment)
+    # The insert references (and locks) the blob row before the file is put in place
+    db.flush()
+    attachment_storage.place(staged)
     db.commit()
-    db.refresh(db_task)
-    return {"message": "Task picked up successfully", "task": db_task}
+    db.refresh(attachment)
 
-@router.post("/{task_id}/unpick")
-def unpick_task(task_id: int, db: Session = Depends(get_db), current_user: schemas.User = Depends(auth.get_current_user)):
-    db_task = db.query(models.Task).filter(models.Task.task_id == task_id).first()
-    if not db_task:
+@router.get("/{task_id}/attachments", response_model=List[schemas.TaskAttachment])
+def read_task_attachments(task_id: int, db: Session = Depends(get_db), current_user: schemas.User = Depends(auth.get_current_user)):
+    if not _task_exists(db, task_id):
+        raise HTTPException(status_code=404, detail="Task not found")
+    return db.query(models.TaskAttachment).filter(models.TaskAttachment.task_id == task_id).order_by(
+        models.TaskAttachment.uploaded_at.desc(), models.TaskAttachment.attachment_id.desc()
+    ).all()
+
+@router.post("/{task_id}/attachments", response_model=schemas.TaskAttachment, status_code=status.HTTP_201_CREATED)
+async def upload_task_attachment(
+    task_id: int,
+    request: Request,
+    file_name: str = Query(..., min_length=1, max_length=500),
+    is_output: bool = False,
+    file_category: Optional[str] = Query(None, max_length=50),
+    content_length: Optional[int] = Header(None),
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(auth.get_current_user)
+):
+    """Streams the request body to attachment storage.
+
+    The body is the file itself (not multipart form data), with its Content-Type;
+    the name goes in `file_name`. It is written to disk chunk by chunk as it
+    arrives, so memory use doesn't grow with the file size. Content already in
+    the store (same SHA-256) is not stored again; the new attachment shares it.
+    """
+    if content_length is not None and content_length > attachment_storage.MAX_ATTACHMENT_BYTES:
+        raise HTTPException(status_code=413, detail=f"Attachments are limited to {attachment_storage.MAX_ATTACHMENT_BYTES} bytes")
+    if not await run_in_threadpool(_task_exists, db, task_id):
         raise HTTPException(status_code=404, detail="Task not found")
-    
-    # Check permissions: Only assigned user or admin/manager can unpick
-    if db_task.assigned_user_id != current_user.id and current_user.role not in [models.UserRole.admin, models.UserRole.manager]:
-        raise HTTPException(status_code=403, detail="You can only unpick tasks assigned to you")
 
-    if db_task.status != "In Progress":
-        raise HTTPException(status_code=400, detail="Only 'In Progress' tasks can be unpicked")
-    
-    # Revert to Pending
-    db_task.status = "Pending"
-    db_task.assigned_user_id = None
-    db_task.assigned_at = None
-    db_task.picked_at = None
-    
-    # Update UserPerformance (decrement in_progress)
-    today = date.today()
-    perf = db.query(models.UserPerformance).filter(
-        models.UserPerformance.user_id == current_user.id,
-        models.UserPerformance.metric_date == today
-    ).first()
-    
-    if perf and perf.tasks_in_progress > 0:
-        perf.tasks_in_progress -= 1
-    
-    db.commit()
-    db.refresh(db_task)
-    return {"message": "Task unpicked successfully", "task": db_task}
+    try:
+        staged = await attachment_storage.stage_stream(request.stream())
+    except attachment_storage.AttachmentTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
 
-@router.post("/{task_id}/complete", response_model=schemas.Task)
-def complete_task(task_id: int, completion_data: schemas.TaskComplete, db: Session = Depends(get_db), current_user: schemas.User = Depends(auth.get_current_user)):
-    db_task = db.query(models.Task).filter(models.Task.task_id == task_id).first()
-    if not db_task:
+    content_type = request.headers.get("content-type")
+    attachment = models.TaskAttachment(
+        task_id=task_id,
+        file_name=os.path.basename(file_name),
+        file_type=content_type[:50] if content_type else None,
+        file_size_bytes=staged.size,
+        storage_path=staged.storage_path,
+        content_sha256=staged.sha256,
+        uploaded_by=current_user.id,
+        is_output=is_output,
+        file_category=file_category
+    )
+    try:
+        await run_in_threadpool(_save_attachment, db, attachment, staged)
+    except IntegrityError:
+        # The task was deleted while the upload was in flight
+        db.rollback()
+        attachment_storage.discard(staged)
         raise HTTPException(status_code=404, detail="Task not found")
-    
-    # Check permissions: Only assigned user or admin/manager can complete
-    if db_task.assigned_user_id != current_user.id and current_user.role not in [models.UserRole.admin, models.UserRole.manager]:
-        raise HTTPException(status_code=403, detail="You can only complete tasks assigned to you")
-
-    if db_task.status == "Completed":
-         raise HTTPException(status_code=400, detail="Task is already completed")
-
-    # Update Task
-    db_task.status = "Completed"
-    db_task.achieved_qty = completion_data.achieved_qty
-    db_task.remarks = completion_data.remarks
-    db_task.completed_at = datetime.now()
-    
-    # Update UserPerformance
-    today = date.today()
-    perf = db.query(models.UserPerformance).filter(
-        models.UserPerformance.user_id == current_user.id,
-        models.UserPerformance.metric_date == today
-    ).first()
-    
-    if not perf:
-        perf = models.UserPerformance(
-            user_id=current_user.id,
-            metric_date=today,
-            tasks_assigned=0,
-            tasks_in_progress=0,
-            tasks_completed=0
-        )
-        db.add(perf)
-    
-    if perf.tasks_in_progress > 0:
-        perf.tasks_in_progress -= 1
-    perf.tasks_completed += 1
-    
-    # Workflow Volume Sync
-    if db_task.workflow_config_id:
-        qty_to_add = db_task.achieved_qty if db_task.achieved_qty > 0 else 1
-        increment_workflow_volume(db, db_task.workflow_config_id, current_user.id, today, qty_to_add)
+    except Exception:
+        db.rollback()
+        attachment_storage.discard(staged)
+        raise
+    return attachment
 
+@router.get("/{task_id}/attachments/{attachment_id}")
+def download_task_attachment(task_id: int, attachment_id: int, inline: bool = False, db: Session = Depends(get_db), current_user: schemas.User = Depends(auth.get_current_user)):
+    """Serves an attachment from storage. Range requests are answered with 206 partial
+    content, so large files can be resumed or read in pieces (e.g. PDF viewers)."""
+    attachment = _get_attachment(db, task_id, attachment_id)
+    try:
+        path = attachment_storage.resolve(attachment.storage_path)
+        stat_result = os.stat(path)
+    except (ValueError, FileNotFoundError):
+        raise HTTPException(status_code=404, detail="Attachment file is missing from storage")
+
+    # FileResponse streams from disk in chunks, or hands the path to the server where it supports zero-copy sends
+    return FileResponse(
+        path,
+        media_type=attachment.file_type or "application/octet-stream",
+        filename=attachment.file_name,
+        stat_result=stat_result,
+        content_disposition_type="inline" if inline else "attachment"
+    )
+
+@router.delete("/{task_id}/attachments/{attachment_id}")
+def delete_task_attachment(task_id: int, attachment_id: int, db: Session = Depends(get_db), current_user: schemas.User = Depends(auth.get_current_user)):
+    attachment = _get_attachment(db, task_id, attachment_id)
+    if current_user.role not in [models.UserRole.admin, models.UserRole.manager] and attachment.uploaded_by != current_user.id:
+        raise HTTPException(status_code=403, detail="You can only delete attachments you uploaded")
+
+    storage_path, shared = attachment.storage_path, attachment.content_sha256 is not None
+    db.delete(attachment)
     db.commit()
-    db.refresh(db_task)
-    return db_task
+    # Content-addressed files may be shared; the collector removes them once unreferenced.
+    # Older per-upload files are removed here, after the row, so a failed unlink leaves an orphan rather than a dangling row.
+    if not shared:
+        attachment_storage.delete_file(storage_path)
+    return {"message": "Attachment deleted successfully"}
+
+@router.post("/{task_id}/pick")
+def pick_task(task_id: int, db: Session = Depends(get_db), current_user: schemas.User = Depends(auth.get_current_user)):
+    try:
+        db_task = task_transitions.pick(db, task_id, current_user)
+    except task_transitions.TransitionError as e:
+        db.rollback()
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return {"message": "Task picked up successfully", "task": task_transitions.commit(db, db_task)}
 
-def decrement_metrics(db: Session, task: models.Task):
-    """Helper to decrement metrics when a task is deleted."""
-    if not task.assigned_user_id:
-        return
-
-    # 1. UserPerformance
-    # Decrement Assigned Count (based on assigned_at date)
-    if task.assigned_at:
-        perf_assigned = db.query(models.UserPerformance).filter(
-            models.UserPerformance.user_id == task.assigned_user_id,
-            models.UserPerformance.metric_date == task.assigned_at.date()
-        ).first()
-        if perf_assigned and perf_assigned.tasks_assigned > 0:
-            perf_assigned.tasks_assigned -= 1
-
-    # Decrement Completed Count (based on completed_at date)
-    if task.status == "Completed" and task.completed_at:
-        perf_completed = db.query(models.UserPerformance).filter(
-            models.UserPerformance.user_id == task.assigned_user_id,
-            models.UserPerformance.metric_date == task.completed_at.date()
-        ).first()
-        if perf_completed and perf_completed.tasks_completed > 0:
-            perf_completed.tasks_completed -= 1
-            
-        # Also decrement WorkflowDailyVolume
-        if task.workflow_config_id:
-            wf_config = db.query(models.WorkflowConfig).filter(models.WorkflowConfig.config_id == task.workflow_config_id).first()
-            if wf_config:
-                vol = db.query(models.WorkflowDailyVolume).filter(
-                    models.WorkflowDailyVolume.date == task.completed_at.date(),
-                    models.WorkflowDailyVolume.workflow_type == wf_config.workflow_type,
-                    models.WorkflowDailyVolume.analyst_id == task.assigned_user_id
-                ).first()
-                if vol:
-                    # task.achieved_qty might be > 1. Let's check model.
-                    # Model has achieved_qty. Let's use that if > 0, else 1.
-                    qty_to_remove = task.achieved_qty if task.achieved_qty > 0 else 1
-                    vol.quantity -= qty_to_remove
-                    if vol.quantity < 0: vol.quantity = 0
-
-    # Decrement In Progress Count (Current Day - Best Effort for Dashboard Sync)
-    # Since dashboard shows 'today's' in_progress, we decrement if it matches today.
-    # Or if the task is currently In Progress, we decrement today's counter if it was incremented today?
-    # Logic: pick_task increments today's counter. 
-    # If we delete an In Progress task, we should decrement the counter for the day it was picked.
-    if task.status == "In Progress" and task.picked_at:
-        perf_picked = db.query(models.UserPerformance).filter(
-            models.UserPerformance.user_id == task.assigned_user_id,
-            models.UserPerformance.metric_date == task.picked_at.date()
-        ).first()
-        if perf_picked and perf_picked.tasks_in_progress > 0:
-            perf_picked.tasks_in_progress -= 1
+@router.post("/{task_id}/unpick")
+def unpick_task(task_id: int, db: Session = Depends(get_db), current_user: schemas.User = Depends(auth.get_current_user)):
+    try:
+        db_task = task_transitions.unpick(db, task_id, current_user)
+    except task_transitions.TransitionError as e:
+        db.rollback()
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return {"message": "Task unpicked successfully", "task": task_transitions.commit(db, db_task)}
+
+@router.post("/{task_id}/complete", response_model=schemas.Task)
+def complete_task(task_id: int, completion_data: schemas.TaskComplete, db: Session = Depends(get_db), current_user: schemas.User = Depends(auth.get_current_user)):
+    try:
+        db_task = task_transitions.complete(db, task_id, current_user, completion_data.achieved_qty, completion_data.remarks)
+    except task_transitions.TransitionError as e:
+        db.rollback()
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    # Workflow volume was recorded by the transition itself
+    return task_transitions.commit(db, db_task)
 
 @router.delete("/{task_id}")
 def delete_task(task_id: int, db: Session = Depends(get_db), current_user: schemas.User = Depends(auth.get_current_user)):
     if current_user.role not in [models.UserRole.admin, models.UserRole.manager]:
         raise HTTPException(status_code=403, detail="Only admins and managers can delete tasks")
-        
-    db_task = db.query(models.Task).filter(models.Task.task_id == task_id).first()
-    if not db_task:
+
+    # Deletes and reverses the task's metrics in one pass
+    report = task_bulk.delete_tasks(db, [task_id])
+    if not report["deleted_count"]:
+        db.rollback()
         raise HTTPException(status_code=404, detail="Task not found")
-    
-    # Decrement metrics before deleting
-    decrement_metrics(db, db_task)
-        
-    db.delete(db_task)
     db.commit()
     return {"message": "Task deleted successfully"}
 
@@ -517,52 +784,135 @@ def delete_task(task_id: int, db: Session = Depends(get_db), current_user: schem
 def bulk_delete_tasks(request: schemas.BulkDeleteRequest, db: Session = Depends(get_db), current_user: schemas.User = Depends(auth.get_current_user)):
     if current_user.role not in [models.UserRole.admin, models.UserRole.manager]:
         raise HTTPException(status_code=403, detail="Only admins and managers can delete tasks")
-    
-    tasks_to_delete = db.query(models.Task).filter(models.Task.task_id.in_(request.task_ids)).all()
-    
-    for task in tasks_to_delete:
-        decrement_metrics(db, task)
-    
-    # Now delete
-    db.query(models.Task).filter(models.Task.task_id.in_(request.task_ids)).delete(synchronize_session=False)
+
+    report = task_bulk.delete_tasks(db, request.task_ids)
     db.commit()
-    return {"message": f"Successfully deleted {len(request.task_ids)} tasks"}
+    return {"message": f"Successfully deleted {report['deleted_count']} tasks", **report}
+
+def _bulk_selection(db: Session, task_ids: Optional[List[int]], filters: Optional[schemas.TaskFilter]):
+    """Query for the tasks a bulk request targets: the listed ids, the filter, or both."""
+    if filters is not None and not filters.dict(exclude_none=True):
+        filters = None
+    if task_ids is None and filters is None:
+        raise HTTPException(status_code=400, detail="Provide task_ids, filters or both")
+
+    query = db.query(models.Task)
+    if task_ids is not None:
+        query = query.filter(models.Task.task_id.in_(task_ids))
+    if filters is not None:
+        query = apply_task_filters(query, task_filter_params(
+            status_filter=filters.status,
+            priority=filters.priority,
+            task_type=filters.task_type,
+            assigned_user_id=filters.assigned_user_id,
+            workflow_config_id=filters.workflow_config_id,
+            created_from=filters.created_from,
+            created_to=filters.created_to,
+            due_from=filters.due_from,
+            due_to=filters.due_to,
+        ))
+    return query
+
+def _bulk_results(db: Session, task_ids: Optional[List[int]], rows, outcome_for) -> List[dict]:
+    """Per-id outcomes: one for every changed task, plus why each requested id was not changed."""
+    results = [{"task_id": task_id, "outcome": outcome_for(old_status)} for task_id, old_status in rows]
+    changed = {task_id for task_id, _ in rows}
+    missed = [task_id for task_id in dict.fromkeys(task_ids or []) if task_id not in changed]
+    if missed:
+        current = dict(db.query(models.Task.task_id, models.Task.status).filter(models.Task.task_id.in_(missed)).all())
+        for task_id in missed:
+            if task_id not in current:
+                outcome = "not_found"
+            elif current[task_id] == "Completed":
+                outcome = "already_completed"
+            else:
+                outcome = "not_matched"
+            results.append({"task_id": task_id, "outcome": outcome})
+    return results
+
+@router.post("/bulk-update")
+def bulk_update_tasks(request: schemas.BulkUpdateRequest, db: Session = Depends(get_db), current_user: schemas.User = Depends(auth.get_current_user)):
+    """Applies one field patch to many tasks with a single UPDATE. Setting status to
+    Completed records completion metrics for tasks that weren't completed yet."""
+    if current_user.role not in [models.UserRole.admin, models.UserRole.manager]:
+        raise HTTPException(status_code=403, detail="Only admins and managers can bulk update tasks")
+
+    values = request.patch.dict(exclude_unset=True)
+    if not values:
+        raise HTTPException(status_code=400, detail="Patch is empty")
+    _validate_choices([values["status"]] if "status" in values else None, [s.value for s in models.TaskStatus], "status")
+    _validate_choices([values["priority"]] if "priority" in values else None, [p.value for p in models.TaskPriority], "priority")
+
+    selection = _bulk_selection(db, request.task_ids, request.filters)
+    report = task_bulk.update_tasks(db, selection, values, current_user.id)
+    completing = values.get("status") == "Completed"
+    results = _bulk_results(
+        db, request.task_ids, report["rows"],
+        lambda old_status: "completed" if completing and old_status != "Completed" else "updated"
+    )
+    db.commit()
+    return {
+        "message": f"Successfully updated {len(report['rows'])} tasks",
+        "updated_count": len(report["rows"]),
+        "results": results,
+        "adjustments": report["adjustments"]
+    }
+
+@router.post("/bulk-complete")
+def bulk_complete_tasks(request: schemas.BulkCompleteRequest, db: Session = Depends(get_db), current_user: schemas.User = Depends(auth.get_current_user)):
+    """Completes many tasks at once. Already completed tasks are skipped and reported."""
+    if current_user.role not in [models.UserRole.admin, models.UserRole.manager]:
+        raise HTTPException(status_code=403, detail="Only admins and managers can bulk complete tasks")
+
+    values = {"status": "Completed"}
+    if request.achieved_qty is not None:
+        values["achieved_qty"] = request.achieved_qty
+    if request.remarks is not None:
+        values["remarks"] = request.remarks
+
+    selection = _bulk_selection(db, request.task_ids, request.filters)
+    report = task_bulk.update_tasks(db, selection, values, current_user.id, skip_completed=True)
+    results = _bulk_results(db, request.task_ids, report["rows"], lambda old_status: "completed")
+    db.commit()
+    return {
+        "message": f"Successfully completed {len(report['rows'])} tasks",
+        "completed_count": len(report["rows"]),
+        "results": results,
+        "adjustments": report["adjustments"]
+    }
 
 @router.post("/bulk-assign")
 def bulk_assign_tasks(request: schemas.BulkAssignRequest, db: Session = Depends(get_db), current_user: schemas.User = Depends(auth.get_current_user)):
     if current_user.role not in [models.UserRole.admin, models.UserRole.manager]:
         raise HTTPException(status_code=403, detail="Only admins and managers can assign tasks")
-    
-    tasks = db.query(models.Task).filter(models.Task.task_id.in_(request.task_ids)).all()
-    assigned_count = 0
-    
-    for task in tasks:
-        task.assigned_user_id = request.user_id
-        task.assigned_at = datetime.now()
-        if task.status == "Pending":
-            # Optional: Move to In Progress or keep Pending?
-            # For now, keeping as Pending but assigned.
-            pass
-        assigned_count += 1
-        
-        # Update UserPerformance (Assigned Count)
-        today = date.today()
-        perf = db.query(models.UserPerformance).filter(
-            models.UserPerformance.user_id == request.user_id,
-            models.UserPerformance.metric_date == today
-        ).first()
-        
-        if not perf:
-            perf = models.UserPerformance(
-                user_id=request.user_id,
-                metric_date=today,
-                tasks_assigned=0,
-                tasks_in_progress=0,
-                tasks_completed=0
-            )
-            db.add(perf)
-        
-        perf.tasks_assigned += 1
-        
+
+    # Tasks stay in their current status (Pending tasks remain Pending, but assigned)
+    assigned_count = task_bulk.assign_tasks(db, request.task_ids, request.user_id)
     db.commit()
     return {"message": f"Successfully assigned {assigned_count} tasks"}
+
+@router.post("/bulk-distribute")
+def bulk_distribute_tasks(request: schemas.BulkDistributeRequest, db: Session = Depends(get_db), current_user: schemas.User = Depends(auth.get_current_user)):
+    """Spreads the tasks across several analysts, round-robin or balanced by their open task count."""
+    if current_user.role not in [models.UserRole.admin, models.UserRole.manager]:
+        raise HTTPException(status_code=403, detail="Only admins and managers can assign tasks")
+    _validate_choices([request.strategy], task_bulk.DISTRIBUTION_STRATEGIES, "strategy")
+    if not request.user_ids:
+        raise HTTPException(status_code=400, detail="At least one user_id is required")
+
+    active_users = {user_id for (user_id,) in db.query(models.User.id).filter(
+        models.User.id.in_(request.user_ids),
+        models.User.is_active.isnot(False)
+    )}
+    unknown = [str(user_id) for user_id in request.user_ids if user_id not in active_users]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown or inactive users: {', '.join(unknown)}")
+
+    distribution = task_bulk.distribute_tasks(db, request.task_ids, request.user_ids, request.strategy)
+    db.commit()
+    assigned_count = sum(distribution.values())
+    return {
+        "message": f"Successfully assigned {assigned_count} tasks",
+        "assigned_count": assigned_count,
+        "distribution": {str(user_id): count for user_id, count in distribution.items()}
+    }
@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
 from typing import List
-import models, schemas, database
+import models, schemas, database, metrics
 from . import auth
 from datetime import date
+from collections import defaultdict
+import uuid
 
 router = APIRouter(
     prefix="/workflows",
@@ -62,39 +63,52 @@ def delete_workflow(config_id: int, db: Session = Depends(database.get_db), curr
     db.commit()
     return None
 
+def _volume_workflow_type(value: str) -> models.WorkflowType:
+    try:
+        return models.WorkflowType(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid workflow_type '{value}'")
+
+def _volume_analyst_id(value, current_user) -> uuid.UUID:
+    """The analyst a volume entry is for: the given id, or the current user when none is given."""
+    if not value:
+        return current_user.id
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid analyst_id '{value}'")
+
 @router.post("/volume", response_model=schemas.WorkflowVolume)
 def record_daily_volume(volume: schemas.WorkflowVolumeCreate, db: Session = Depends(database.get_db), current_user: schemas.User = Depends(auth.get_current_user)):
-    # Check if volume already exists for this date/workflow/analyst
     # If analyst_id is not provided, use current user
-    target_analyst_id = volume.analyst_id if volume.analyst_id else current_user.id
+    target_analyst_id = _volume_analyst_id(volume.analyst_id, current_user)
     
     # If user is analyst, they can only record for themselves
     if current_user.role == "analyst" and str(target_analyst_id) != str(current_user.id):
          raise HTTPException(status_code=403, detail="Analysts can only record their own volume")
 
-    existing_volume = db.query(models.WorkflowDailyVolume).filter(
-        models.WorkflowDailyVolume.workflow_type == volume.workflow_type,
-        models.WorkflowDailyVolume.date == volume.date,
-        models.WorkflowDailyVolume.analyst_id == target_analyst_id
-    ).first()
+    # Insert, or overwrite the existing row for this date/workflow/analyst
+    db_volume = metrics.set_workflow_volume(
+        db, _volume_workflow_type(volume.workflow_type), volume.date, target_analyst_id, volume.quantity
+    )
+    db.commit()
+    db.refresh(db_volume)
+    return db_volume
+
+@router.post("/volume/bulk")
+def add_daily_volumes(volumes: List[schemas.WorkflowVolumeCreate], db: Session = Depends(database.get_db), current_user: schemas.User = Depends(auth.get_current_user)):
+    """Adds many volume deltas at once. Unlike POST /volume, quantities are added to
+    the existing totals; entries for the same date/workflow/analyst are combined."""
+    deltas = defaultdict(int)
+    for volume in volumes:
+        target_analyst_id = _volume_analyst_id(volume.analyst_id, current_user)
+        if current_user.role == "analyst" and str(target_analyst_id) != str(current_user.id):
+            raise HTTPException(status_code=403, detail="Analysts can only record their own volume")
+        deltas[(_volume_workflow_type(volume.workflow_type), volume.date, target_analyst_id)] += volume.quantity
 
-    if existing_volume:
-        # Update existing
-        existing_volume.quantity = volume.quantity
-        existing_volume.recorded_at = func.now()
-        db.commit()
-        db.refresh(existing_volume)
-        return existing_volume
-    else:
-        # Create new
-        db_volume = models.WorkflowDailyVolume(**volume.dict())
-        if not db_volume.analyst_id:
-            db_volume.analyst_id = target_analyst_id
-        
-        db.add(db_volume)
-        db.commit()
-        db.refresh(db_volume)
-        return db_volume
+    metrics.apply_volume_deltas(db, deltas)
+    db.commit()
+    return {"message": f"Recorded {len(volumes)} volume entries", "rows_affected": len([q for q in deltas.values() if q])}
 
 @router.get("/volume", response_model=List[schemas.WorkflowVolume])
 def get_daily_volumes(
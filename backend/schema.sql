@@ -115,6 +115,8 @@ CREATE TABLE IF NOT EXISTS tasks (
     -- Dates and tracking
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    version INTEGER NOT NULL DEFAULT 1, -- optimistic concurrency; bumped on every update by bump_task_version()
+    change_xid BIGINT NOT NULL DEFAULT 0, -- last writing transaction, set by stamp_task_change(); orders /tasks/changes
     tier1_started_at TIMESTAMP WITH TIME ZONE,
     tier1_completed_at TIMESTAMP WITH TIME ZONE,
     tier2_started_at TIMESTAMP WITH TIME ZONE,
@@ -146,6 +148,13 @@ CREATE TABLE IF NOT EXISTS tasks (
 );
 
 -- Task files/attachments
+-- Deleted tasks, for the /tasks/changes feed (written by record_task_tombstones())
+CREATE TABLE IF NOT EXISTS task_tombstones (
+    task_id INTEGER PRIMARY KEY,
+    change_xid BIGINT NOT NULL,
+    deleted_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
 CREATE TABLE IF NOT EXISTS task_attachments (
     attachment_id SERIAL PRIMARY KEY,
     task_id INTEGER NOT NULL REFERENCES tasks(task_id) ON DELETE CASCADE,
@@ -158,7 +167,17 @@ CREATE TABLE IF NOT EXISTS task_attachments (
     
     -- File metadata
     is_output BOOLEAN DEFAULT FALSE, -- TRUE for completed work files
-    file_category VARCHAR(50) -- '10-Q', '10-K', 'email', 'output'
+    file_category VARCHAR(50), -- '10-Q', '10-K', 'email', 'output'
+    content_sha256 CHAR(64) -- content address in attachment storage; NULL for pre-deduplication files
+);
+
+-- Stored attachment files, one per distinct content; ref_count is kept by triggers on task_attachments
+CREATE TABLE IF NOT EXISTS attachment_blobs (
+    sha256 CHAR(64) PRIMARY KEY,
+    size_bytes BIGINT NOT NULL,
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    unreferenced_since TIMESTAMP WITH TIME ZONE
 );
 
 -- Task history/audit log
@@ -239,6 +258,7 @@ CREATE TABLE IF NOT EXISTS email_triggers (
 -- Processed emails log
 CREATE TABLE IF NOT EXISTS processed_emails (
     email_id SERIAL PRIMARY KEY,
+    message_id VARCHAR(998), -- unique; see idx_processed_emails_message_id
     trigger_id INTEGER REFERENCES email_triggers(trigger_id),
     
     -- Email details
@@ -249,8 +269,8 @@ CREATE TABLE IF NOT EXISTS processed_emails (
     
     -- Processing
     processed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-    task_created_id INTEGER REFERENCES tasks(task_id),
-    processing_status VARCHAR(50), -- 'success', 'failed', 'duplicate'
+    task_created_id INTEGER REFERENCES tasks(task_id) ON DELETE SET NULL,
+    processing_status VARCHAR(50), -- 'success', 'matched', 'ignored', 'failed'
     error_message TEXT
 );
 
@@ -313,6 +333,21 @@ CREATE TABLE IF NOT EXISTS notifications (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- SLA alerts already raised, one per (task, level, due date); see sla_monitor.py
+CREATE TABLE IF NOT EXISTS sla_alerts (
+    task_id INTEGER NOT NULL REFERENCES tasks(task_id) ON DELETE CASCADE,
+    level VARCHAR(20) NOT NULL, -- 'at_risk', 'breached'
+    due_date TIMESTAMP WITH TIME ZONE NOT NULL,
+    alerted_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (task_id, level, due_date)
+);
+
+-- Single row: the time the last SLA sweep covered up to; see sla_monitor.py
+CREATE TABLE IF NOT EXISTS sla_sweep_state (
+    sweep_id INTEGER PRIMARY KEY CHECK (sweep_id = 1),
+    swept_until TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
 -- ============================================
 -- INDEXES for Performance
 -- ============================================
@@ -320,10 +355,40 @@ CREATE TABLE IF NOT EXISTS notifications (
 CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
 CREATE INDEX IF NOT EXISTS idx_tasks_assigned_user ON tasks(assigned_user_id);
 CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks(created_at);
+CREATE INDEX IF NOT EXISTS idx_tasks_updated_at ON tasks(updated_at);
+CREATE INDEX IF NOT EXISTS idx_tasks_created_at_id ON tasks(created_at DESC, task_id DESC);
+CREATE INDEX IF NOT EXISTS idx_tasks_workflow_created_at_id ON tasks(workflow_config_id, created_at DESC, task_id DESC);
+CREATE INDEX IF NOT EXISTS idx_tasks_status_created_at_id ON tasks(status, created_at DESC, task_id DESC);
+CREATE INDEX IF NOT EXISTS idx_tasks_assigned_created_at_id ON tasks(assigned_user_id, created_at DESC, task_id DESC);
+CREATE INDEX IF NOT EXISTS idx_tasks_due_date ON tasks(due_date);
+CREATE INDEX IF NOT EXISTS idx_tasks_task_type ON tasks(task_type);
+CREATE INDEX IF NOT EXISTS idx_tasks_pending_queue ON tasks(priority DESC, due_date ASC NULLS LAST, created_at, task_id) WHERE status = 'Pending';
+CREATE INDEX IF NOT EXISTS idx_tasks_pending_queue_workflow ON tasks(workflow_config_id, priority DESC, due_date ASC NULLS LAST, created_at, task_id) WHERE status = 'Pending';
 CREATE INDEX IF NOT EXISTS idx_tasks_priority ON tasks(priority);
 CREATE INDEX IF NOT EXISTS idx_tasks_company ON tasks(company_name);
+
+-- Full-text + fuzzy search (GET /tasks/search)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', coalesce(company_name, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(description, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(notes, '')), 'C') ||
+    setweight(to_tsvector('english', coalesce(remarks, '')), 'C')
+) STORED;
+CREATE INDEX IF NOT EXISTS idx_tasks_search_vector ON tasks USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_tasks_company_trgm ON tasks USING GIN (company_name gin_trgm_ops);
+
 CREATE INDEX IF NOT EXISTS idx_task_history_task_id ON task_history(task_id);
+CREATE INDEX IF NOT EXISTS idx_task_history_task_changed_at ON task_history(task_id, changed_at DESC, history_id DESC);
+CREATE INDEX IF NOT EXISTS idx_task_comments_task_created_at ON task_comments(task_id, created_at DESC, comment_id DESC);
 CREATE INDEX IF NOT EXISTS idx_task_attachments_task_id ON task_attachments(task_id);
+CREATE INDEX IF NOT EXISTS idx_tasks_open_due_date ON tasks(due_date) WHERE status <> 'Completed' AND due_date IS NOT NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_processed_emails_message_id ON processed_emails(message_id);
+CREATE INDEX IF NOT EXISTS idx_attachment_blobs_unreferenced ON attachment_blobs(unreferenced_since) WHERE ref_count <= 0;
+CREATE INDEX IF NOT EXISTS idx_tasks_change_xid ON tasks(change_xid, task_id);
+CREATE INDEX IF NOT EXISTS idx_task_tombstones_change_xid ON task_tombstones(change_xid, task_id);
+CREATE INDEX IF NOT EXISTS idx_notifications_user_id ON notifications(user_id, notification_id);
+CREATE INDEX IF NOT EXISTS idx_notifications_user_unread ON notifications(user_id) WHERE NOT is_read;
 CREATE INDEX IF NOT EXISTS idx_user_performance_user_date ON user_performance(user_id, metric_date);
 
 -- ============================================
@@ -348,10 +413,116 @@ DROP TRIGGER IF EXISTS update_tasks_updated_at ON tasks;
 CREATE TRIGGER update_tasks_updated_at BEFORE UPDATE ON tasks
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+-- Every write to a task gets a new version, however it was issued
+CREATE OR REPLACE FUNCTION bump_task_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.version = OLD.version + 1;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS bump_task_version ON tasks;
+CREATE TRIGGER bump_task_version BEFORE UPDATE ON tasks
+    FOR EACH ROW EXECUTE FUNCTION bump_task_version();
+
+-- Stamp every task write with its transaction id, for the change feed
+CREATE OR REPLACE FUNCTION stamp_task_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.change_xid = pg_current_xact_id()::text::bigint;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS stamp_task_change ON tasks;
+CREATE TRIGGER stamp_task_change BEFORE INSERT OR UPDATE ON tasks
+    FOR EACH ROW EXECUTE FUNCTION stamp_task_change();
+
+-- Leave a tombstone for every deleted task, one INSERT per DELETE statement
+CREATE OR REPLACE FUNCTION record_task_tombstones()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO arms_workflow.task_tombstones (task_id, change_xid)
+    SELECT task_id, pg_current_xact_id()::text::bigint FROM deleted_tasks
+    ON CONFLICT (task_id) DO UPDATE
+        SET change_xid = EXCLUDED.change_xid, deleted_at = NOW();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS record_task_tombstones ON tasks;
+CREATE TRIGGER record_task_tombstones AFTER DELETE ON tasks
+    REFERENCING OLD TABLE AS deleted_tasks
+    FOR EACH STATEMENT EXECUTE FUNCTION record_task_tombstones();
+
 DROP TRIGGER IF EXISTS update_workflow_configs_updated_at ON workflow_configs;
 CREATE TRIGGER update_workflow_configs_updated_at BEFORE UPDATE ON workflow_configs
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+-- Attachment blob reference counts, adjusted once per statement
+CREATE OR REPLACE FUNCTION reference_attachment_blobs()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO arms_workflow.attachment_blobs (sha256, size_bytes, ref_count)
+    SELECT content_sha256, MAX(file_size_bytes), COUNT(*)
+    FROM new_attachments
+    WHERE content_sha256 IS NOT NULL
+    GROUP BY content_sha256
+    ON CONFLICT (sha256) DO UPDATE
+        SET ref_count = attachment_blobs.ref_count + EXCLUDED.ref_count,
+            unreferenced_since = NULL;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION release_attachment_blobs()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE arms_workflow.attachment_blobs b
+    SET ref_count = b.ref_count - released.released_count,
+        unreferenced_since = CASE WHEN b.ref_count - released.released_count <= 0 THEN NOW() END
+    FROM (
+        SELECT content_sha256, COUNT(*) AS released_count
+        FROM old_attachments
+        WHERE content_sha256 IS NOT NULL
+        GROUP BY content_sha256
+    ) released
+    WHERE b.sha256 = released.content_sha256;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS reference_attachment_blobs ON task_attachments;
+CREATE TRIGGER reference_attachment_blobs AFTER INSERT ON task_attachments
+    REFERENCING NEW TABLE AS new_attachments
+    FOR EACH STATEMENT EXECUTE FUNCTION reference_attachment_blobs();
+
+DROP TRIGGER IF EXISTS release_attachment_blobs ON task_attachments;
+CREATE TRIGGER release_attachment_blobs AFTER DELETE ON task_attachments
+    REFERENCING OLD TABLE AS old_attachments
+    FOR EACH STATEMENT EXECUTE FUNCTION release_attachment_blobs();
+
+-- Wake notification streams (see notification_stream.py), one NOTIFY per affected user and statement
+CREATE OR REPLACE FUNCTION notify_notification_changes()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('arms_notifications', json_build_object('user_id', user_id)::text)
+    FROM (SELECT DISTINCT user_id FROM changed_notifications) changed;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS notify_notification_inserts ON notifications;
+CREATE TRIGGER notify_notification_inserts AFTER INSERT ON notifications
+    REFERENCING NEW TABLE AS changed_notifications
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_notification_changes();
+
+DROP TRIGGER IF EXISTS notify_notification_updates ON notifications;
+CREATE TRIGGER notify_notification_updates AFTER UPDATE ON notifications
+    REFERENCING NEW TABLE AS changed_notifications
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_notification_changes();
+
 -- Function to log task changes
 CREATE OR REPLACE FUNCTION log_task_changes()
 RETURNS TRIGGER AS $$
@@ -67,6 +67,8 @@ class TaskUpdate(BaseModel):
     achieved_qty: Optional[int] = None
     rating: Optional[int] = None
     remarks: Optional[str] = None
+    # Version the client last read; the update is rejected with 409 if the task changed since
+    version: Optional[int] = None
 
 class TaskComplete(BaseModel):
     achieved_qty: int
@@ -79,15 +81,99 @@ class BulkAssignRequest(BaseModel):
     task_ids: List[int]
     user_id: Union[str, UUID]
 
+class TaskFilter(BaseModel):
+    # Same filters as the GET /tasks query parameters
+    status: Optional[List[str]] = None
+    priority: Optional[List[str]] = None
+    task_type: Optional[List[str]] = None
+    assigned_user_id: Optional[List[str]] = None
+    workflow_config_id: Optional[int] = None
+    created_from: Optional[date] = None
+    created_to: Optional[date] = None
+    due_from: Optional[date] = None
+    due_to: Optional[date] = None
+
+class TaskBulkPatch(BaseModel):
+    # TaskUpdate without version: a bulk update has no per-task precondition to check,
+    # so a version is rejected (422) rather than silently ignored
+    status: Optional[str] = None
+    priority: Optional[str] = None
+    assigned_user_id: Optional[Union[str, UUID]] = None
+    notes: Optional[str] = None
+    description: Optional[str] = None
+    target_qty: Optional[int] = None
+    achieved_qty: Optional[int] = None
+    rating: Optional[int] = None
+    remarks: Optional[str] = None
+
+    class Config:
+        extra = "forbid"
+
+class BulkUpdateRequest(BaseModel):
+    # Target tasks by id, by filter, or both (tasks must match both)
+    task_ids: Optional[List[int]] = None
+    filters: Optional[TaskFilter] = None
+    patch: TaskBulkPatch
+
+class BulkCompleteRequest(BaseModel):
+    task_ids: Optional[List[int]] = None
+    filters: Optional[TaskFilter] = None
+    # Left unset, each task keeps its own achieved_qty
+    achieved_qty: Optional[int] = None
+    remarks: Optional[str] = None
+
+class BulkDistributeRequest(BaseModel):
+    task_ids: List[int]
+    user_ids: List[UUID]
+    # "round_robin", or "balanced" to fill up the analysts with the fewest open tasks first
+    strategy: str = "round_robin"
+
 class Task(TaskBase):
     task_id: int
     status: str
+    version: Optional[int] = None
     assigned_user_id: Optional[Union[str, UUID]] = None
     assigned_at: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
     tier1_started_at: Optional[datetime] = None
     tier1_completed_at: Optional[datetime] = None
+
+# Import Job Schemas
+class ImportJob(BaseModel):
+    job_id: UUID
+    file_name: str
+    status: str
+    file_size_bytes: Optional[int] = None
+    bytes_processed: int = 0
+    rows_processed: int = 0
+    total_processed: int = 0
+    success_count: int = 0
+    failed_count: int = 0
+    errors: List[str] = []
+    error_message: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class ImportJobError(BaseModel):
+    row_index: int
+    message: str
+
+    class Config:
+        orm_mode = True
+
+class TaskSearchResult(BaseModel):
+    task: Task
+    rank: float
+    snippet: Optional[str] = None
+
+class TaskChanges(BaseModel):
+    tasks: List[Task] = []
+    deleted: List[int] = []
+    cursor: str
+    has_more: bool = False
+
 class WorkflowConfigBase(BaseModel):
     workflow_name: str
     workflow_type: str
@@ -155,7 +241,7 @@ class WorkflowVolume(BaseModel):
 class TaskHistory(BaseModel):
     history_id: int
     task_id: int
-    changed_by: Optional[str] = None
+    changed_by: Optional[Union[str, UUID]] = None
     changed_at: datetime
     field_name: str
     old_value: Optional[str] = None
@@ -185,6 +271,41 @@ class TaskComment(TaskCommentBase):
     class Config:
         orm_mode = True
 
+class UserSummary(BaseModel):
+    id: Union[str, UUID]
+    username: str
+    full_name: str
+
+    class Config:
+        orm_mode = True
+
+class TaskCommentDetail(TaskComment):
+    user: Optional[UserSummary] = None
+
+class TaskAttachment(BaseModel):
+    attachment_id: int
+    task_id: int
+    file_name: str
+    file_type: Optional[str] = None
+    file_size_bytes: Optional[int] = None
+    uploaded_by: Optional[Union[str, UUID]] = None
+    uploaded_at: datetime
+    is_output: bool = False
+    file_category: Optional[str] = None
+    content_sha256: Optional[str] = None
+
+    class Config:
+        orm_mode = True
+
+class TaskFull(BaseModel):
+    task: Task
+    assignee: Optional[UserSummary] = None
+    comments: List[TaskCommentDetail] = []
+    comments_next_cursor: Optional[str] = None
+    history: List[TaskHistory] = []
+    history_next_cursor: Optional[str] = None
+    attachments: List[TaskAttachment] = []
+
 # Notification Schemas
 class NotificationBase(BaseModel):
     title: str
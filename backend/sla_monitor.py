@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+from datetime import timedelta, timezone
+from sqlalchemy import case, func, insert, literal, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+import models, database
+
+# SLA monitor.
+# A periodic sweep finds open tasks whose due_date has passed ("breached") or
+# falls within SLA_WARNING window ("at_risk"), and notifies the assignee (or,
+# for unassigned tasks, the workflow's primary POC, else the managers).
+#
+# Each sweep records how far it got (sla_sweep_state.swept_until) and the next
+# one only considers open tasks that can have crossed a threshold since then:
+# those due from the watermark on (a range of idx_tasks_open_due_date, a
+# partial index over open tasks with a due date), plus those written since
+# (idx_tasks_updated_at), which covers tasks created, reopened or rescheduled
+# past a threshold. Its cost follows the tasks near their deadline and the
+# recent writes, not the overdue backlog. Each (task, level, due_date) is
+# alerted once: the sweep inserts into sla_alerts with ON CONFLICT DO NOTHING
+# and only notifies for the rows that insert returned. A rescheduled task is
+# alerted again for its new due date.
+
+SLA_WARNING = timedelta(hours=int(os.getenv("SLA_WARNING_HOURS", "4")))
+SLA_SWEEP_INTERVAL_SECONDS = int(os.getenv("SLA_SWEEP_INTERVAL_SECONDS", "300"))
+# Each sweep reaches this far behind the previous one's watermark. Timestamps are
+# transaction start times, so a write that committed after the last sweep may carry
+# an updated_at from before it; this covers transactions up to this long.
+SLA_SWEEP_OVERLAP = timedelta(minutes=10)
+
+MANAGER_ROLES = [models.UserRole.admin, models.UserRole.manager]
+
+ALERT_LEVELS = {
+    "at_risk": ("SLA at risk", models.NotificationType.warning),
+    "breached": ("SLA breached", models.NotificationType.error),
+}
+
+def _alert_message(level: str, task_id: int, company_name: str, due_date) -> str:
+    when = due_date.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+    if level == "breached":
+        return f"Task #{task_id} ({company_name}) missed its due date of {when}."
+    return f"Task #{task_id} ({company_name}) is due at {when}."
+
+def sweep(db: Session, warning: timedelta = SLA_WARNING) -> dict:
+    """Records new SLA alerts and raises their notifications in one transaction. Returns counts."""
+    task = models.Task
+    now = func.now()
+
+    # Locking the state row also keeps sweeps in different workers from overlapping
+    state = db.query(models.SlaSweepState).filter(models.SlaSweepState.sweep_id == 1).with_for_update().first()
+
+    # Same predicate as idx_tasks_open_due_date, so the planner can use it
+    candidates = select(
+        task.task_id,
+        case((task.due_date <= now, literal("breached")), else_=literal("at_risk")),
+        task.due_date
+    ).where(
+        task.status != "Completed",
+        task.due_date.isnot(None),
+        task.due_date < now + warning
+    )
+    # Without a watermark (the first sweep) every open task is considered once
+    if state is not None:
+        since = state.swept_until - SLA_SWEEP_OVERLAP
+        candidates = candidates.where(or_(task.due_date >= since, task.updated_at >= since))
+    db.execute(
+        pg_insert(models.SlaSweepState).values(sweep_id=1, swept_until=now)
+        .on_conflict_do_update(index_elements=[models.SlaSweepState.sweep_id], set_={"swept_until": now})
+    )
+
+    alert = models.SlaAlert
+    new_alerts = db.execute(
+        pg_insert(alert).from_select([alert.task_id, alert.level, alert.due_date], candidates)
+        .on_conflict_do_nothing()
+        .returning(alert.task_id, alert.level)
+    ).all()
+    if not new_alerts:
+        db.commit()
+        return {"alerts": 0, "notifications": 0}
+
+    # Details for just the newly alerted tasks
+    details = {
+        row.task_id: row for row in db.query(
+            task.task_id, task.company_name, task.due_date, task.assigned_user_id,
+            models.WorkflowConfig.primary_poc_id
+        ).outerjoin(models.WorkflowConfig, models.WorkflowConfig.config_id == task.workflow_config_id)
+        .filter(task.task_id.in_({task_id for task_id, _ in new_alerts}))
+    }
+    managers = None
+
+    notifications = []
+    for task_id, level in new_alerts:
+        row = details.get(task_id)
+        if row is None:
+            continue
+        recipients = [row.assigned_user_id or row.primary_poc_id]
+        if recipients[0] is None:
+            if managers is None:
+                managers = [user_id for (user_id,) in db.query(models.User.id).filter(
+                    models.User.role.in_(MANAGER_ROLES), models.User.is_active.is_(True)
+                )]
+            recipients = managers
+        title, notification_type = ALERT_LEVELS[level]
+        message = _alert_message(level, task_id, row.company_name, row.due_date)
+        for user_id in recipients:
+            notifications.append({
+                "user_id": user_id,
+                "title": title,
+                "message": message,
+                "type": notification_type,
+                "link": f"/tasks/{task_id}",
+            })
+
+    if notifications:
+        db.execute(insert(models.Notification), notifications)
+    db.commit()
+    return {"alerts": len(new_alerts), "notifications": len(notifications)}
+
+def _sweep_loop():
+    while True:
+        db = database.SessionLocal()
+        try:
+            sweep(db)
+        except Exception as e:
+            db.rollback()
+            print(f"SLA sweep failed: {e}")
+        finally:
+            db.close()
+        time.sleep(SLA_SWEEP_INTERVAL_SECONDS)
+
+def start_monitor():
+    """Starts the periodic SLA sweep."""
+    threading.Thread(target=_sweep_loop, name="sla-monitor", daemon=True).start()
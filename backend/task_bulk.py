@@ -0,0 +1,254 @@
+import heapq
+from collections import Counter, defaultdict
+from datetime import date
+from typing import List
+from sqlalchemy import select, delete, update, values, column, literal, null, cast, case, func, union_all, Date, Integer
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Session
+import models, metrics
+
+# Set-based operations on many tasks at once.
+# Work is done with a fixed number of statements however many tasks are
+# involved; counter side effects are aggregated in SQL and applied through
+# the batched helpers in metrics.py. The caller commits.
+
+def _performance_reversal(victims, counter: str, day_column, *conditions):
+    """(counter, user, day, count) for the deleted tasks that bumped `counter` on `day`."""
+    day = cast(day_column, Date)
+    return select(
+        literal(counter).label("kind"),
+        victims.c.assigned_user_id.label("user_id"),
+        day.label("day"),
+        cast(null(), models.WorkflowConfig.workflow_type.type).label("workflow_type"),
+        func.count().label("amount")
+    ).where(
+        victims.c.assigned_user_id.isnot(None),
+        day_column.isnot(None),
+        *conditions
+    ).group_by(victims.c.assigned_user_id, day)
+
+def delete_tasks(db: Session, task_ids: List[int]) -> dict:
+    """Deletes tasks and reverses the counters they contributed to.
+
+    The DELETE ... RETURNING runs as a CTE and the reversals are aggregated over
+    exactly the rows it removed, in the same statement:
+      - tasks_assigned on the assigned_at date
+      - tasks_completed (Completed tasks) on the completed_at date
+      - tasks_in_progress (In Progress tasks) on the picked_at date
+      - workflow volume of Completed tasks (achieved_qty, or 1) on the completed_at date
+    Returns a report of what was deleted and the adjustment made to each table.
+    """
+    task = models.Task
+    victims = delete(task).where(task.task_id.in_(task_ids)).returning(
+        task.assigned_user_id, task.status, task.assigned_at, task.picked_at,
+        task.completed_at, task.workflow_config_id, task.achieved_qty
+    ).cte("victims")
+    v = victims.c
+
+    volume_day = cast(v.completed_at, Date)
+    volume_reversal = select(
+        literal("quantity").label("kind"),
+        v.assigned_user_id.label("user_id"),
+        volume_day.label("day"),
+        models.WorkflowConfig.workflow_type.label("workflow_type"),
+        func.sum(case((v.achieved_qty > 0, v.achieved_qty), else_=1)).label("amount")
+    ).select_from(
+        victims.join(models.WorkflowConfig, models.WorkflowConfig.config_id == v.workflow_config_id)
+    ).where(
+        v.status == "Completed",
+        v.assigned_user_id.isnot(None),
+        v.completed_at.isnot(None)
+    ).group_by(v.assigned_user_id, volume_day, models.WorkflowConfig.workflow_type)
+
+    deleted = select(
+        literal("deleted").label("kind"),
+        cast(null(), UUID(as_uuid=True)).label("user_id"),
+        cast(null(), Date).label("day"),
+        cast(null(), models.WorkflowConfig.workflow_type.type).label("workflow_type"),
+        func.count().label("amount")
+    ).select_from(victims)
+
+    rows = db.execute(union_all(
+        deleted,
+        _performance_reversal(victims, "tasks_assigned", v.assigned_at),
+        _performance_reversal(victims, "tasks_completed", v.completed_at, v.status == "Completed"),
+        _performance_reversal(victims, "tasks_in_progress", v.picked_at, v.status == "In Progress"),
+        volume_reversal
+    )).all()
+
+    deleted_count = 0
+    performance_deltas = defaultdict(dict)
+    volume_deltas = {}
+    adjustments = {
+        "user_performance": {counter: 0 for counter in metrics.PERFORMANCE_COUNTERS},
+        "workflow_daily_volumes": {"quantity": 0},
+    }
+    for kind, user_id, day, workflow_type, amount in rows:
+        if kind == "deleted":
+            deleted_count = amount
+        elif kind == "quantity":
+            volume_deltas[(workflow_type, day, user_id)] = -amount
+            adjustments["workflow_daily_volumes"]["quantity"] -= amount
+        else:
+            performance_deltas[(user_id, day)][kind] = -amount
+            adjustments["user_performance"][kind] -= amount
+
+    metrics.apply_performance_deltas(db, performance_deltas)
+    metrics.apply_volume_deltas(db, volume_deltas)
+
+    return {
+        "deleted_count": deleted_count,
+        "not_found_count": len(set(task_ids)) - deleted_count,
+        "adjustments": adjustments,
+        "performance_rows_adjusted": len(performance_deltas),
+        "volume_rows_adjusted": len(volume_deltas),
+    }
+
+DISTRIBUTION_STRATEGIES = ["round_robin", "balanced"]
+
+# Tasks counted as an analyst's current load when balancing
+OPEN_STATUSES = ["Pending", "In Progress", "Under Review", "Paused"]
+
+def _unique(ids: list) -> list:
+    """Drops duplicate ids, keeping the first occurrence's position."""
+    return list(dict.fromkeys(ids))
+
+def _assign(db: Session, assignments: List[tuple]) -> dict:
+    """Applies (task_id, user_id) pairs in one UPDATE ... FROM (VALUES ...) and records
+    tasks_assigned for today with one batched counter write. Returns {user_id: count}."""
+    if not assignments:
+        return {}
+    task = models.Task.__table__
+    pairs = values(
+        column("task_id", Integer),
+        column("user_id", task.c.assigned_user_id.type),
+        name="assignments"
+    ).data(assignments)
+    assigned = db.execute(
+        update(task)
+        .where(task.c.task_id == pairs.c.task_id)
+        .values(assigned_user_id=pairs.c.user_id, assigned_at=func.now())
+        .returning(task.c.assigned_user_id)
+    ).scalars().all()
+
+    per_user = Counter(assigned)
+    today = date.today()
+    metrics.apply_performance_deltas(db, {
+        (user_id, today): {"tasks_assigned": count} for user_id, count in per_user.items()
+    })
+    return dict(per_user)
+
+def assign_tasks(db: Session, task_ids: List[int], user_id) -> int:
+    """Assigns every listed task to one user. Returns the number of tasks assigned."""
+    task = models.Task
+    assigned_count = db.execute(
+        update(task).where(task.task_id.in_(_unique(task_ids)))
+        .values(assigned_user_id=user_id, assigned_at=func.now())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    metrics.adjust_performance(db, user_id, date.today(), tasks_assigned=assigned_count)
+    return assigned_count
+
+def _open_load(db: Session, user_ids: list, exclude_task_ids: List[int]) -> dict:
+    """Open task count per user, in one aggregate query. Tasks being redistributed don't count."""
+    rows = db.query(models.Task.assigned_user_id, func.count()).filter(
+        models.Task.assigned_user_id.in_(user_ids),
+        models.Task.status.in_(OPEN_STATUSES),
+        models.Task.task_id.notin_(exclude_task_ids)
+    ).group_by(models.Task.assigned_user_id).all()
+    load = {user_id: 0 for user_id in user_ids}
+    load.update(dict(rows))
+    return load
+
+def distribute_tasks(db: Session, task_ids: List[int], user_ids: list, strategy: str = "round_robin") -> dict:
+    """Spreads tasks across several users.
+
+    round_robin: tasks are dealt out in the order given.
+    balanced: each task goes to the user with the fewest open tasks at that point,
+    starting from their current load, so lightly loaded analysts catch up first.
+    Ties go to the earlier user in user_ids. Returns {user_id: tasks assigned}.
+    """
+    task_ids = _unique(task_ids)
+    user_ids = _unique(user_ids)
+    existing = {task_id for (task_id,) in db.query(models.Task.task_id).filter(models.Task.task_id.in_(task_ids))}
+    task_ids = [task_id for task_id in task_ids if task_id in existing]
+
+    if strategy == "round_robin":
+        assignments = [(task_id, user_ids[i % len(user_ids)]) for i, task_id in enumerate(task_ids)]
+    else:
+        load = _open_load(db, user_ids, task_ids)
+        heap = [(load[user_id], position, user_id) for position, user_id in enumerate(user_ids)]
+        heapq.heapify(heap)
+        assignments = []
+        for task_id in task_ids:
+            count, position, user_id = heapq.heappop(heap)
+            assignments.append((task_id, user_id))
+            heapq.heappush(heap, (count + 1, position, user_id))
+
+    return _assign(db, assignments)
+
+def update_tasks(db: Session, selection, values: dict, actor_id, skip_completed: bool = False) -> dict:
+    """Applies one patch to every task matched by `selection` (an ORM query on Task).
+
+    The targets are locked and their previous status captured in a CTE, and the
+    patch is applied with a single UPDATE ... FROM targets RETURNING. Tasks moving
+    into Completed get completed_at set, and record completion counters and
+    workflow volume for their assignee (or the acting user if unassigned),
+    aggregated per user and day; tasks that were already Completed keep their
+    completion date. With skip_completed, they are left untouched altogether.
+
+    Returns {"rows": [(task_id, old_status)], "adjustments": {...}}.
+    """
+    task = models.Task
+    targets = selection.with_entities(
+        task.task_id.label("task_id"),
+        task.status.label("old_status"),
+        models.WorkflowConfig.workflow_type.label("workflow_type")
+    ).outerjoin(models.WorkflowConfig, models.WorkflowConfig.config_id == task.workflow_config_id)
+    if skip_completed:
+        targets = targets.filter(task.status != "Completed")
+    targets = targets.with_for_update(of=task).cte("targets")
+
+    table = task.__table__
+    if values.get("status") == "Completed":
+        values = {**values, "completed_at": case(
+            (targets.c.old_status != "Completed", func.now()), else_=table.c.completed_at
+        )}
+    rows = db.execute(
+        update(table)
+        .where(table.c.task_id == targets.c.task_id)
+        .values(**values)
+        .returning(table.c.task_id, targets.c.old_status, targets.c.workflow_type,
+                   table.c.assigned_user_id, table.c.achieved_qty)
+    ).all()
+
+    adjustments = {
+        "user_performance": {counter: 0 for counter in metrics.PERFORMANCE_COUNTERS},
+        "workflow_daily_volumes": {"quantity": 0},
+    }
+    if values.get("status") == "Completed":
+        today = date.today()
+        performance_deltas = defaultdict(lambda: defaultdict(int))
+        volume_deltas = defaultdict(int)
+        for task_id, old_status, workflow_type, assignee, achieved_qty in rows:
+            if old_status == "Completed":
+                continue
+            credited = assignee or actor_id
+            counters = performance_deltas[(credited, today)]
+            counters["tasks_completed"] += 1
+            if old_status == "In Progress":
+                counters["tasks_in_progress"] -= 1
+            if workflow_type is not None:
+                volume_deltas[(workflow_type, today, credited)] += achieved_qty if achieved_qty else 1
+
+        metrics.apply_performance_deltas(db, performance_deltas)
+        metrics.apply_volume_deltas(db, volume_deltas)
+        for counters in performance_deltas.values():
+            for counter, delta in counters.items():
+                adjustments["user_performance"][counter] += delta
+        adjustments["workflow_daily_volumes"]["quantity"] = sum(volume_deltas.values())
+
+    return {
+        "rows": [(task_id, old_status) for task_id, old_status, *_ in rows],
+        "adjustments": adjustments
+    }
@@ -0,0 +1,113 @@
+import base64
+import heapq
+import json
+from itertools import islice
+from typing import Optional, Tuple
+from sqlalchemy import tuple_, text
+from sqlalchemy.orm import Session
+import models
+
+# Incremental task sync (GET /tasks/changes).
+# Every write to a task stamps it with the id of the writing transaction
+# (tasks.change_xid) and every delete leaves a row in task_tombstones, both
+# from triggers (see update_schema_v14.py). The feed walks both in
+# (change_xid, task_id) order.
+#
+# Transaction ids are handed out when a transaction starts writing, not when
+# it commits, so a client that had already read past xid 105 could never see
+# a slower xid 104 that commits later. The feed therefore only returns changes
+# below the oldest transaction still in flight (the snapshot xmin): everything
+# under it is settled, and anything newer is picked up by a later poll.
+
+CHANGES_DEFAULT_LIMIT = 500
+CHANGES_MAX_LIMIT = 5000
+
+# Oldest transaction id that may still commit; all changes below it are final
+WATERMARK_SQL = text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+
+# Newest task write or delete anywhere, and the oldest transaction that may still commit
+CHANGE_MARKER_SQL = text("""
+    SELECT GREATEST(
+        (SELECT max(change_xid) FROM arms_workflow.tasks),
+        (SELECT max(change_xid) FROM arms_workflow.task_tombstones)
+    ), pg_snapshot_xmin(pg_current_snapshot())::text::bigint
+""")
+
+def change_marker(db: Session) -> str:
+    """A value that changes whenever any task is written or deleted, for use as a validator.
+    Two index probes (idx_tasks_change_xid, idx_task_tombstones_change_xid)."""
+    newest, watermark = db.execute(CHANGE_MARKER_SQL).one()
+    newest = newest or 0
+    if watermark > newest:
+        return str(newest)
+    # A transaction older than the newest change is still running and may yet commit a
+    # change below it, so until it finishes the marker moves with the watermark too
+    return f"{newest}:{watermark}"
+
+def encode_change_cursor(change_xid: int, task_id: int) -> str:
+    payload = json.dumps({"x": change_xid, "id": task_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_change_cursor(cursor: str) -> Tuple[int, int]:
+    """Returns (change_xid, task_id). Raises ValueError for malformed cursors."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return int(payload["x"]), int(payload["id"])
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def current_cursor(db: Session) -> str:
+    """A cursor from which the feed returns only changes made from now on."""
+    return encode_change_cursor(db.execute(WATERMARK_SQL).scalar(), 0)
+
+def _after(query, xid_column, id_column, after: Optional[Tuple[int, int]], watermark: int, limit: int):
+    query = query.filter(xid_column < watermark)
+    if after is not None:
+        query = query.filter(tuple_(xid_column, id_column) > tuple_(*after))
+    return query.order_by(xid_column, id_column).limit(limit)
+
+def changes_since(db: Session, cursor: Optional[str], limit: int = CHANGES_DEFAULT_LIMIT) -> dict:
+    """Tasks written and deleted after `cursor`, oldest change first.
+
+    Without a cursor the feed starts from the beginning: every current task,
+    and no tombstones since the client has nothing to delete yet. Pages hold
+    at most `limit` entries; keep calling with the returned cursor while
+    has_more is true. Raises ValueError for a malformed cursor.
+    """
+    after = decode_change_cursor(cursor) if cursor else None
+    watermark = db.execute(WATERMARK_SQL).scalar()
+
+    # One extra row from each side tells us whether another page follows
+    tasks = _after(
+        db.query(models.Task, models.Task.change_xid),
+        models.Task.change_xid, models.Task.task_id, after, watermark, limit + 1
+    ).all()
+    tombstones = []
+    if after is not None:
+        tombstones = _after(
+            db.query(models.TaskTombstone.change_xid, models.TaskTombstone.task_id),
+            models.TaskTombstone.change_xid, models.TaskTombstone.task_id, after, watermark, limit + 1
+        ).all()
+
+    merged = heapq.merge(
+        ((change_xid, task.task_id, task) for task, change_xid in tasks),
+        ((change_xid, task_id, None) for change_xid, task_id in tombstones),
+        key=lambda change: change[:2]
+    )
+    page = list(islice(merged, limit + 1))
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    if has_more:
+        next_cursor = page[-1][:2]
+    else:
+        # Everything below the watermark has been returned; resume from it
+        next_cursor = max(after or (0, 0), (watermark, 0))
+
+    return {
+        "tasks": [task for _, _, task in page if task is not None],
+        "deleted": [task_id for _, task_id, task in page if task is None],
+        "cursor": encode_change_cursor(*next_cursor),
+        "has_more": has_more,
+    }
@@ -0,0 +1,199 @@
+import io
+from collections import defaultdict
+from datetime import datetime, date
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+import models, metrics
+
+# Set-based CSV import used by the task upload jobs (see import_jobs.py).
+# Rows are validated in one pass, workflow names are resolved once per batch
+# (and cached across batches), tasks are inserted a batch at a time, and
+# workflow volume is accumulated and applied as a single upsert per checkpoint.
+
+IMPORT_BATCH_SIZE = 1000
+
+REQUIRED_FIELDS = ['company_name', 'document_type', 'task_type']
+VALID_TASK_TYPES = [t.value for t in models.TaskType]
+VALID_STATUSES = [s.value for s in models.TaskStatus]
+VALID_PRIORITIES = [p.value for p in models.TaskPriority]
+
+# Column length limits from the tasks table; checked up front so one bad row
+# can't fail the insert for the whole batch.
+MAX_LENGTHS = {'company_name': 500, 'document_type': 100, 'custom_workflow_name': 255}
+
+# Column order for COPY ... FROM STDIN
+COPY_COLUMNS = [
+    'company_name', 'document_type', 'task_type', 'priority', 'status',
+    'description', 'notes', 'assigned_user_id', 'workflow_config_id',
+    'custom_workflow_name', 'target_qty', 'achieved_qty', 'completed_at'
+]
+
+# NULL marker for COPY; only ever written unquoted, so no quoted value can match it
+COPY_NULL = "\\N"
+
+def _copy_value(value) -> str:
+    if value is None:
+        return COPY_NULL
+    return '"' + str(value).replace('"', '""') + '"'
+
+def _parse_int(value, default: int) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+class TaskImporter:
+    """Accumulates validated rows and writes them in batches.
+
+    Call add_row() for every parsed CSV row and finish() once at the end.
+    Long-running callers can call checkpoint() between batches so that
+    everything added so far can be committed together with their progress.
+    The caller owns the transaction and commits after checkpoint()/finish().
+    """
+
+    def __init__(self, db: Session, uploader_id, use_copy: bool = False, batch_size: int = IMPORT_BATCH_SIZE):
+        self.db = db
+        self.uploader_id = uploader_id
+        self.use_copy = use_copy
+        self.batch_size = batch_size
+
+        self.success_count = 0
+        # (row_index, message) for every rejected row
+        self.row_errors: List[Tuple[int, str]] = []
+
+        self._pending: List[Tuple[int, dict]] = []
+        # workflow_name -> (config_id, workflow_type), or None when no such workflow exists
+        self._workflows: Dict[str, Optional[Tuple[int, models.WorkflowType]]] = {}
+        self._volume_deltas: Dict[metrics.VolumeKey, int] = defaultdict(int)
+
+    def add_row(self, row_index: int, row: dict):
+        self._pending.append((row_index, row))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Validates and inserts the pending batch."""
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+
+        self._resolve_workflows({row.get('Workflow') for _, row in batch if row.get('Workflow')})
+
+        tasks = []
+        today = date.today()
+        for row_index, row in batch:
+            try:
+                task = self._build_task(row)
+            except ValueError as e:
+                self.row_errors.append((row_index, str(e)))
+                continue
+            tasks.append(task)
+
+            # Sync Volume for ALL imported tasks with workflow
+            # Use achieved_qty if > 0, else target_qty
+            workflow = self._workflows.get(row.get('Workflow')) if row.get('Workflow') else None
+            if workflow:
+                qty = task['achieved_qty'] if task['achieved_qty'] > 0 else task['target_qty']
+                self._volume_deltas[(workflow[1], today, self.uploader_id)] += qty
+
+        if tasks:
+            if self.use_copy:
+                self._copy_tasks(tasks)
+            else:
+                self.db.execute(insert(models.Task), tasks)
+            self.success_count += len(tasks)
+
+    def checkpoint(self):
+        """Flushes pending rows and applies the volume accumulated since the last checkpoint."""
+        self.flush()
+        metrics.apply_volume_deltas(self.db, self._volume_deltas)
+        self._volume_deltas.clear()
+
+    def finish(self) -> dict:
+        """Final checkpoint; returns the import report."""
+        self.checkpoint()
+        return {
+            "total_processed": self.success_count + len(self.row_errors),
+            "success_count": self.success_count,
+            "failed_count": len(self.row_errors),
+            "errors": [f"Row {row_index}: {message}" for row_index, message in self.row_errors]
+        }
+
+    def _resolve_workflows(self, names: Iterable[str]):
+        """Looks up all not-yet-seen workflow names in one query."""
+        unknown = [name for name in names if name not in self._workflows]
+        if not unknown:
+            return
+        found = self.db.query(
+            models.WorkflowConfig.workflow_name,
+            models.WorkflowConfig.config_id,
+            models.WorkflowConfig.workflow_type
+        ).filter(models.WorkflowConfig.workflow_name.in_(unknown)).all()
+        for name in unknown:
+            self._workflows[name] = None
+        for name, config_id, workflow_type in found:
+            self._workflows[name] = (config_id, workflow_type)
+
+    def _build_task(self, row: dict) -> dict:
+        # Basic validation
+        for field in REQUIRED_FIELDS:
+            if field not in row or not row[field]:
+                raise ValueError(f"Missing required field: {field}")
+        for field, max_length in MAX_LENGTHS.items():
+            if row.get(field) and len(row[field]) > max_length:
+                raise ValueError(f"{field} exceeds {max_length} characters")
+
+        if row['task_type'] not in VALID_TASK_TYPES:
+            raise ValueError(f"Invalid task_type '{row['task_type']}'. Must be one of: {', '.join(VALID_TASK_TYPES)}")
+
+        priority = row.get('priority') or 'Medium'
+        if priority not in VALID_PRIORITIES:
+            raise ValueError(f"Invalid priority '{priority}'. Must be one of: {', '.join(VALID_PRIORITIES)}")
+
+        # Default to Pending if status is missing or invalid
+        status_val = row.get('Status', 'Pending')
+        if status_val not in VALID_STATUSES:
+            status_val = "Pending"
+
+        workflow = self._workflows.get(row.get('Workflow')) if row.get('Workflow') else None
+
+        return {
+            'company_name': row['company_name'],
+            'document_type': row['document_type'],
+            'task_type': models.TaskType(row['task_type']),
+            'priority': priority,
+            'status': status_val,
+            'description': row.get('description', ''),
+            'notes': row.get('notes', ''),
+            'assigned_user_id': self.uploader_id, # Auto-assign uploader
+            'workflow_config_id': workflow[0] if workflow else None,
+            'custom_workflow_name': row.get('custom_workflow_name') or None,
+            'target_qty': _parse_int(row.get('Target Qty', 1), 1),
+            'achieved_qty': _parse_int(row.get('Achieved Qty', 0), 0),
+            # If importing as Completed, set timestamps
+            'completed_at': datetime.now() if status_val == "Completed" else None,
+        }
+
+    def _copy_tasks(self, tasks: List[dict]):
+        """Bulk-loads a batch with COPY, inside the session's transaction.
+
+        Every value is quoted and NULL is written as an unquoted \\N, so empty strings
+        stay empty strings, exactly as they are stored by the INSERT path."""
+        buffer = io.StringIO()
+        for task in tasks:
+            buffer.write(",".join(
+                _copy_value(task[column].value if column == 'task_type' else task[column])
+                for column in COPY_COLUMNS
+            ))
+            buffer.write("\n")
+        buffer.seek(0)
+
+        cursor = self.db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY arms_workflow.tasks ({', '.join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')",
+                buffer
+            )
+        finally:
+            cursor.close()
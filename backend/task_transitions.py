@@ -0,0 +1,235 @@
+from datetime import date, datetime
+from typing import Dict, Optional, Tuple
+from sqlalchemy import update, func, select, literal, case, inspect
+from sqlalchemy.orm import Session, aliased
+import models, metrics
+
+# Task state transitions.
+# Every transition is a single conditional UPDATE ... WHERE status <expected>
+# RETURNING *, so two requests racing on the same task can't both win: the
+# loser's UPDATE matches no row and becomes a 409 instead of a lost update.
+# Counter side effects (UserPerformance, workflow volume) ride along in the same
+# statement as data-modifying CTEs reading the UPDATE's RETURNING rows:
+#   WITH changed AS (UPDATE tasks ... RETURNING ...), performance AS (INSERT ...)
+#   SELECT * FROM changed
+# so a transition is one round trip, and the counters move exactly when the
+# update matched. The caller commits.
+
+MANAGER_ROLES = [models.UserRole.admin, models.UserRole.manager]
+
+class TransitionError(Exception):
+    status_code = 409
+
+    def __init__(self, detail: str):
+        super().__init__(detail)
+        self.detail = detail
+
+class TaskNotFound(TransitionError):
+    status_code = 404
+
+class TransitionForbidden(TransitionError):
+    status_code = 403
+
+class TransitionConflict(TransitionError):
+    status_code = 409
+
+class Transition:
+    """A named state change.
+
+    from_states: statuses the task must currently have (None = any).
+    not_from: statuses the task must not currently have.
+    owner_only: analysts may only apply it to tasks assigned to them.
+    performance: UserPerformance counter deltas for the acting user.
+    records_volume: adds the task's achieved_qty (or 1) to its workflow's daily
+        volume, credited to the acting user.
+    """
+
+    def __init__(self, to_state: str, conflict_detail: str, from_states: Tuple[str, ...] = None,
+                 not_from: Tuple[str, ...] = (), owner_only: bool = False, forbidden_detail: str = None,
+                 performance: Dict[str, int] = None, records_volume: bool = False):
+        self.to_state = to_state
+        self.conflict_detail = conflict_detail
+        self.from_states = from_states
+        self.not_from = not_from
+        self.owner_only = owner_only
+        self.forbidden_detail = forbidden_detail
+        self.performance = performance or {}
+        self.records_volume = records_volume
+
+TRANSITIONS = {
+    "pick": Transition(
+        to_state="In Progress",
+        from_states=("Pending",),
+        conflict_detail="Only Pending tasks can be picked up",
+        performance={"tasks_in_progress": 1}
+    ),
+    "unpick": Transition(
+        to_state="Pending",
+        from_states=("In Progress",),
+        conflict_detail="Only 'In Progress' tasks can be unpicked",
+        owner_only=True,
+        forbidden_detail="You can only unpick tasks assigned to you",
+        performance={"tasks_in_progress": -1}
+    ),
+    "complete": Transition(
+        to_state="Completed",
+        not_from=("Completed",),
+        conflict_detail="Task is already completed",
+        owner_only=True,
+        forbidden_detail="You can only complete tasks assigned to you",
+        performance={"tasks_in_progress": -1, "tasks_completed": 1},
+        records_volume=True
+    ),
+}
+
+def _is_manager(actor) -> bool:
+    return actor.role in MANAGER_ROLES
+
+def _side_effects(transition: Transition, actor, changed) -> list:
+    """The counter upserts for a transition, as statements reading the updated row from `changed`."""
+    today = date.today()
+    effects = [metrics.performance_upsert(actor.id, today, transition.performance, source=changed)]
+    if transition.records_volume:
+        volume = models.WorkflowDailyVolume.__table__
+        effects.append(metrics.volume_upsert(select(
+            models.WorkflowConfig.workflow_type,
+            literal(today, volume.c.date.type),
+            literal(actor.id, volume.c.analyst_id.type),
+            case((changed.c.achieved_qty > 0, changed.c.achieved_qty), else_=1)
+        ).select_from(changed).join(
+            models.WorkflowConfig, models.WorkflowConfig.config_id == changed.c.workflow_config_id
+        )))
+    return [effect for effect in effects if effect is not None]
+
+# The columns a Task loads by default; deferred ones (search_vector, change_xid) are left out
+_RETURNED_COLUMNS = [prop.columns[0] for prop in inspect(models.Task).column_attrs if not prop.deferred]
+
+def _execute(db: Session, stmt, transition: Optional[Transition] = None, actor=None) -> Optional[models.Task]:
+    """Runs a conditional UPDATE on one task, plus the transition's side effects in the same
+    statement. Returns the updated task, or None if the UPDATE matched nothing."""
+    changed = stmt.returning(*_RETURNED_COLUMNS).cte("changed")
+    query = select(aliased(models.Task, changed))
+    if transition is not None:
+        for i, effect in enumerate(_side_effects(transition, actor, changed)):
+            query = query.add_cte(effect.cte(f"side_effect_{i}"))
+    return db.execute(query.execution_options(populate_existing=True)).scalars().first()
+
+def _raise_for_miss(db: Session, task_id: int, transition: Optional[Transition], actor, completed_detail: str = None,
+                    expected_version: Optional[int] = None):
+    """Explains why a conditional UPDATE matched nothing. Only runs on the failure path."""
+    current = db.query(models.Task.status, models.Task.assigned_user_id, models.Task.version).filter(models.Task.task_id == task_id).first()
+    if current is None:
+        raise TaskNotFound("Task not found")
+    current_status, assignee, version = current
+    if expected_version is not None and version != expected_version:
+        raise TransitionConflict(f"Task was modified by someone else (current version {version}, expected {expected_version})")
+    if transition is None:
+        # Plain field update; the only guard is the analyst edit lock on completed tasks
+        if current_status == "Completed" and not _is_manager(actor):
+            raise TransitionForbidden(completed_detail)
+        raise TransitionConflict("Task was modified concurrently, please retry")
+    if transition.owner_only and not _is_manager(actor) and assignee != actor.id:
+        raise TransitionForbidden(transition.forbidden_detail)
+    raise TransitionConflict(f"{transition.conflict_detail} (current status: {current_status})")
+
+def apply_transition(db: Session, task_id: int, name: str, actor, values: dict = None) -> models.Task:
+    """Moves a task through a named transition and records its counter side effects, in one statement.
+    Raises TaskNotFound / TransitionForbidden / TransitionConflict when it cannot apply."""
+    transition = TRANSITIONS[name]
+    stmt = update(models.Task).where(models.Task.task_id == task_id)
+    if transition.from_states is not None:
+        stmt = stmt.where(models.Task.status.in_(transition.from_states))
+    if transition.not_from:
+        stmt = stmt.where(models.Task.status.notin_(transition.not_from))
+    if transition.owner_only and not _is_manager(actor):
+        stmt = stmt.where(models.Task.assigned_user_id == actor.id)
+
+    task = _execute(db, stmt.values(status=transition.to_state, **(values or {})), transition, actor)
+    if task is None:
+        _raise_for_miss(db, task_id, transition, actor)
+    return task
+
+def pick(db: Session, task_id: int, actor) -> models.Task:
+    now = datetime.now()
+    return apply_transition(db, task_id, "pick", actor, {
+        "assigned_user_id": actor.id,
+        "assigned_at": now,
+        "picked_at": now
+    })
+
+def claim(db: Session, candidate, actor) -> Optional[models.Task]:
+    """The "pick" transition applied to whichever task the `candidate` subquery selects
+    (see POST /tasks/claim-next), with its counters in the same statement.
+    Returns None when there was no candidate."""
+    transition = TRANSITIONS["pick"]
+    now = datetime.now()
+    return _execute(db, update(models.Task).where(
+        models.Task.task_id == candidate,
+        models.Task.status.in_(transition.from_states)
+    ).values(
+        status=transition.to_state,
+        assigned_user_id=actor.id,
+        assigned_at=now,
+        picked_at=now
+    ), transition, actor)
+
+def unpick(db: Session, task_id: int, actor) -> models.Task:
+    return apply_transition(db, task_id, "unpick", actor, {
+        "assigned_user_id": None,
+        "assigned_at": None,
+        "picked_at": None
+    })
+
+def complete(db: Session, task_id: int, actor, achieved_qty: int, remarks: Optional[str]) -> models.Task:
+    return apply_transition(db, task_id, "complete", actor, {
+        "achieved_qty": achieved_qty,
+        "remarks": remarks,
+        "completed_at": datetime.now()
+    })
+
+def update_fields(db: Session, task_id: int, actor, values: dict, expected_version: Optional[int] = None) -> Tuple[models.Task, bool]:
+    """Applies a field patch. Returns (task, completed_now).
+
+    A patch that sets status to Completed is tried as the "complete" transition
+    first, so completion counters and workflow volume are recorded exactly once
+    even if two edits race. If the task was already completed it falls through to a plain edit,
+    which analysts may not apply to completed tasks.
+
+    With expected_version the write only applies if nobody else has written the
+    task since that version was read; otherwise TransitionConflict is raised.
+    The check is part of the UPDATE, so no row lock is held between read and write.
+    """
+    version_check = [models.Task.version == expected_version] if expected_version is not None else []
+    miss_detail = {"completed_detail": "Completed tasks cannot be edited by analysts", "expected_version": expected_version}
+
+    if values.get("status") == "Completed":
+        transition = TRANSITIONS["complete"]
+        task = _execute(db, update(models.Task).where(
+            models.Task.task_id == task_id,
+            models.Task.status.notin_(transition.not_from),
+            *version_check
+        ).values(**values, completed_at=func.now()), transition, actor)
+        if task is not None:
+            return task, True
+
+    if not values:
+        task = db.get(models.Task, task_id)
+        if task is not None and (task.status != "Completed" or _is_manager(actor)) \
+                and (expected_version is None or task.version == expected_version):
+            return task, False
+        _raise_for_miss(db, task_id, None, actor, **miss_detail)
+
+    stmt = update(models.Task).where(models.Task.task_id == task_id, *version_check)
+    if not _is_manager(actor):
+        stmt = stmt.where(models.Task.status != "Completed")
+    task = _execute(db, stmt.values(**values))
+    if task is None:
+        _raise_for_miss(db, task_id, None, actor, **miss_detail)
+    return task, False
+
+def commit(db: Session, task: models.Task) -> models.Task:
+    """Commits and returns the task without the reload a plain commit would trigger;
+    the row was already fully returned by RETURNING."""
+    db.expunge(task)
+    db.commit()
+    return task
@@ -40,5 +40,21 @@ def test_get_tasks():
     except Exception as e:
         print(f"API call failed: {e}")
 
+def test_bulk_update_rejects_version():
+    # Bulk patches have no per-task version check, so sending one must fail rather than be ignored
+    token = get_token()
+    if not token:
+        return
+
+    headers = {"Authorization": f"Bearer {token}"}
+    response = requests.post(
+        "http://localhost:8000/tasks/bulk-update",
+        headers=headers,
+        json={"task_ids": [1], "patch": {"notes": "bulk", "version": 1}},
+    )
+    print(f"Bulk update with version: {response.status_code}")
+    assert response.status_code == 422, response.text
+
 if __name__ == "__main__":
     test_get_tasks()
+    test_bulk_update_rejects_version()
@@ -0,0 +1,66 @@
+from sqlalchemy import create_engine, text
+from database import DATABASE_URL
+
+def migrate():
+    engine = create_engine(DATABASE_URL)
+    with engine.connect() as conn:
+        print("Starting Migration V10 (unique user performance rows)...")
+        try:
+            conn.execute(text("SET search_path TO arms_workflow, public;"))
+
+            # 1. Merge duplicate (user_id, metric_date) rows into the oldest one
+            print("Merging duplicate user_performance rows...")
+            conn.execute(text("""
+                WITH totals AS (
+                    SELECT MIN(performance_id) AS keep_id,
+                           SUM(COALESCE(tasks_assigned, 0)) AS tasks_assigned,
+                           SUM(COALESCE(tasks_in_progress, 0)) AS tasks_in_progress,
+                           SUM(COALESCE(tasks_completed, 0)) AS tasks_completed,
+                           SUM(COALESCE(tasks_under_review, 0)) AS tasks_under_review,
+                           SUM(COALESCE(tasks_rejected, 0)) AS tasks_rejected
+                    FROM user_performance
+                    GROUP BY user_id, metric_date
+                    HAVING COUNT(*) > 1
+                )
+                UPDATE user_performance p
+                SET tasks_assigned = totals.tasks_assigned,
+                    tasks_in_progress = totals.tasks_in_progress,
+                    tasks_completed = totals.tasks_completed,
+                    tasks_under_review = totals.tasks_under_review,
+                    tasks_rejected = totals.tasks_rejected
+                FROM totals
+                WHERE p.performance_id = totals.keep_id;
+            """))
+            result = conn.execute(text("""
+                DELETE FROM user_performance p
+                USING user_performance keep
+                WHERE keep.user_id = p.user_id
+                  AND keep.metric_date = p.metric_date
+                  AND keep.performance_id < p.performance_id;
+            """))
+            print(f"Removed {result.rowcount} duplicate rows.")
+
+            # 2. Add the constraint schema.sql declares, unless the table already has it
+            print("Adding unique_user_metric_date...")
+            conn.execute(text("""
+                DO $$
+                BEGIN
+                    IF NOT EXISTS (
+                        SELECT 1 FROM pg_constraint
+                        WHERE conname = 'unique_user_metric_date'
+                          AND conrelid = 'arms_workflow.user_performance'::regclass
+                    ) THEN
+                        ALTER TABLE user_performance
+                        ADD CONSTRAINT unique_user_metric_date UNIQUE (user_id, metric_date);
+                    END IF;
+                END $$;
+            """))
+
+            conn.commit()
+            print("Migration V10 Completed Successfully.")
+        except Exception as e:
+            print(f"Error during migration: {e}")
+            conn.rollback()
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,24 @@
+from sqlalchemy import create_engine, text
+from database import DATABASE_URL
+
+INDEXES = [
+    # Keyset pages of a task's history / comments, newest first
+    ("idx_task_history_task_changed_at", "task_history (task_id, changed_at DESC, history_id DESC)"),
+    ("idx_task_comments_task_created_at", "task_comments (task_id, created_at DESC, comment_id DESC)"),
+]
+
+def migrate():
+    engine = create_engine(DATABASE_URL)
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        print("Starting Migration V11 (comment and history pagination indexes)...")
+        for name, definition in INDEXES:
+            try:
+                print(f"Creating {name}...")
+                conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON arms_workflow.{definition};"))
+            except Exception as e:
+                print(f"Error creating {name}: {e}")
+        print("Migration V11 Completed.")
+
+if __name__ == "__main__":
+    migrate()
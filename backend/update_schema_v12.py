@@ -0,0 +1,23 @@
+from sqlalchemy import create_engine, text
+from database import DATABASE_URL
+
+INDEXES = [
+    # max(updated_at) for the task list ETag
+    ("idx_tasks_updated_at", "tasks (updated_at)"),
+]
+
+def migrate():
+    engine = create_engine(DATABASE_URL)
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        print("Starting Migration V12 (task updated_at index for ETags)...")
+        for name, definition in INDEXES:
+            try:
+                print(f"Creating {name}...")
+                conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON arms_workflow.{definition};"))
+            except Exception as e:
+                print(f"Error creating {name}: {e}")
+        print("Migration V12 Completed.")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,38 @@
+from sqlalchemy import create_engine, text
+from database import DATABASE_URL
+
+def migrate():
+    engine = create_engine(DATABASE_URL)
+    with engine.connect() as conn:
+        print("Starting Migration V13 (task version column)...")
+        try:
+            conn.execute(text("SET search_path TO arms_workflow, public;"))
+
+            print("Adding tasks.version...")
+            conn.execute(text("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;"))
+
+            # Bumped in the database so every write counts, including raw SQL and other triggers' updates
+            print("Creating bump_task_version trigger...")
+            conn.execute(text("""
+                CREATE OR REPLACE FUNCTION bump_task_version()
+                RETURNS TRIGGER AS $$
+                BEGIN
+                    NEW.version = OLD.version + 1;
+                    RETURN NEW;
+                END;
+                $$ LANGUAGE plpgsql;
+            """))
+            conn.execute(text("DROP TRIGGER IF EXISTS bump_task_version ON tasks;"))
+            conn.execute(text("""
+                CREATE TRIGGER bump_task_version BEFORE UPDATE ON tasks
+                FOR EACH ROW EXECUTE FUNCTION bump_task_version();
+            """))
+
+            conn.commit()
+            print("Migration V13 Completed Successfully.")
+        except Exception as e:
+            print(f"Error during migration: {e}")
+            conn.rollback()
+
+if __name__ == "__main__":
+    migrate()
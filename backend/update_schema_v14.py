@@ -0,0 +1,84 @@
+from sqlalchemy import create_engine, text
+from database import DATABASE_URL
+
+INDEXES = [
+    # (change_xid, task_id) walk for GET /tasks/changes
+    ("idx_tasks_change_xid", "tasks (change_xid, task_id)"),
+]
+
+def migrate():
+    engine = create_engine(DATABASE_URL)
+    with engine.connect() as conn:
+        print("Starting Migration V14 (task change feed)...")
+        try:
+            conn.execute(text("SET search_path TO arms_workflow, public;"))
+
+            # Existing rows keep 0 and are returned by a feed read from the beginning
+            print("Adding tasks.change_xid...")
+            conn.execute(text("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS change_xid BIGINT NOT NULL DEFAULT 0;"))
+
+            print("Creating task_tombstones...")
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS task_tombstones (
+                    task_id INTEGER PRIMARY KEY,
+                    change_xid BIGINT NOT NULL,
+                    deleted_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+                );
+            """))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_task_tombstones_change_xid ON task_tombstones(change_xid, task_id);"))
+
+            print("Creating stamp_task_change trigger...")
+            conn.execute(text("""
+                CREATE OR REPLACE FUNCTION stamp_task_change()
+                RETURNS TRIGGER AS $$
+                BEGIN
+                    NEW.change_xid = pg_current_xact_id()::text::bigint;
+                    RETURN NEW;
+                END;
+                $$ LANGUAGE plpgsql;
+            """))
+            conn.execute(text("DROP TRIGGER IF EXISTS stamp_task_change ON tasks;"))
+            conn.execute(text("""
+                CREATE TRIGGER stamp_task_change BEFORE INSERT OR UPDATE ON tasks
+                FOR EACH ROW EXECUTE FUNCTION stamp_task_change();
+            """))
+
+            # Statement-level, so a bulk delete writes its tombstones with one INSERT
+            print("Creating record_task_tombstones trigger...")
+            conn.execute(text("""
+                CREATE OR REPLACE FUNCTION record_task_tombstones()
+                RETURNS TRIGGER AS $$
+                BEGIN
+                    INSERT INTO arms_workflow.task_tombstones (task_id, change_xid)
+                    SELECT task_id, pg_current_xact_id()::text::bigint FROM deleted_tasks
+                    ON CONFLICT (task_id) DO UPDATE
+                        SET change_xid = EXCLUDED.change_xid, deleted_at = NOW();
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+            """))
+            conn.execute(text("DROP TRIGGER IF EXISTS record_task_tombstones ON tasks;"))
+            conn.execute(text("""
+                CREATE TRIGGER record_task_tombstones AFTER DELETE ON tasks
+                REFERENCING OLD TABLE AS deleted_tasks
+                FOR EACH STATEMENT EXECUTE FUNCTION record_task_tombstones();
+            """))
+
+            conn.commit()
+        except Exception as e:
+            print(f"Error during migration: {e}")
+            conn.rollback()
+            return
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name, definition in INDEXES:
+            try:
+                print(f"Creating {name}...")
+                conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON arms_workflow.{definition};"))
+            except Exception as e:
+                print(f"Error creating {name}: {e}")
+    print("Migration V14 Completed.")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,87 @@
+from sqlalchemy import create_engine, text
+from database import DATABASE_URL
+
+def migrate():
+    engine = create_engine(DATABASE_URL)
+    with engine.connect() as conn:
+        print("Starting Migration V15 (content-addressed attachment blobs)...")
+        try:
+            conn.execute(text("SET search_path TO arms_workflow, public;"))
+
+            # Attachments stored before this keep their own files and a NULL hash
+            print("Adding task_attachments.content_sha256...")
+            conn.execute(text("ALTER TABLE task_attachments ADD COLUMN IF NOT EXISTS content_sha256 CHAR(64);"))
+
+            print("Creating attachment_blobs...")
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS attachment_blobs (
+                    sha256 CHAR(64) PRIMARY KEY,
+                    size_bytes BIGINT NOT NULL,
+                    ref_count INTEGER NOT NULL DEFAULT 0,
+                    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+                    unreferenced_since TIMESTAMP WITH TIME ZONE
+                );
+            """))
+            # Only garbage is indexed, so the collector's scan stays proportional to what it removes
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_attachment_blobs_unreferenced
+                ON attachment_blobs(unreferenced_since) WHERE ref_count <= 0;
+            """))
+
+            # Statement-level, so a task delete cascading to many attachments adjusts each blob once
+            print("Creating attachment reference count triggers...")
+            conn.execute(text("""
+                CREATE OR REPLACE FUNCTION reference_attachment_blobs()
+                RETURNS TRIGGER AS $$
+                BEGIN
+                    INSERT INTO arms_workflow.attachment_blobs (sha256, size_bytes, ref_count)
+                    SELECT content_sha256, MAX(file_size_bytes), COUNT(*)
+                    FROM new_attachments
+                    WHERE content_sha256 IS NOT NULL
+                    GROUP BY content_sha256
+                    ON CONFLICT (sha256) DO UPDATE
+                        SET ref_count = attachment_blobs.ref_count + EXCLUDED.ref_count,
+                            unreferenced_since = NULL;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+            """))
+            conn.execute(text("""
+                CREATE OR REPLACE FUNCTION release_attachment_blobs()
+                RETURNS TRIGGER AS $$
+                BEGIN
+                    UPDATE arms_workflow.attachment_blobs b
+                    SET ref_count = b.ref_count - released.released_count,
+                        unreferenced_since = CASE WHEN b.ref_count - released.released_count <= 0 THEN NOW() END
+                    FROM (
+                        SELECT content_sha256, COUNT(*) AS released_count
+                        FROM old_attachments
+                        WHERE content_sha256 IS NOT NULL
+                        GROUP BY content_sha256
+                    ) released
+                    WHERE b.sha256 = released.content_sha256;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+            """))
+            conn.execute(text("DROP TRIGGER IF EXISTS reference_attachment_blobs ON task_attachments;"))
+            conn.execute(text("""
+                CREATE TRIGGER reference_attachment_blobs AFTER INSERT ON task_attachments
+                REFERENCING NEW TABLE AS new_attachments
+                FOR EACH STATEMENT EXECUTE FUNCTION reference_attachment_blobs();
+            """))
+            conn.execute(text("DROP TRIGGER IF EXISTS release_attachment_blobs ON task_attachments;"))
+            conn.execute(text("""
+                CREATE TRIGGER release_attachment_blobs AFTER DELETE ON task_attachments
+                REFERENCING OLD TABLE AS old_attachments
+                FOR EACH STATEMENT EXECUTE FUNCTION release_attachment_blobs();
+            """))
+
+            conn.commit()
+            print("Migration V15 Completed Successfully.")
+        except Exception as e:
+            print(f"Error during migration: {e}")
+            conn.rollback()
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,25 @@
+from sqlalchemy import create_engine, text
+from database import DATABASE_URL
+
+def migrate():
+    engine = create_engine(DATABASE_URL)
+    with engine.connect() as conn:
+        print("Starting Migration V16 (processed email Message-IDs)...")
+        try:
+            conn.execute(text("SET search_path TO arms_workflow, public;"))
+
+            print("Adding processed_emails.message_id...")
+            conn.execute(text("ALTER TABLE processed_emails ADD COLUMN IF NOT EXISTS message_id VARCHAR(998);"))
+
+            # Email intake inserts with ON CONFLICT (message_id) DO NOTHING to skip mail it has already seen
+            print("Creating idx_processed_emails_message_id...")
+            conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS idx_processed_emails_message_id ON processed_emails(message_id);"))
+
+            conn.commit()
+            print("Migration V16 Completed Successfully.")
+        except Exception as e:
+            print(f"Error during migration: {e}")
+            conn.rollback()
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,44 @@
+from sqlalchemy import create_engine, text
+from database import DATABASE_URL
+
+INDEXES = [
+    # SLA sweep: open tasks by due date. The predicate must match sla_monitor.sweep's WHERE clause
+    ("idx_tasks_open_due_date", "tasks (due_date) WHERE status <> 'Completed' AND due_date IS NOT NULL"),
+]
+
+def migrate():
+    engine = create_engine(DATABASE_URL)
+    with engine.connect() as conn:
+        print("Starting Migration V17 (SLA alerts)...")
+        try:
+            conn.execute(text("SET search_path TO arms_workflow, public;"))
+
+            print("Creating sla_alerts...")
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS sla_alerts (
+                    task_id INTEGER NOT NULL REFERENCES tasks(task_id) ON DELETE CASCADE,
+                    level VARCHAR(20) NOT NULL,
+                    due_date TIMESTAMP WITH TIME ZONE NOT NULL,
+                    alerted_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+                    PRIMARY KEY (task_id, level, due_date)
+                );
+            """))
+
+            conn.commit()
+        except Exception as e:
+            print(f"Error during migration: {e}")
+            conn.rollback()
+            return
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name, definition in INDEXES:
+            try:
+                print(f"Creating {name}...")
+                conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON arms_workflow.{definition};"))
+            except Exception as e:
+                print(f"Error creating {name}: {e}")
+    print("Migration V17 Completed.")
+
+if __name__ == "__main__":
+    migrate()
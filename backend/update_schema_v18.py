@@ -0,0 +1,58 @@
+from sqlalchemy import create_engine, text
+from database import DATABASE_URL
+
+INDEXES = [
+    # Notification streams: a user's notifications after the last one sent, and their unread count
+    ("idx_notifications_user_id", "notifications (user_id, notification_id)"),
+    ("idx_notifications_user_unread", "notifications (user_id) WHERE NOT is_read"),
+]
+
+def migrate():
+    engine = create_engine(DATABASE_URL)
+    with engine.connect() as conn:
+        print("Starting Migration V18 (notification streams)...")
+        try:
+            conn.execute(text("SET search_path TO arms_workflow, public;"))
+
+            print("Creating notify_notification_changes...")
+            conn.execute(text("""
+                CREATE OR REPLACE FUNCTION notify_notification_changes()
+                RETURNS TRIGGER AS $$
+                BEGIN
+                    PERFORM pg_notify('arms_notifications', json_build_object('user_id', user_id)::text)
+                    FROM (SELECT DISTINCT user_id FROM changed_notifications) changed;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+            """))
+            conn.execute(text("DROP TRIGGER IF EXISTS notify_notification_inserts ON notifications;"))
+            conn.execute(text("""
+                CREATE TRIGGER notify_notification_inserts AFTER INSERT ON notifications
+                REFERENCING NEW TABLE AS changed_notifications
+                FOR EACH STATEMENT EXECUTE FUNCTION notify_notification_changes();
+            """))
+            conn.execute(text("DROP TRIGGER IF EXISTS notify_notification_updates ON notifications;"))
+            conn.execute(text("""
+                CREATE TRIGGER notify_notification_updates AFTER UPDATE ON notifications
+                REFERENCING NEW TABLE AS changed_notifications
+                FOR EACH STATEMENT EXECUTE FUNCTION notify_notification_changes();
+            """))
+
+            conn.commit()
+        except Exception as e:
+            print(f"Error during migration: {e}")
+            conn.rollback()
+            return
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name, definition in INDEXES:
+            try:
+                print(f"Creating {name}...")
+                conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON arms_workflow.{definition};"))
+            except Exception as e:
+                print(f"Error creating {name}: {e}")
+    print("Migration V18 Completed.")
+
+if __name__ == "__main__":
+    migrate()
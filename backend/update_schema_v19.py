@@ -0,0 +1,55 @@
+from sqlalchemy import create_engine, text
+from database import DATABASE_URL
+
+def migrate():
+    engine = create_engine(DATABASE_URL)
+    with engine.connect() as conn:
+        print("Starting Migration V19 (processed_emails task FK on delete)...")
+        try:
+            conn.execute(text("SET search_path TO arms_workflow, public;"))
+
+            # Deleting a task created from an email must not be blocked by its processed_emails row.
+            # Replace whatever FK task_created_id has with one that nulls it, unless that is already the case.
+            print("Recreating processed_emails_task_created_id_fkey with ON DELETE SET NULL...")
+            conn.execute(text("""
+                DO $$
+                DECLARE
+                    fk RECORD;
+                BEGIN
+                    IF EXISTS (
+                        SELECT 1 FROM pg_constraint
+                        WHERE conname = 'processed_emails_task_created_id_fkey'
+                          AND conrelid = 'arms_workflow.processed_emails'::regclass
+                          AND confdeltype = 'n'
+                    ) THEN
+                        RETURN;
+                    END IF;
+                    FOR fk IN
+                        SELECT c.conname FROM pg_constraint c
+                        JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = ANY (c.conkey)
+                        WHERE c.contype = 'f'
+                          AND c.conrelid = 'arms_workflow.processed_emails'::regclass
+                          AND a.attname = 'task_created_id'
+                    LOOP
+                        EXECUTE format('ALTER TABLE arms_workflow.processed_emails DROP CONSTRAINT %I', fk.conname);
+                    END LOOP;
+                    -- NOT VALID: existing rows already satisfy it, so skip the full-table check under lock
+                    ALTER TABLE processed_emails
+                    ADD CONSTRAINT processed_emails_task_created_id_fkey
+                    FOREIGN KEY (task_created_id) REFERENCES tasks(task_id) ON DELETE SET NULL NOT VALID;
+                END $$;
+            """))
+            conn.commit()
+
+            # Checked in its own transaction, which only needs a lock that lets writes continue
+            conn.execute(text("SET search_path TO arms_workflow, public;"))
+            conn.execute(text("ALTER TABLE processed_emails VALIDATE CONSTRAINT processed_emails_task_created_id_fkey;"))
+
+            conn.commit()
+            print("Migration V19 Completed Successfully.")
+        except Exception as e:
+            print(f"Error during migration: {e}")
+            conn.rollback()
+
+if __name__ == "__main__":
+    migrate()
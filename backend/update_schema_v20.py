@@ -0,0 +1,27 @@
+from sqlalchemy import create_engine, text
+from database import DATABASE_URL
+
+def migrate():
+    engine = create_engine(DATABASE_URL)
+    with engine.connect() as conn:
+        print("Starting Migration V20 (SLA sweep watermark)...")
+        try:
+            conn.execute(text("SET search_path TO arms_workflow, public;"))
+
+            # No row yet means the next sweep scans every open task once, then records its watermark
+            print("Creating sla_sweep_state...")
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS sla_sweep_state (
+                    sweep_id INTEGER PRIMARY KEY CHECK (sweep_id = 1),
+                    swept_until TIMESTAMP WITH TIME ZONE NOT NULL
+                );
+            """))
+
+            conn.commit()
+            print("Migration V20 Completed Successfully.")
+        except Exception as e:
+            print(f"Error during migration: {e}")
+            conn.rollback()
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,27 @@
+from sqlalchemy import create_engine, text
+from database import DATABASE_URL
+
+def migrate():
+    engine = create_engine(DATABASE_URL)
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        print("Starting Migration V4 (keyset pagination indexes)...")
+        try:
+            print("Creating idx_tasks_created_at_id...")
+            conn.execute(text("""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tasks_created_at_id
+                ON arms_workflow.tasks (created_at DESC, task_id DESC);
+            """))
+
+            print("Creating idx_tasks_workflow_created_at_id...")
+            conn.execute(text("""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tasks_workflow_created_at_id
+                ON arms_workflow.tasks (workflow_config_id, created_at DESC, task_id DESC);
+            """))
+
+            print("Migration V4 Completed Successfully.")
+        except Exception as e:
+            print(f"Error creating indexes: {e}")
+
+if __name__ == "__main__":
+    migrate()
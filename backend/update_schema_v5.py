@@ -0,0 +1,27 @@
+from sqlalchemy import create_engine, text
+from database import DATABASE_URL
+
+INDEXES = [
+    # Status / assignee filters combined with the default created_at sort
+    ("idx_tasks_status_created_at_id", "tasks (status, created_at DESC, task_id DESC)"),
+    ("idx_tasks_assigned_created_at_id", "tasks (assigned_user_id, created_at DESC, task_id DESC)"),
+    # Due date range filter and sort
+    ("idx_tasks_due_date", "tasks (due_date)"),
+    ("idx_tasks_task_type", "tasks (task_type)"),
+]
+
+def migrate():
+    engine = create_engine(DATABASE_URL)
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        print("Starting Migration V5 (task list filter indexes)...")
+        for name, definition in INDEXES:
+            try:
+                print(f"Creating {name}...")
+                conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON arms_workflow.{definition};"))
+            except Exception as e:
+                print(f"Error creating {name}: {e}")
+        print("Migration V5 Completed.")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,39 @@
+from sqlalchemy import create_engine, text
+from database import DATABASE_URL
+from models import TASK_SEARCH_VECTOR_SQL
+
+def migrate():
+    engine = create_engine(DATABASE_URL)
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        print("Starting Migration V6 (task search)...")
+        try:
+            print("Enabling pg_trgm extension...")
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm;"))
+
+            # Stored generated column: Postgres keeps it in sync on every insert/update
+            print("Adding search_vector column to tasks table...")
+            conn.execute(text(f"""
+                ALTER TABLE arms_workflow.tasks
+                ADD COLUMN IF NOT EXISTS search_vector tsvector
+                GENERATED ALWAYS AS ({TASK_SEARCH_VECTOR_SQL}) STORED;
+            """))
+
+            print("Creating idx_tasks_search_vector...")
+            conn.execute(text("""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tasks_search_vector
+                ON arms_workflow.tasks USING GIN (search_vector);
+            """))
+
+            print("Creating idx_tasks_company_trgm...")
+            conn.execute(text("""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tasks_company_trgm
+                ON arms_workflow.tasks USING GIN (company_name gin_trgm_ops);
+            """))
+
+            print("Migration V6 Completed Successfully.")
+        except Exception as e:
+            print(f"Error during migration: {e}")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,66 @@
+from sqlalchemy import create_engine, text
+from database import DATABASE_URL
+
+def migrate():
+    engine = create_engine(DATABASE_URL)
+    with engine.connect() as conn:
+        print("Starting Migration V7 (unique workflow daily volumes)...")
+        try:
+            conn.execute(text("SET search_path TO arms_workflow, public;"))
+
+            # 1. Merge duplicate (workflow_type, date, analyst_id) rows into the oldest one
+            print("Merging duplicate workflow_daily_volumes rows...")
+            conn.execute(text("""
+                WITH totals AS (
+                    SELECT MIN(volume_id) AS keep_id, SUM(quantity) AS quantity
+                    FROM workflow_daily_volumes
+                    GROUP BY workflow_type, date, analyst_id
+                    HAVING COUNT(*) > 1
+                )
+                UPDATE workflow_daily_volumes v
+                SET quantity = totals.quantity
+                FROM totals
+                WHERE v.volume_id = totals.keep_id;
+            """))
+            result = conn.execute(text("""
+                DELETE FROM workflow_daily_volumes v
+                USING workflow_daily_volumes keep
+                WHERE keep.workflow_type = v.workflow_type
+                  AND keep.date = v.date
+                  AND keep.analyst_id IS NOT DISTINCT FROM v.analyst_id
+                  AND keep.volume_id < v.volume_id;
+            """))
+            print(f"Removed {result.rowcount} duplicate rows.")
+
+            # 2. Add the constraint, unless the table already has it. NULLS NOT DISTINCT, so
+            # unassigned volume (analyst_id NULL) is unique too, needs PostgreSQL 15 or later.
+            # It has to be a constraint rather than a COALESCE expression index: the volume
+            # upserts in metrics.py name it in ON CONFLICT ON CONSTRAINT.
+            print("Adding uq_workflow_daily_volume...")
+            conn.execute(text("""
+                DO $$
+                BEGIN
+                    IF NOT EXISTS (
+                        SELECT 1 FROM pg_constraint
+                        WHERE conname = 'uq_workflow_daily_volume'
+                          AND conrelid = 'arms_workflow.workflow_daily_volumes'::regclass
+                    ) THEN
+                        IF current_setting('server_version_num')::int < 150000 THEN
+                            RAISE EXCEPTION 'uq_workflow_daily_volume needs PostgreSQL 15 or later (UNIQUE NULLS NOT DISTINCT); server is %',
+                                current_setting('server_version');
+                        END IF;
+                        ALTER TABLE workflow_daily_volumes
+                        ADD CONSTRAINT uq_workflow_daily_volume
+                        UNIQUE NULLS NOT DISTINCT (workflow_type, date, analyst_id);
+                    END IF;
+                END $$;
+            """))
+
+            conn.commit()
+            print("Migration V7 Completed Successfully.")
+        except Exception as e:
+            print(f"Error during migration: {e}")
+            conn.rollback()
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,57 @@
+from sqlalchemy import create_engine, text
+from database import DATABASE_URL
+
+def migrate():
+    engine = create_engine(DATABASE_URL)
+    with engine.connect() as conn:
+        print("Starting Migration V8 (background import jobs)...")
+        try:
+            conn.execute(text("SET search_path TO arms_workflow, public;"))
+
+            print("Creating import_jobs table...")
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS import_jobs (
+                    job_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                    file_name VARCHAR(500) NOT NULL,
+                    spool_path TEXT NOT NULL,
+                    file_size_bytes BIGINT,
+                    uploaded_by UUID REFERENCES users(id),
+                    status VARCHAR(20) NOT NULL DEFAULT 'queued', -- 'queued', 'running', 'completed', 'failed'
+                    rows_committed INTEGER NOT NULL DEFAULT 0,
+                    bytes_processed BIGINT NOT NULL DEFAULT 0,
+                    success_count INTEGER NOT NULL DEFAULT 0,
+                    failed_count INTEGER NOT NULL DEFAULT 0,
+                    error_message TEXT,
+                    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+                    started_at TIMESTAMP WITH TIME ZONE,
+                    heartbeat_at TIMESTAMP WITH TIME ZONE,
+                    finished_at TIMESTAMP WITH TIME ZONE
+                );
+            """))
+            # Startup recovery looks for unfinished jobs only
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_import_jobs_unfinished
+                ON import_jobs(created_at) WHERE status IN ('queued', 'running');
+            """))
+
+            print("Creating import_job_errors table...")
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS import_job_errors (
+                    error_id SERIAL PRIMARY KEY,
+                    job_id UUID NOT NULL REFERENCES import_jobs(job_id) ON DELETE CASCADE,
+                    row_index INTEGER NOT NULL,
+                    message TEXT NOT NULL
+                );
+            """))
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_import_job_errors_job_row ON import_job_errors(job_id, row_index);
+            """))
+
+            conn.commit()
+            print("Migration V8 Completed Successfully.")
+        except Exception as e:
+            print(f"Error during migration: {e}")
+            conn.rollback()
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,26 @@
+from sqlalchemy import create_engine, text
+from database import DATABASE_URL
+
+INDEXES = [
+    # POST /tasks/claim-next: only Pending rows, already in claim order
+    ("idx_tasks_pending_queue",
+     "tasks (priority DESC, due_date ASC NULLS LAST, created_at, task_id) WHERE status = 'Pending'"),
+    ("idx_tasks_pending_queue_workflow",
+     "tasks (workflow_config_id, priority DESC, due_date ASC NULLS LAST, created_at, task_id) WHERE status = 'Pending'"),
+]
+
+def migrate():
+    engine = create_engine(DATABASE_URL)
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        print("Starting Migration V9 (claim-next queue indexes)...")
+        for name, definition in INDEXES:
+            try:
+                print(f"Creating {name}...")
+                conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON arms_workflow.{definition};"))
+            except Exception as e:
+                print(f"Error creating {name}: {e}")
+        print("Migration V9 Completed.")
+
+if __name__ == "__main__":
+    migrate()
@@ -10,21 +10,64 @@ const NotificationBell = () => {
     const dropdownRef = useRef(null);
     const navigate = useNavigate();
 
+    // True while the server stream is connected; it then keeps unreadCount itself
+    const streaming = useRef(false);
+
     const fetchNotifications = async () => {
         try {
             const response = await api.get('/notifications/');
             setNotifications(response.data);
             setUnreadCount(response.data.filter(n => !n.is_read).length);
+            return response.data.reduce((latest, n) => Math.max(latest, n.notification_id), 0);
         } catch (error) {
             console.error("Failed to fetch notifications", error);
         }
     };
 
     useEffect(() => {
-        fetchNotifications();
-        // Poll every 30 seconds
-        const interval = setInterval(fetchNotifications, 30000);
-        return () => clearInterval(interval);
+        let source = null;
+        let interval = null;
+        let cancelled = false;
+
+        // Poll every 30 seconds when the stream is unavailable
+        const startPolling = () => {
+            if (!interval) interval = setInterval(fetchNotifications, 30000);
+        };
+
+        fetchNotifications().then((latestId) => {
+            const token = localStorage.getItem('token');
+            if (cancelled) return;
+            if (typeof EventSource === 'undefined' || !token) {
+                startPolling();
+                return;
+            }
+            // EventSource can't send headers, so the token goes in the query string
+            const params = new URLSearchParams({ token });
+            if (latestId !== undefined) params.set('since', latestId);
+            source = new EventSource(`${api.defaults.baseURL}/notifications/stream?${params}`);
+            source.onopen = () => { streaming.current = true; };
+            source.addEventListener('notification', (event) => {
+                const notification = JSON.parse(event.data);
+                setNotifications(prev => [
+                    notification,
+                    ...prev.filter(n => n.notification_id !== notification.notification_id)
+                ].slice(0, 50));
+            });
+            source.addEventListener('unread', (event) => {
+                setUnreadCount(JSON.parse(event.data).count);
+            });
+            source.onerror = () => {
+                streaming.current = false;
+                // The browser reconnects by itself; only a closed stream (e.g. expired token) falls back to polling
+                if (source.readyState === EventSource.CLOSED) startPolling();
+            };
+        });
+
+        return () => {
+            cancelled = true;
+            if (source) source.close();
+            clearInterval(interval);
+        };
     }, []);
 
     useEffect(() => {
@@ -43,7 +86,7 @@ const NotificationBell = () => {
             setNotifications(notifications.map(n =>
                 n.notification_id === id ? { ...n, is_read: true } : n
             ));
-            setUnreadCount(prev => Math.max(0, prev - 1));
+            if (!streaming.current) setUnreadCount(prev => Math.max(0, prev - 1));
         } catch (error) {
             console.error("Failed to mark as read", error);
         }
@@ -53,7 +96,7 @@ const NotificationBell = () => {
         try {
             await api.post('/notifications/read-all');
             setNotifications(notifications.map(n => ({ ...n, is_read: true })));
-            setUnreadCount(0);
+            if (!streaming.current) setUnreadCount(0);
         } catch (error) {
             console.error("Failed to mark all as read", error);
         }
@@ -26,7 +26,7 @@ const FilterChip = ({ label, active, onClick, colorClass }) => (
 );
 
 const TaskFilters = ({ filters, onFilterChange, onClearFilters }) => {
-    const statuses = ['Pending', 'In Progress', 'Completed', 'Under Review', 'Critical'];
+    const statuses = ['Pending', 'In Progress', 'Completed', 'Under Review', 'Paused'];
     const priorities = ['Low', 'Medium', 'High', 'Critical'];
 
     const toggleStatus = (status) => {
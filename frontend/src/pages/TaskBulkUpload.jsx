@@ -46,7 +46,19 @@ const TaskBulkUpload = () => {
                     'Content-Type': 'multipart/form-data',
                 },
             });
-            setResult(response.data);
+
+            // The import runs as a background job; poll it until it finishes
+            const jobId = response.data.job_id;
+            let job = null;
+            while (!job || job.status === 'queued' || job.status === 'running') {
+                await new Promise(resolve => setTimeout(resolve, job ? 1000 : 250));
+                const jobRes = await api.get(`/tasks/import-jobs/${jobId}`);
+                job = jobRes.data;
+                setResult(job);
+            }
+            if (job.status === 'failed') {
+                setError(job.error_message || "Import failed. Please try again.");
+            }
         } catch (err) {
             console.error("Upload failed", err);
             setError(err.response?.data?.detail || "Failed to upload file. Please try again.");
@@ -74,7 +86,7 @@ const TaskBulkUpload = () => {
                 <div className="flex flex-col items-center justify-center border-2 border-dashed border-slate-300 rounded-xl p-12 bg-slate-50 hover:bg-slate-100 transition-colors cursor-pointer relative">
                     <input
                         type="file"
-                        accept=".csv"
+                        accept=".csv,.gz"
                         onChange={handleFileChange}
                         className="absolute inset-0 w-full h-full opacity-0 cursor-pointer"
                     />
@@ -84,7 +96,7 @@ const TaskBulkUpload = () => {
                     <p className="text-lg font-medium text-slate-900 mb-1">
                         {file ? file.name : "Click to upload or drag and drop"}
                     </p>
-                    <p className="text-sm text-slate-500">CSV files only (max 10MB)</p>
+                    <p className="text-sm text-slate-500">CSV or gzip-compressed .csv.gz files</p>
                 </div>
 
                 {file && (
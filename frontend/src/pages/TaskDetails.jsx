@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import api from '../services/api';
-import { ArrowLeft, Clock, User, Tag, FileText, MessageSquare, Send } from 'lucide-react';
+import { ArrowLeft, Clock, User, Tag, FileText, MessageSquare, Send, Paperclip, Download } from 'lucide-react';
 import clsx from 'clsx';
 
 const TaskDetails = () => {
@@ -10,19 +10,25 @@ const TaskDetails = () => {
     const [task, setTask] = useState(null);
     const [comments, setComments] = useState([]);
     const [history, setHistory] = useState([]);
+    const [assignee, setAssignee] = useState(null);
+    const [commentsCursor, setCommentsCursor] = useState(null);
+    const [historyCursor, setHistoryCursor] = useState(null);
+    const [attachments, setAttachments] = useState([]);
+    const [uploading, setUploading] = useState(false);
     const [newComment, setNewComment] = useState('');
     const [loading, setLoading] = useState(true);
 
     const fetchTaskData = async () => {
         try {
-            const [taskRes, commentsRes, historyRes] = await Promise.all([
-                api.get(`/tasks/${taskId}`),
-                api.get(`/tasks/${taskId}/comments`),
-                api.get(`/tasks/${taskId}/history`)
-            ]);
-            setTask(taskRes.data);
-            setComments(commentsRes.data);
-            setHistory(historyRes.data);
+            // Task, assignee, comments, history and attachments in one request
+            const { data } = await api.get(`/tasks/${taskId}/full`);
+            setTask(data.task);
+            setAssignee(data.assignee);
+            setComments(data.comments);
+            setHistory(data.history);
+            setAttachments(data.attachments);
+            setCommentsCursor(data.comments_next_cursor);
+            setHistoryCursor(data.history_next_cursor);
         } catch (error) {
             console.error("Failed to fetch task details", error);
         } finally {
@@ -34,11 +40,30 @@ const TaskDetails = () => {
         fetchTaskData();
     }, [taskId]);
 
+    // Older comments / history are paged with the cursor from the previous page
+    const loadOlderComments = async () => {
+        const res = await api.get(`/tasks/${taskId}/comments`, { params: { cursor: commentsCursor } });
+        setComments(prev => [...prev, ...res.data]);
+        setCommentsCursor(res.headers['x-next-cursor'] || null);
+    };
+
+    const loadOlderHistory = async () => {
+        const res = await api.get(`/tasks/${taskId}/history`, { params: { cursor: historyCursor } });
+        setHistory(prev => [...prev, ...res.data]);
+        setHistoryCursor(res.headers['x-next-cursor'] || null);
+    };
+
     const handleStatusChange = async (newStatus) => {
         try {
-            await api.put(`/tasks/${taskId}`, { status: newStatus });
+            // Send the version we loaded so a concurrent edit isn't silently overwritten
+            await api.put(`/tasks/${taskId}`, { status: newStatus, version: task.version });
             fetchTaskData(); // Refresh data
         } catch (error) {
+            if (error.response?.status === 409) {
+                alert("This task was changed by someone else. It has been reloaded with the latest data.");
+                fetchTaskData();
+                return;
+            }
             console.error("Failed to update status", error);
         }
     };
@@ -55,6 +80,52 @@ const TaskDetails = () => {
         }
     };
 
+    const handleUpload = async (e) => {
+        const file = e.target.files[0];
+        e.target.value = '';
+        if (!file) return;
+        setUploading(true);
+        try {
+            // Sent as the raw request body so the server can stream it to disk
+            const res = await api.post(`/tasks/${taskId}/attachments`, file, {
+                params: { file_name: file.name },
+                headers: { 'Content-Type': file.type || 'application/octet-stream' },
+            });
+            setAttachments(prev => [res.data, ...prev]);
+        } catch (error) {
+            console.error("Failed to upload attachment", error);
+            alert(error.response?.data?.detail || "Failed to upload attachment");
+        } finally {
+            setUploading(false);
+        }
+    };
+
+    // Fetched through the API client so the bearer token is sent; a plain link would go unauthenticated
+    const handleDownload = async (attachment) => {
+        try {
+            const res = await api.get(`/tasks/${taskId}/attachments/${attachment.attachment_id}`, {
+                responseType: 'blob',
+            });
+            const url = URL.createObjectURL(res.data);
+            const link = document.createElement('a');
+            link.href = url;
+            link.download = attachment.file_name;
+            document.body.appendChild(link);
+            link.click();
+            link.remove();
+            URL.revokeObjectURL(url);
+        } catch (error) {
+            console.error("Failed to download attachment", error);
+            alert("Failed to download attachment");
+        }
+    };
+
+    const formatSize = (bytes) => {
+        if (bytes == null) return '';
+        if (bytes < 1024 * 1024) return `${Math.max(1, Math.round(bytes / 1024))} KB`;
+        return `${(bytes / (1024 * 1024)).toFixed(1)} MB`;
+    };
+
     if (loading) return <div className="p-6">Loading...</div>;
     if (!task) return <div className="p-6">Task not found</div>;
 
@@ -116,13 +187,18 @@ const TaskDetails = () => {
                                 comments.map(comment => (
                                     <div key={comment.comment_id} className="bg-slate-50 p-3 rounded-lg">
                                         <div className="flex justify-between text-xs text-slate-500 mb-1">
-                                            <span className="font-medium text-slate-700">User {comment.user_id}</span> {/* Ideally resolve name */}
+                                            <span className="font-medium text-slate-700">{comment.user ? comment.user.full_name : 'Unknown user'}</span>
                                             <span>{new Date(comment.created_at).toLocaleString()}</span>
                                         </div>
                                         <p className="text-slate-800 text-sm">{comment.comment_text}</p>
                                     </div>
                                 ))
                             )}
+                            {commentsCursor && (
+                                <button onClick={loadOlderComments} className="w-full text-sm text-primary-600 hover:text-primary-700 py-1">
+                                    Load older comments
+                                </button>
+                            )}
                         </div>
 
                         <form onSubmit={handlePostComment} className="flex gap-2">
@@ -161,7 +237,7 @@ const TaskDetails = () => {
 
                         <div className="flex items-center justify-between py-2 border-b border-slate-100">
                             <span className="text-slate-500 text-sm flex items-center"><User className="w-4 h-4 mr-2" /> Assignee</span>
-                            <span className="text-sm font-medium text-slate-900">{task.assigned_user_id ? "Assigned" : "Unassigned"}</span>
+                            <span className="text-sm font-medium text-slate-900">{assignee ? assignee.full_name : (task.assigned_user_id ? "Assigned" : "Unassigned")}</span>
                         </div>
 
                         <div className="flex items-center justify-between py-2 border-b border-slate-100">
@@ -170,6 +246,37 @@ const TaskDetails = () => {
                         </div>
                     </div>
 
+                    {/* Attachments Card */}
+                    <div className="bg-white rounded-lg shadow p-6">
+                        <div className="flex items-center justify-between mb-4">
+                            <h3 className="text-lg font-semibold flex items-center">
+                                <Paperclip className="w-5 h-5 mr-2 text-slate-500" />
+                                Attachments
+                            </h3>
+                            <label className={clsx("text-sm text-primary-600 hover:text-primary-700 cursor-pointer", uploading && "opacity-50 pointer-events-none")}>
+                                {uploading ? 'Uploading...' : 'Upload'}
+                                <input type="file" className="hidden" onChange={handleUpload} disabled={uploading} />
+                            </label>
+                        </div>
+                        {attachments.length === 0 ? (
+                            <p className="text-slate-400 text-sm italic">No attachments.</p>
+                        ) : (
+                            <ul className="space-y-2">
+                                {attachments.map(attachment => (
+                                    <li key={attachment.attachment_id} className="flex items-center justify-between text-sm">
+                                        <span className="truncate text-slate-800" title={attachment.file_name}>{attachment.file_name}</span>
+                                        <span className="flex items-center gap-3 shrink-0 ml-2 text-slate-500">
+                                            {formatSize(attachment.file_size_bytes)}
+                                            <button type="button" onClick={() => handleDownload(attachment)} className="hover:text-primary-600" title="Download">
+                                                <Download className="w-4 h-4" />
+                                            </button>
+                                        </span>
+                                    </li>
+                                ))}
+                            </ul>
+                        )}
+                    </div>
+
                     {/* History Card */}
                     <div className="bg-white rounded-lg shadow p-6">
                         <h3 className="text-lg font-semibold mb-4 flex items-center">
@@ -214,6 +321,11 @@ const TaskDetails = () => {
                             {history.length === 0 && (
                                 <div className="text-center py-4 text-slate-400 italic text-sm">No history available for this task.</div>
                             )}
+                            {historyCursor && (
+                                <button onClick={loadOlderHistory} className="relative z-10 w-full text-sm text-primary-600 hover:text-primary-700 py-1">
+                                    Load older history
+                                </button>
+                            )}
                         </div>
                     </div>
                 </div>
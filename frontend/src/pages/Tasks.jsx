@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import { Link } from 'react-router-dom';
 import api from '../services/api';
 import { Plus, Filter, MoreHorizontal, Upload, Play, CheckCircle, UserPlus, Star, Pencil, LayoutList, User, Trash2, XCircle, RotateCcw } from 'lucide-react';
@@ -54,14 +54,43 @@ const Tasks = () => {
     // Dropdown state
     const [activeDropdown, setActiveDropdown] = useState(null);
 
+    const [totalCount, setTotalCount] = useState(0);
+
+    // Filters are applied server-side so results are correct beyond the first page
+    const buildTaskParams = () => ({
+        status: filters.status,
+        priority: filters.priority,
+        created_from: filters.dateRange.start || undefined,
+        created_to: filters.dateRange.end || undefined,
+        assigned_user_id: viewMode === 'my' && currentUser?.id ? [currentUser.id] : undefined,
+    });
+
+    // Position in the /tasks/changes feed; after an action only the deltas since here are fetched
+    const changeCursor = useRef(null);
+
+    // Client-side version of buildTaskParams, for tasks arriving through the change feed
+    const matchesView = (task) => {
+        if (filters.status.length && !filters.status.includes(task.status)) return false;
+        if (filters.priority.length && !filters.priority.includes(task.priority)) return false;
+        const createdOn = (task.created_at || '').slice(0, 10);
+        if (filters.dateRange.start && createdOn < filters.dateRange.start) return false;
+        if (filters.dateRange.end && createdOn > filters.dateRange.end) return false;
+        if (viewMode === 'my' && task.assigned_user_id !== currentUser?.id) return false;
+        return true;
+    };
+
     const fetchData = async () => {
         setLoading(true);
         try {
+            // Taken before the list is read, so nothing written in between is missed
+            const cursorRes = await api.get('/tasks/changes/cursor');
+            changeCursor.current = cursorRes.data.cursor;
             const [tasksRes, usersRes] = await Promise.all([
-                api.get('/tasks'),
+                api.get('/tasks/', { params: buildTaskParams(), paramsSerializer: { indexes: null } }),
                 api.get('/users/')
             ]);
             setTasks(Array.isArray(tasksRes.data) ? tasksRes.data : []);
+            setTotalCount(Number(tasksRes.headers['x-total-count'] ?? tasksRes.data.length));
             setUsers(usersRes.data);
             if (!Array.isArray(tasksRes.data)) {
                 console.error("API Error: /tasks did not return an array", tasksRes.data);
@@ -75,7 +104,7 @@ const Tasks = () => {
 
     useEffect(() => {
         fetchData();
-    }, []);
+    }, [filters, viewMode]);
 
     // Close dropdown when clicking outside
     useEffect(() => {
@@ -117,8 +146,40 @@ const Tasks = () => {
         return () => window.removeEventListener('keydown', handleKeyDown);
     }, []);
 
+    const syncChanges = async () => {
+        if (!changeCursor.current) return fetchData();
+        try {
+            const changed = [];
+            const deleted = new Set();
+            let cursor = changeCursor.current;
+            let hasMore = true;
+            while (hasMore) {
+                const res = await api.get('/tasks/changes', { params: { since: cursor } });
+                changed.push(...res.data.tasks);
+                res.data.deleted.forEach(id => deleted.add(id));
+                cursor = res.data.cursor;
+                hasMore = res.data.has_more;
+            }
+            changeCursor.current = cursor;
+
+            const updates = new Map(changed.map(task => [task.task_id, task]));
+            const known = new Set(tasks.map(task => task.task_id));
+            const added = changed.filter(task => !known.has(task.task_id) && matchesView(task));
+            const kept = tasks
+                .filter(task => !deleted.has(task.task_id))
+                .map(task => updates.get(task.task_id) ?? task)
+                .filter(matchesView);
+            const next = [...added, ...kept];
+            setTotalCount(count => Math.max(0, count + next.length - tasks.length));
+            setTasks(next);
+        } catch (error) {
+            console.error("Failed to sync task changes", error);
+            fetchData();
+        }
+    };
+
     const handleRefresh = () => {
-        fetchData();
+        syncChanges();
         setSelectedTasks([]);
     };
 
@@ -204,6 +265,8 @@ const Tasks = () => {
     const handleExport = async () => {
         try {
             const response = await api.get('/tasks/export', {
+                params: buildTaskParams(),
+                paramsSerializer: { indexes: null },
                 responseType: 'blob',
             });
             const url = window.URL.createObjectURL(new Blob([response.data]));
@@ -240,39 +303,8 @@ const Tasks = () => {
         }
     };
 
-    const filteredTasks = tasks.filter(task => {
-        // View Mode Filter
-        if (viewMode === 'my' && task.assigned_user_id !== currentUser?.id) {
-            return false;
-        }
-
-        // Status Filter
-        if (filters.status.length > 0 && !filters.status.includes(task.status)) {
-            return false;
-        }
-
-        // Priority Filter
-        if (filters.priority.length > 0 && !filters.priority.includes(task.priority)) {
-            return false;
-        }
-
-        // Date Range Filter
-        if (filters.dateRange.start) {
-            const taskDate = new Date(task.created_at);
-            const startDate = new Date(filters.dateRange.start);
-            startDate.setHours(0, 0, 0, 0); // Start of day
-            if (taskDate < startDate) return false;
-        }
-
-        if (filters.dateRange.end) {
-            const taskDate = new Date(task.created_at);
-            const endDate = new Date(filters.dateRange.end);
-            endDate.setHours(23, 59, 59, 999); // End of day
-            if (taskDate > endDate) return false;
-        }
-
-        return true;
-    });
+    // Already filtered by the server (see fetchData)
+    const filteredTasks = tasks;
 
     const isAdminOrManager = currentUser?.role === 'admin' || currentUser?.role === 'manager';
 
@@ -384,7 +416,7 @@ const Tasks = () => {
                         Filter
                     </button>
                     <div className="h-6 w-px bg-slate-200 dark:bg-slate-700"></div>
-                    <span className="text-sm text-slate-500 dark:text-slate-400">{filteredTasks.length} tasks found</span>
+                    <span className="text-sm text-slate-500 dark:text-slate-400">{totalCount} tasks found</span>
                 </div>
 
                 {showFilters && (